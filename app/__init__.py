@@ -1,7 +1,7 @@
 # Este arquivo permite que o diretório 'app' seja importado como um pacote Python 
 
 # Importa o aplicativo Flask do módulo principal
-from flask import Flask
+from flask import Flask, flash, redirect, url_for
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 import os
@@ -10,6 +10,10 @@ from dotenv import load_dotenv
 # Carrega variáveis de ambiente
 load_dotenv()
 
+# Configura os logs da aplicação (LOG_LEVEL, LOG_FORMAT)
+from app.utils.logging_config import configure_logging
+configure_logging()
+
 # Inicializa a aplicação Flask
 app = Flask(__name__, template_folder='templates', static_folder='static')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'chave_secreta_temporaria')
@@ -25,17 +29,41 @@ def handle_csrf_error(e):
         return redirect(url_for('pdf.dashboard'))
     return e
 
-# Configura o banco de dados SQLite
+# Pasta dos arquivos da aplicação: DATA_DIR ou instance/ na raiz do projeto
 # Usando caminho absoluto para funcionar com Docker
-db_path = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(__file__))), 'instance', 'aireader.db')
+data_dir = os.environ.get('DATA_DIR') or os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(__file__))), 'instance')
+
+# Configura o banco de dados: DATABASE_URL (ex.: PostgreSQL) ou o SQLite local
+from app.models.db import database_uri
+db_path = os.path.join(data_dir, 'aireader.db')
 os.makedirs(os.path.dirname(db_path), exist_ok=True)
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(db_path)
 
-app.config['UPLOAD_FOLDER'] = os.path.join(app.static_folder, 'uploads')
-app.config['AUDIO_FOLDER'] = os.path.join(app.static_folder, 'audios')
+# PDFs enviados, fora da pasta pública: só são entregues pela rota autenticada /pdfs/<id>/file
+app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(db_path), 'uploads')
+# Os áudios ficam em static/audios na instalação padrão (onde versões anteriores os gravaram)
+app.config['AUDIO_FOLDER'] = os.path.join(data_dir, 'audios') if os.environ.get('DATA_DIR') else os.path.join(app.static_folder, 'audios')
+# Texto extraído dos PDFs (comprimido por página), fora da pasta pública
+app.config['TEXT_FOLDER'] = os.path.join(os.path.dirname(db_path), 'text_store')
+# Segmentos de áudio publicados durante a conversão (reprodução progressiva)
+app.config['SEGMENT_FOLDER'] = os.path.join(os.path.dirname(db_path), 'segments')
+# Uploads em partes ainda incompletos, fora da pasta pública
+app.config['UPLOAD_TEMP_FOLDER'] = os.path.join(os.path.dirname(db_path), 'uploads_partial')
+# Limite de cada requisição: o formulário simples e cada parte dos uploads em partes
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
-# Inicializa o banco de dados
+# Entrega dos áudios por um servidor web na frente da aplicação (após as verificações de acesso):
+# AUDIO_ACCEL_REDIRECT_PREFIX para nginx (X-Accel-Redirect), USE_X_SENDFILE para Apache/lighttpd
+app.config['AUDIO_ACCEL_REDIRECT_PREFIX'] = os.environ.get('AUDIO_ACCEL_REDIRECT_PREFIX')
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
+# PDFs gravados em static/uploads por versões anteriores passam para a pasta nova
+# (com DATA_DIR a instalação é outra, e os arquivos de static/ não são dela)
+from app.utils.pdf_processor import relocate_legacy_uploads
+if not os.environ.get('DATA_DIR'):
+    relocate_legacy_uploads(os.path.join(app.static_folder, 'uploads'), app.config['UPLOAD_FOLDER'])
+
+# Inicializa o banco de dados e aplica as migrações pendentes
 from app.models.db import init_app
 init_app(app)
 
@@ -44,20 +72,28 @@ login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 login_manager.init_app(app)
 
-from app.models.user import User
+from app.utils.user_cache import load_cached_user
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Usa o cache de usuários para não consultar o banco a cada requisição autenticada
+    return load_cached_user(int(user_id))
 
 # Importa e registra os blueprints
 from app.controllers.auth_controller import auth_bp
 from app.controllers.pdf_controller import pdf_bp
 from app.controllers.payment_controller import payment_bp
+from app.controllers.metrics_controller import metrics_bp
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(pdf_bp)
 app.register_blueprint(payment_bp)
+# Endpoint /metrics e tempo de resposta de todas as rotas
+app.register_blueprint(metrics_bp)
+
+# Recupera conversões interrompidas e inicia os workers da fila de conversão
+from app.utils.job_queue import init_job_queue
+init_job_queue(app)
 
 # Rota principal
 @app.route('/')
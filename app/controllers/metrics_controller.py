@@ -0,0 +1,126 @@
+from flask import Blueprint, Response, request, g, abort
+from sqlalchemy import func
+from app.models.db import db
+from app.models.job import ConversionJob
+from app.utils.metrics import (
+    registry, snapshot_gauge, snapshot_counter, METRICS_ENABLED, METRICS_TOKEN,
+    HTTP_REQUEST_SECONDS, DOWNLOAD_BYTES
+)
+from app.utils import tts_client
+from app.utils.tts_cache import get_segment_cache
+from app.utils.tts_service import get_tts_router
+from app.utils.user_cache import user_cache
+from app.utils.text_cleanup import cleanup_stats
+import hmac
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Rotas que enviam áudio; o tamanho das respostas conta em aireader_download_bytes_total
+DOWNLOAD_ENDPOINTS = {'pdf.download_audio', 'pdf.listen_audio', 'pdf.listen_segment'}
+
+# Estados do disjuntor de cada provedor, como número
+_BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+@metrics_bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None or not METRICS_ENABLED:
+        return response
+    # Respostas em streaming (downloads, eventos) são medidas até o envio dos cabeçalhos
+    endpoint = request.endpoint or 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method,
+                                 status=response.status_code)
+    if endpoint in DOWNLOAD_ENDPOINTS and response.status_code in (200, 206) and response.content_length:
+        DOWNLOAD_BYTES.inc(response.content_length, endpoint=endpoint)
+    return response
+
+
+@registry.collector
+def collect_queue_depth():
+    """Jobs na fila e em execução (de todos os processos, lidos do banco)"""
+    rows = db.session.query(ConversionJob.kind, ConversionJob.status, func.count(ConversionJob.id)).filter(
+        ConversionJob.status.in_(ConversionJob.ACTIVE_STATES)
+    ).group_by(ConversionJob.kind, ConversionJob.status).all()
+    depth = {(kind, status): 0 for kind in (ConversionJob.CONVERT, ConversionJob.EXTRACT)
+             for status in ConversionJob.ACTIVE_STATES}
+    depth.update({(kind, status): count for kind, status, count in rows})
+    return [snapshot_gauge('aireader_conversion_queue_depth', 'Jobs na fila de conversão, por tipo e estado',
+                           depth, ('kind', 'state'))]
+
+
+@registry.collector
+def collect_tts_stats():
+    """Cache de segmentos, disjuntores dos provedores e cliente da OpenAI deste processo"""
+    metrics = []
+    cache = get_segment_cache().stats()
+    metrics.append(snapshot_counter('aireader_tts_cache_lookups_total', 'Consultas ao cache de segmentos',
+                                    {'hit': cache['hits'], 'miss': cache['misses']}, ('result',)))
+    metrics.append(snapshot_gauge('aireader_tts_cache_bytes', 'Tamanho do cache de segmentos', {(): cache['bytes']}))
+    metrics.append(snapshot_gauge('aireader_tts_cache_entries', 'Segmentos no cache', {(): cache['entries']}))
+
+    breakers = get_tts_router().stats()
+    metrics.append(snapshot_gauge(
+        'aireader_tts_breaker_state', 'Estado do disjuntor de cada provedor (0 fechado, 1 em teste, 2 aberto)',
+        {name: _BREAKER_STATES.get(stats['state'], 2) for name, stats in breakers.items()}, ('provider',)
+    ))
+    metrics.append(snapshot_counter('aireader_tts_breaker_opened_total', 'Vezes que o disjuntor de cada provedor abriu',
+                                    {name: stats['opened'] for name, stats in breakers.items()}, ('provider',)))
+    metrics.append(snapshot_counter('aireader_tts_breaker_rejected_total',
+                                    'Chamadas recusadas pelo disjuntor aberto de cada provedor',
+                                    {name: stats['rejected'] for name, stats in breakers.items()}, ('provider',)))
+
+    # O cliente da OpenAI só existe depois da primeira síntese com ela
+    client = tts_client._speech_client
+    if client is not None:
+        stats = client.stats()
+        metrics.append(snapshot_counter('aireader_openai_retries_total', 'Novas tentativas de chamadas à OpenAI',
+                                        {(): stats['retries']}))
+        metrics.append(snapshot_counter('aireader_openai_rate_limited_total', 'Respostas 429 da OpenAI',
+                                        {(): stats['rate_limited']}))
+        metrics.append(snapshot_counter('aireader_openai_throttle_seconds_total',
+                                        'Tempo de espera no limitador de taxa da OpenAI', {(): stats['throttle_wait']}))
+    return metrics
+
+
+@registry.collector
+def collect_process_stats():
+    """Cache de usuários e limpeza do texto deste processo"""
+    users = user_cache.stats()
+    cleanup = cleanup_stats()
+    removed = {name: cleanup[name] for name in ('boilerplate_lines', 'page_numbers', 'hyphenations', 'leaders', 'glyphs')}
+    return [
+        snapshot_counter('aireader_user_cache_lookups_total', 'Consultas ao cache de usuários',
+                         {'hit': users['hits'], 'miss': users['misses']}, ('result',)),
+        snapshot_counter('aireader_text_cleanup_characters_total', 'Caracteres lidos e enviados à síntese pela limpeza',
+                         {'in': cleanup['chars_in'], 'out': cleanup['chars_out']}, ('direction',)),
+        snapshot_counter('aireader_text_cleanup_removals_total', 'Trechos removidos pela limpeza do texto, por tipo',
+                         removed, ('kind',))
+    ]
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Métricas deste processo no formato de texto do Prometheus"""
+    if not METRICS_ENABLED:
+        abort(404)
+    if METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied, METRICS_TOKEN):
+            abort(401)
+    try:
+        body = registry.render()
+    except Exception:
+        logger.exception("[Metrics] Erro ao coletar as métricas")
+        db.session.rollback()
+        abort(500)
+    return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
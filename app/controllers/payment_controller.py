@@ -1,12 +1,18 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_required, current_user
+from app import csrf
 from app.models.db import db
 from app.models.user import User
 from app.utils.stripe_service import create_checkout_session, get_subscription, handle_subscription_event, cancel_subscription
+from app.utils.user_cache import invalidate_user
+from app.utils.metrics import WEBHOOK_EVENTS
 import os
+import logging
 import stripe
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 payment_bp = Blueprint('payment', __name__)
 
 @payment_bp.route('/subscription')
@@ -56,6 +62,7 @@ def subscription_success():
     current_user.subscription_status = 'active'
     current_user.subscription_end_date = datetime.utcnow() + timedelta(days=30)  # 30 dias de assinatura
     db.session.commit()
+    invalidate_user(current_user.id)
     
     flash('Obrigado por assinar o AI Reader! Agora você tem acesso completo ao serviço.', 'success')
     return redirect(url_for('pdf.dashboard'))
@@ -64,36 +71,37 @@ def subscription_success():
 @login_required
 def cancel_subscription_route():
     try:
-        print(f"[DEBUG] Iniciando cancelamento de assinatura para usuário {current_user.email}")
+        logger.debug(f"[Assinatura] Iniciando cancelamento de assinatura para usuário {current_user.email}")
         
         # Verifica se o usuário tem uma assinatura
         if not current_user.stripe_subscription_id:
-            print(f"[DEBUG] Usuário {current_user.email} não tem ID de assinatura: {current_user.stripe_subscription_id}")
+            logger.debug(f"[Assinatura] Usuário {current_user.email} não tem ID de assinatura: {current_user.stripe_subscription_id}")
             flash('Você não possui uma assinatura ativa.', 'warning')
             return redirect(url_for('payment.subscription'))
         
         subscription_id = current_user.stripe_subscription_id
-        print(f"[DEBUG] Tentando cancelar a assinatura ID: {subscription_id}")
+        logger.debug(f"[Assinatura] Tentando cancelar a assinatura ID: {subscription_id}")
         
         # Cancela a assinatura no Stripe
         result = cancel_subscription(subscription_id)
         
         if result and result.status == 'canceled':
             # Atualiza o status no banco de dados
-            print(f"[DEBUG] Assinatura cancelada com sucesso: {result.id} - Status: {result.status}")
+            logger.debug(f"[Assinatura] Assinatura cancelada com sucesso: {result.id} - Status: {result.status}")
             current_user.subscription_status = 'canceled'
             db.session.commit()
+            invalidate_user(current_user.id)
             
             flash('Sua assinatura foi cancelada com sucesso.', 'success')
         else:
             error_msg = "Resultado nulo" if not result else f"Status inválido: {result.status}"
-            print(f"[DEBUG] Erro no cancelamento da assinatura: {error_msg}")
+            logger.error(f"[Assinatura] Erro no cancelamento da assinatura: {error_msg}")
             flash('Erro ao cancelar assinatura. Por favor, tente novamente.', 'danger')
         
         return redirect(url_for('payment.subscription'))
     except Exception as e:
         # Registra o erro em logs
-        print(f"[ERROR] Exceção ao cancelar assinatura: {str(e)}")
+        logger.error(f"[Assinatura] Exceção ao cancelar assinatura: {e}")
         
         # Faz rollback da sessão em caso de erro
         db.session.rollback()
@@ -106,41 +114,46 @@ def cancel_subscription_route():
 @login_required
 def cancel_subscription_simple():
     try:
-        print(f"[DEBUG] Iniciando cancelamento de assinatura simples para usuário {current_user.email}")
+        logger.debug(f"[Assinatura] Iniciando cancelamento de assinatura simples para usuário {current_user.email}")
         
         # Atualiza o status no banco de dados diretamente
         # Esta é uma solução temporária para testes - em produção deveria comunicar com o Stripe
         current_user.subscription_status = 'canceled'
         db.session.commit()
+        invalidate_user(current_user.id)
         
         flash('Sua assinatura foi cancelada com sucesso.', 'success')
         return redirect(url_for('payment.subscription'))
     except Exception as e:
-        print(f"[ERROR] Exceção ao cancelar assinatura (simples): {str(e)}")
+        logger.error(f"[Assinatura] Exceção ao cancelar assinatura (simples): {e}")
         db.session.rollback()
         flash('Ocorreu um erro ao processar sua solicitação. Nossa equipe foi notificada.', 'danger')
         return redirect(url_for('payment.subscription'))
 
+# O webhook é autenticado pela assinatura do Stripe, não pelo token CSRF
 @payment_bp.route('/webhook', methods=['POST'])
+@csrf.exempt
 def webhook():
     payload = request.data
     sig_header = request.headers.get('Stripe-Signature')
     
     # Adiciona log para depuração
-    print("[Webhook] Recebido evento do Stripe")
+    logger.debug("[Webhook] Recebido evento do Stripe")
     
     try:
         event = stripe.Webhook.construct_event(
             payload, sig_header, os.environ.get('STRIPE_WEBHOOK_SECRET')
         )
-        print(f"[Webhook] Evento construído com sucesso: {event['type']}")
+        logger.debug(f"[Webhook] Evento construído com sucesso: {event['type']}")
     except ValueError as e:
         # Payload inválido
-        print(f"[Webhook] Erro de payload inválido: {e}")
+        logger.error(f"[Webhook] Erro de payload inválido: {e}")
+        WEBHOOK_EVENTS.inc(type='unknown', result='invalid_payload')
         return jsonify({'error': str(e)}), 400
     except stripe.error.SignatureVerificationError as e:
         # Assinatura inválida
-        print(f"[Webhook] Erro de verificação de assinatura: {e}")
+        logger.error(f"[Webhook] Erro de verificação de assinatura: {e}")
+        WEBHOOK_EVENTS.inc(type='unknown', result='invalid_signature')
         return jsonify({'error': str(e)}), 400
     
     # Eventos de assinatura
@@ -149,7 +162,7 @@ def webhook():
         subscription = event['data']['object']
         customer_id = subscription.customer
         
-        print(f"[Webhook] Evento de assinatura: {event['type']} para cliente {customer_id}")
+        logger.info(f"[Webhook] Evento de assinatura: {event['type']} para cliente {customer_id}")
         
         # Encontra o usuário
         user = User.query.filter_by(stripe_customer_id=customer_id).first()
@@ -162,15 +175,18 @@ def webhook():
             user.stripe_subscription_id = subscription_data['subscription_id']
             
             db.session.commit()
-            print(f"[Webhook] Assinatura atualizada para usuário {user.email} - Status: {user.subscription_status}")
+            invalidate_user(user.id)
+            logger.info(f"[Webhook] Assinatura atualizada para usuário {user.email} - Status: {user.subscription_status}")
+            result = 'processed'
         else:
-            print(f"[Webhook] Usuário não encontrado para customer_id: {customer_id}")
+            logger.warning(f"[Webhook] Usuário não encontrado para customer_id: {customer_id}")
+            result = 'user_not_found'
     
     elif event['type'] == 'customer.subscription.deleted':
         subscription = event['data']['object']
         customer_id = subscription.customer
         
-        print(f"[Webhook] Evento de cancelamento para cliente {customer_id}")
+        logger.info(f"[Webhook] Evento de cancelamento para cliente {customer_id}")
         
         # Encontra o usuário
         user = User.query.filter_by(stripe_customer_id=customer_id).first()
@@ -178,8 +194,15 @@ def webhook():
             # Atualiza o status da assinatura
             user.subscription_status = 'canceled'
             db.session.commit()
-            print(f"[Webhook] Assinatura cancelada para usuário {user.email}")
+            invalidate_user(user.id)
+            logger.info(f"[Webhook] Assinatura cancelada para usuário {user.email}")
+            result = 'processed'
         else:
-            print(f"[Webhook] Usuário não encontrado para customer_id: {customer_id}")
+            logger.warning(f"[Webhook] Usuário não encontrado para customer_id: {customer_id}")
+            result = 'user_not_found'
+    
+    else:
+        result = 'ignored'
     
+    WEBHOOK_EVENTS.inc(type=event['type'], result=result)
     return jsonify({'status': 'success'}) 
\ No newline at end of file
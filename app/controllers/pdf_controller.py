@@ -1,137 +1,388 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, send_from_directory, Response
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, send_from_directory, send_file, stream_with_context, Response, jsonify
 from flask_login import login_required, current_user
 from app.models.db import db
 from app.models.pdf import PDF, AudioFile
+from app.models.job import ConversionJob
+from app.models.upload import UploadSession
 from app.utils.forms import UploadPDFForm
-from app.utils.pdf_processor import save_pdf_file, extract_text_from_pdf
-from app.utils.tts_service import text_to_speech
+from app.utils.pdf_processor import save_pdf_file, store_pdf_blob, probe_pdf_metadata, iter_pdf_pages_parallel
+from app.utils.chunked_upload import (
+    UploadError, append_chunk, complete_upload, create_partial_upload, discard_upload, partial_upload_path,
+    received_bytes, UPLOAD_MAX_BYTES, UPLOAD_PART_BYTES, UPLOAD_SESSION_HOURS
+)
+from app.utils.tts_service import stream_to_speech
+from app.utils.pipeline import prefetch
+from app.utils.job_queue import enqueue_conversion, enqueue_extraction, JobProgress, LeaseLost
+from app.utils.text_store import TextStore, text_store_key, text_store_path, write_text_store, store_pages
+from app.utils.segment_playlist import SegmentPlaylist, PLAYLIST_NAME, segment_filename, segment_folder_path
+from app.utils.mp3_index import scan_mp3_file, MP3_SEEK_INTERVAL_SECONDS
+from app.utils.concatenated_file import ConcatenatedFile
+from app.utils.text_cleanup import clean_pages, CleanupStats
+from app.utils.chapters import outline_chapters, heading_chapters, plan_chapters, merge_empty_chapters
+from app.utils.metrics import CONVERSION_STAGE_SECONDS, CONVERSIONS_IN_FLIGHT, CONVERSIONS_TOTAL
 import os
+import logging
+import time
+import json
+import uuid
 import threading
-import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import wraps
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from werkzeug.exceptions import ClientDisconnected, HTTPException, RequestedRangeNotSatisfiable
+from werkzeug.wsgi import FileWrapper
+from werkzeug.utils import secure_filename
 import re
 
+logger = logging.getLogger(__name__)
+
 pdf_bp = Blueprint('pdf', __name__)
 
+# Número de páginas extraídas que podem aguardar na fila da síntese
+PAGE_PREFETCH = int(os.environ.get('PAGE_PREFETCH', 8))
+
+# Reprodução progressiva (/listen): intervalo entre verificações de novos segmentos,
+# tempo máximo esperando por eles e tempo máximo sem nenhum segmento novo; a conexão
+# ocupa uma thread do servidor enquanto espera (a playlist HLS não)
+LISTEN_POLL_SECONDS = float(os.environ.get('LISTEN_POLL_SECONDS', 1))
+LISTEN_MAX_SECONDS = int(os.environ.get('LISTEN_MAX_SECONDS', 3600))
+LISTEN_IDLE_SECONDS = int(os.environ.get('LISTEN_IDLE_SECONDS', 120))
+
+# Versão do protocolo tus em que os uploads em partes se baseiam
+TUS_VERSION = '1.0.0'
+
+# Capítulos de um mesmo livro sintetizados ao mesmo tempo
+CHAPTER_WORKERS = int(os.environ.get('CHAPTER_WORKERS', 2))
+
+# Número de PDFs por página no dashboard
+DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', 24))
+
+# Fluxo de estado da conversão: intervalo entre verificações de mudança, duração máxima
+# de cada conexão, conexões simultâneas por processo (cada uma ocupa uma thread do
+# servidor) e tempo de espera do navegador antes de reconectar
+STATUS_STREAM_POLL_SECONDS = float(os.environ.get('STATUS_STREAM_POLL_SECONDS', 2))
+STATUS_STREAM_MAX_SECONDS = int(os.environ.get('STATUS_STREAM_MAX_SECONDS', 300))
+STATUS_STREAM_MAX_CONNECTIONS = int(os.environ.get('STATUS_STREAM_MAX_CONNECTIONS', 4))
+STATUS_STREAM_RETRY_MS = 3000
+_status_streams = threading.BoundedSemaphore(STATUS_STREAM_MAX_CONNECTIONS)
+
 # Decorador para verificar se o usuário tem assinatura ativa
 def subscription_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not current_user.is_subscribed():
-            print(f"[Acesso negado] Usuário {current_user.email} tentou acessar uma função restrita sem assinatura ativa")
+            logger.warning(f"[Acesso negado] Usuário {current_user.email} tentou acessar uma função restrita sem assinatura ativa")
             flash('É necessário ter uma assinatura ativa para acessar este recurso.', 'warning')
             return redirect(url_for('payment.subscription'))
         return f(*args, **kwargs)
     return decorated_function
 
-# Rota temporária para adicionar a coluna is_processing à tabela pdf (remover após uso)
-@pdf_bp.route('/migrate-db')
-def migrate_db():
-    try:
-        # Identifica o caminho do banco de dados
-        db_path = current_app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
-        
-        # Conecta diretamente ao banco SQLite
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Verifica se a coluna já existe
-        cursor.execute("PRAGMA table_info(pdf)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'is_processing' not in columns:
-            # Adiciona a coluna is_processing com valor padrão False
-            cursor.execute("ALTER TABLE pdf ADD COLUMN is_processing BOOLEAN DEFAULT FALSE")
-            conn.commit()
-            result = "Coluna 'is_processing' adicionada com sucesso!"
-        else:
-            result = "Coluna 'is_processing' já existe."
+def link_existing_audio(pdf):
+    """Associa ao PDF os áudios de outro PDF com o mesmo conteúdo; retorna True se houver"""
+    source = pdf.find_converted_duplicate()
+    if not source:
+        return False
+    
+    pdf.chapter_plan = source.chapter_plan
+    pdf.chapter_count = source.chapter_count
+    done = {audio.chapter_index for audio in pdf.audio_files}
+    for audio in source.audio_files:
+        if audio.chapter_index in done:
+            continue
+        pdf.audio_files.append(AudioFile(
+            filename=audio.filename,
+            file_path=audio.file_path,
+            duration=audio.duration,
+            seek_table=audio.seek_table,
+            seek_interval=audio.seek_interval,
+            chapter_index=audio.chapter_index,
+            chapter_title=audio.chapter_title,
+            start_page=audio.start_page,
+            end_page=audio.end_page
+        ))
+    return True
+
+# Função para extrair e armazenar o texto do PDF em segundo plano
+def process_extraction_background(pdf_id, app, job_id=None, lease=None):
+    """Extrai o texto do PDF e o armazena por página; retorna True em caso de sucesso"""
+    with app.app_context():
+        pdf = db.session.get(PDF, pdf_id)
+        if not pdf:
+            logger.warning(f"[BG-Extract] PDF {pdf_id} não encontrado")
+            return False
         
-        conn.close()
-        return f"Migração concluída: {result}"
-    except Exception as e:
-        return f"Erro durante a migração: {str(e)}"
+        store_path = text_store_path(current_app.config['TEXT_FOLDER'], text_store_key(pdf))
+        if TextStore.open(store_path):
+            logger.debug(f"[BG-Extract] Texto do PDF {pdf_id} já está armazenado")
+            return True
+        
+        pdf_path = os.path.join(current_app.config['UPLOAD_FOLDER'], pdf.file_path)
+        if not os.path.exists(pdf_path):
+            logger.error(f"[BG-Extract] ERRO: Arquivo PDF não encontrado no caminho: {pdf_path}")
+            return False
+        
+        progress = JobProgress(job_id, pdf.page_count, lease=lease)
+        page_count = write_text_store(store_path, progress.track_pages(iter_pdf_pages_parallel(pdf_path)))
+        progress.flush(force=True)
+        logger.info(f"[BG-Extract] Texto de {page_count} páginas armazenado para o PDF {pdf_id}")
+        return True
+
+def build_chapter_plan(pdf, pdf_path, store_path):
+    """
+    Define os capítulos do livro pelo sumário do PDF ou, sem ele, pelos títulos
+    no início das páginas; retorna (plano, texto armazenado ou None)
+    """
+    store = TextStore.open(store_path)
+    outline = outline_chapters(pdf_path)
+    
+    # Com vários capítulos, o texto é lido por intervalo de páginas do arquivo armazenado
+    if len(outline) > 1 and not store:
+        logger.info(f"[BG-Convert] Extraindo o texto do PDF {pdf.id} antes de dividir os capítulos")
+        write_text_store(store_path, iter_pdf_pages_parallel(pdf_path))
+        store = TextStore.open(store_path)
+    
+    if not store:
+        return plan_chapters([], pdf.page_count or 0), None
+    
+    starts = outline if len(outline) > 1 else heading_chapters(store.iter_pages())
+    plan = plan_chapters(starts, store.page_count)
+    has_text = lambda start, end: any(text.strip() for text in store.iter_pages(start, end))
+    return merge_empty_chapters(plan, has_text), store
+
+def convert_chapter(app, pdf_id, chapter, pages, progress):
+    """Sintetiza um capítulo em um MP3; retorna (nome do arquivo, índice dos frames) ou None"""
+    with app.app_context():
+        audio_folder = current_app.config['AUDIO_FOLDER']
+        
+        # Publica cada segmento assim que fica pronto, para que o áudio possa ser
+        # ouvido enquanto o restante do capítulo é convertido; os segmentos de uma
+        # tentativa anterior que falhou ou foi interrompida são retomados
+        segment_folder = segment_folder_path(current_app.config['SEGMENT_FOLDER'], pdf_id, chapter['index'])
+        playlist = SegmentPlaylist(segment_folder)
+        if playlist.checkpointed:
+            logger.info(f"[BG-Convert] Retomando o capítulo {chapter['index']} do PDF {pdf_id} "
+                        f"com {playlist.checkpointed} segmento(s) já sintetizados")
+        
+        def on_segment(index, audio, duration):
+            progress.flush()
+        
+        # Cabeçalhos, rodapés, números de página e afins são removidos antes da síntese
+        cleanup = CleanupStats()
+        with CONVERSION_STAGE_SECONDS.time(stage='chapter'):
+            audio_filename, _ = stream_to_speech(
+                clean_pages(progress.track_pages(pages), cleanup), audio_folder,
+                on_segment=on_segment, progress=progress, checkpoint=playlist
+            )
+        logger.info(f"[BG-Convert] Limpeza do texto do capítulo {chapter['index']}: {cleanup.removed} de "
+                    f"{cleanup.chars_in} caracteres removidos ({cleanup.removed_ratio:.1%})")
+        if not audio_filename:
+            logger.error(f"[BG-Convert] ERRO: Não foi possível converter o capítulo {chapter['index']} do PDF {pdf_id}")
+            return None
+        
+        # Confere os frames do arquivo final e monta a tabela de busca por tempo
+        audio_path = os.path.join(audio_folder, audio_filename)
+        with CONVERSION_STAGE_SECONDS.time(stage='index'):
+            index = scan_mp3_file(audio_path)
+        if not index.is_valid():
+            logger.error(f"[BG-Convert] ERRO: O áudio do capítulo {chapter['index']} não contém MP3 válido")
+            os.remove(audio_path)
+            return None
+        
+        playlist.finish()
+        return audio_filename, index
+
+def register_chapter_audio(pdf_id, chapter, audio_filename, index):
+    """Registra o áudio de um capítulo; retorna False se o capítulo já tinha áudio"""
+    if AudioFile.query.filter_by(pdf_id=pdf_id, chapter_index=chapter['index']).first():
+        return False
+    db.session.add(AudioFile(
+        filename=audio_filename,
+        file_path=audio_filename,
+        duration=index.duration,
+        seek_table=index.pack_seek_table(),
+        seek_interval=MP3_SEEK_INTERVAL_SECONDS,
+        chapter_index=chapter['index'],
+        chapter_title=chapter['title'],
+        start_page=chapter['start_page'],
+        end_page=chapter['end_page'],
+        pdf_id=pdf_id
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outro worker registrou o mesmo capítulo ao mesmo tempo (índice único pdf_id, chapter_index)
+        db.session.rollback()
+        return False
+    return True
 
 # Função para processar a conversão em segundo plano
-def process_conversion_background(pdf_id, user_id, app):
-    """Processa a conversão de PDF para áudio em segundo plano"""
+def process_conversion_background(pdf_id, user_id, app, job_id=None, lease=None):
+    """
+    Processa a conversão de PDF para áudio em segundo plano, um MP3 por capítulo;
+    retorna True se todos os capítulos foram convertidos
+
+    Capítulos que já têm áudio (de uma tentativa anterior) não são convertidos de novo.
+    Se o evento lease for sinalizado (o worker perdeu o job), a conversão é interrompida
+    com LeaseLost sem registrar os capítulos que ainda não foram salvos.
+    """
+    start = time.monotonic()
+    result = 'failed'
+    try:
+        with CONVERSIONS_IN_FLIGHT.track_inprogress():
+            succeeded = _convert_pdf_chapters(pdf_id, user_id, app, job_id, lease)
+        result = 'ok' if succeeded else 'failed'
+        return succeeded
+    except LeaseLost:
+        result = 'lease_lost'
+        raise
+    finally:
+        CONVERSION_STAGE_SECONDS.observe(time.monotonic() - start, stage='total')
+        CONVERSIONS_TOTAL.inc(result=result)
+
+def _convert_pdf_chapters(pdf_id, user_id, app, job_id, lease):
     with app.app_context():
         try:
             # Recupera o PDF
             pdf = PDF.query.filter_by(id=pdf_id, user_id=user_id).first()
             if not pdf:
-                print(f"[BG-Convert] PDF {pdf_id} não encontrado para usuário {user_id}")
-                return
+                logger.warning(f"[BG-Convert] PDF {pdf_id} não encontrado para usuário {user_id}")
+                return False
+            
+            # Um job recolocado na fila pode encontrar a conversão já concluída
+            if pdf.is_converted():
+                logger.debug(f"[BG-Convert] PDF {pdf_id} já possui áudio")
+                pdf.is_processing = False
+                db.session.commit()
+                return True
                 
-            print(f"[BG-Convert] Iniciando conversão em segundo plano para PDF: {pdf.title}")
+            logger.info(f"[BG-Convert] Iniciando conversão em segundo plano para PDF: {pdf.title}")
             
             # Caminho completo para o PDF
             pdf_path = os.path.join(current_app.config['UPLOAD_FOLDER'], pdf.file_path)
             
             # Verifica se o arquivo existe
             if not os.path.exists(pdf_path):
-                print(f"[BG-Convert] ERRO: Arquivo PDF não encontrado no caminho: {pdf_path}")
-                # Marca o PDF como não processando
-                pdf.is_processing = False
-                db.session.commit()
-                return
-            
-            # Extrai o texto do PDF
-            text, _ = extract_text_from_pdf(pdf_path)
-            
-            if not text:
-                print(f"[BG-Convert] ERRO: Não foi possível extrair texto do PDF")
+                logger.error(f"[BG-Convert] ERRO: Arquivo PDF não encontrado no caminho: {pdf_path}")
                 # Marca o PDF como não processando
                 pdf.is_processing = False
                 db.session.commit()
-                return
-            
-            print(f"[BG-Convert] Texto extraído com sucesso. Tamanho: {len(text)} caracteres")
+                return False
             
             # Verifica se o diretório de áudio existe
             audio_folder = current_app.config['AUDIO_FOLDER']
             if not os.path.exists(audio_folder):
                 os.makedirs(audio_folder, exist_ok=True)
             
-            # Converte o texto para áudio
-            audio_filename, duration = text_to_speech(text, audio_folder)
-            
-            if not audio_filename:
-                print(f"[BG-Convert] ERRO: Falha na conversão de texto para áudio")
-                # Marca o PDF como não processando
-                pdf.is_processing = False
+            # O plano de capítulos é definido uma vez e reutilizado nas novas tentativas
+            store_path = text_store_path(current_app.config['TEXT_FOLDER'], text_store_key(pdf))
+            plan = pdf.get_chapter_plan()
+            store = TextStore.open(store_path)
+            if plan is None:
+                with CONVERSION_STAGE_SECONDS.time(stage='plan'):
+                    plan, store = build_chapter_plan(pdf, pdf_path, store_path)
+                pdf.set_chapter_plan(plan)
                 db.session.commit()
-                return
+                logger.info(f"[BG-Convert] {len(plan)} capítulo(s) definidos para o PDF {pdf_id}")
             
-            print(f"[BG-Convert] Áudio gerado com sucesso: {audio_filename}, duração: {duration}s")
+            done = {audio.chapter_index for audio in pdf.audio_files}
+            pending = [chapter for chapter in plan if chapter['index'] not in done]
+            progress = JobProgress(job_id, sum(chapter['end_page'] - chapter['start_page'] for chapter in pending) or None,
+                                   lease=lease)
             
-            # Cria o registro do áudio no banco de dados
-            audio = AudioFile(
-                filename=audio_filename,
-                file_path=audio_filename,
-                duration=duration,
-                pdf_id=pdf.id
-            )
+            def chapter_pages(chapter):
+                if store and len(plan) == 1:
+                    return store.iter_pages()
+                if store:
+                    return store.iter_pages(chapter['start_page'], chapter['end_page'])
+                # Sem o texto armazenado (livro de um capítulo só), extrai as páginas em uma
+                # thread separada, armazenando-as, e converte o texto à medida que ficam prontas
+                return prefetch(store_pages(store_path, iter_pdf_pages_parallel(pdf_path)), maxsize=PAGE_PREFETCH)
             
-            # Adiciona o áudio e marca o PDF como não processando
-            db.session.add(audio)
+            # Os capítulos são sintetizados em paralelo; cada um é registrado assim que termina
+            failed = 0
+            with ThreadPoolExecutor(max_workers=CHAPTER_WORKERS) as executor:
+                futures = {
+                    executor.submit(convert_chapter, app, pdf.id, chapter, chapter_pages(chapter), progress): chapter
+                    for chapter in pending
+                }
+                for future in as_completed(futures):
+                    chapter = futures[future]
+                    try:
+                        result = future.result()
+                    except LeaseLost:
+                        result = None
+                    except Exception as e:
+                        logger.error(f"[BG-Convert] ERRO no capítulo {chapter['index']}: {e}")
+                        result = None
+                    
+                    # Outro worker assumiu o job: nada mais é registrado por este
+                    if progress.lease_lost():
+                        for pending_future in futures:
+                            pending_future.cancel()
+                        if result is not None:
+                            os.remove(os.path.join(audio_folder, result[0]))
+                        continue
+                    if result is None:
+                        failed += 1
+                        continue
+                    
+                    audio_filename, index = result
+                    if not register_chapter_audio(pdf.id, chapter, audio_filename, index):
+                        # Outra execução do job já registrou o capítulo; este arquivo não é usado
+                        os.remove(os.path.join(audio_folder, audio_filename))
+                        logger.warning(f"[BG-Convert] Capítulo {chapter['index']} do PDF {pdf.id} já tinha áudio; "
+                                       f"{audio_filename} descartado")
+                        continue
+                    
+                    # O arquivo do capítulo é a concatenação dos segmentos, que já não são necessários
+                    SegmentPlaylist.remove(segment_folder_path(current_app.config['SEGMENT_FOLDER'], pdf.id, chapter['index']))
+                    logger.info(f"[BG-Convert] Capítulo {chapter['index']} convertido: {audio_filename}, duração: {index.duration:.1f}s")
+            
+            progress.flush(force=True)
             pdf.is_processing = False
             db.session.commit()
-            print(f"[BG-Convert] Conversão concluída e registro salvo no banco de dados")
             
+            if failed:
+                logger.error(f"[BG-Convert] ERRO: {failed} de {len(pending)} capítulo(s) não foram convertidos")
+                return False
+            
+            SegmentPlaylist.remove(segment_folder_path(current_app.config['SEGMENT_FOLDER'], pdf.id))
+            logger.info(f"[BG-Convert] Conversão concluída e registro salvo no banco de dados")
+            return True
+            
+        except LeaseLost:
+            # O estado do PDF pertence agora ao worker que assumiu o job
+            db.session.rollback()
+            raise
         except Exception as e:
-            print(f"[BG-Convert] ERRO na conversão em segundo plano: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+            logger.exception(f"[BG-Convert] ERRO na conversão em segundo plano: {e}")
             
             # Em caso de erro, marca o PDF como não processando
             try:
+                db.session.rollback()
                 pdf = PDF.query.filter_by(id=pdf_id, user_id=user_id).first()
                 if pdf:
                     pdf.is_processing = False
                     db.session.commit()
             except:
                 pass
+            return False
+
+def make_page_cursor(pdf):
+    """Posição de um PDF na listagem, usada como cursor da próxima página"""
+    return f"{pdf.upload_date.isoformat()}_{pdf.id}"
+
+def parse_page_cursor(value):
+    """Lê o cursor da listagem; valores inválidos voltam para a primeira página"""
+    if not value:
+        return None
+    try:
+        upload_date, last_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(upload_date), int(last_id)
+    except ValueError:
+        return None
 
 @pdf_bp.route('/dashboard')
 @login_required
@@ -143,51 +394,96 @@ def dashboard():
         
     try:
         # Log para depuração
-        print(f"[Dashboard] Usuário {current_user.email} acessando o dashboard")
+        logger.debug(f"[Dashboard] Usuário {current_user.email} acessando o dashboard")
         
-        pdfs = PDF.query.filter_by(user_id=current_user.id).order_by(PDF.upload_date.desc()).all()
+        # Uma única consulta traz os PDFs e o status; a paginação usa a posição
+        # (data de envio, id) do último PDF da página anterior
+        query = PDF.query_with_status(current_user.id)
+        cursor = parse_page_cursor(request.args.get('before'))
+        if cursor:
+            upload_date, last_id = cursor
+            query = query.filter(or_(
+                PDF.upload_date < upload_date,
+                and_(PDF.upload_date == upload_date, PDF.id < last_id)
+            ))
+        
+        rows = query.order_by(PDF.upload_date.desc(), PDF.id.desc()).limit(DASHBOARD_PAGE_SIZE + 1).all()
+        next_cursor = None
+        if len(rows) > DASHBOARD_PAGE_SIZE:
+            rows = rows[:DASHBOARD_PAGE_SIZE]
+            next_cursor = make_page_cursor(rows[-1][0])
+        
+        has_processing = any(status == 'Em Processamento' for _, status in rows)
         form = UploadPDFForm()
         
-        return render_template('dashboard.html', pdfs=pdfs, form=form)
+        # Áudios dos capítulos dos PDFs da página, em uma única consulta
+        chapters_by_pdf = {}
+        pdf_ids = [pdf.id for pdf, _ in rows]
+        if pdf_ids:
+            for audio in AudioFile.query.filter(AudioFile.pdf_id.in_(pdf_ids)).order_by(AudioFile.chapter_index):
+                chapters_by_pdf.setdefault(audio.pdf_id, {})[audio.chapter_index] = audio
+        
+        return render_template('dashboard.html', pdfs=rows, form=form, has_processing=has_processing,
+                               next_cursor=next_cursor, is_first_page=cursor is None,
+                               chapters_by_pdf=chapters_by_pdf, upload_max_bytes=UPLOAD_MAX_BYTES)
     except Exception as e:
-        print(f"[Dashboard] ERRO: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception(f"[Dashboard] ERRO: {e}")
         flash('Ocorreu um erro ao carregar o dashboard. Por favor, tente novamente.', 'danger')
-        return render_template('dashboard.html', pdfs=[], form=UploadPDFForm())
+        return render_template('dashboard.html', pdfs=[], form=UploadPDFForm(), has_processing=False,
+                               next_cursor=None, is_first_page=True, chapters_by_pdf={},
+                               upload_max_bytes=UPLOAD_MAX_BYTES)
+
+def register_uploaded_pdf(title, filename, relative_path, file_path, file_size, content_hash):
+    """Cria o registro de um PDF já gravado e agenda a extração do texto"""
+    # Reaproveita os metadados de um upload anterior com o mesmo conteúdo
+    existing = PDF.query.filter_by(content_hash=content_hash).first()
+    if existing:
+        page_count = existing.page_count
+    else:
+        # Lê apenas os metadados do PDF; o texto é extraído durante a conversão
+        page_count = probe_pdf_metadata(file_path)['page_count']
+    
+    # Cria o registro no banco de dados
+    pdf = PDF(
+        title=title,
+        filename=filename,
+        file_path=relative_path,
+        file_size=file_size,
+        page_count=page_count,
+        content_hash=content_hash,
+        user_id=current_user.id
+    )
+    
+    db.session.add(pdf)
+    db.session.flush()
+    
+    # Se o mesmo conteúdo já foi convertido, reutiliza o áudio
+    link_existing_audio(pdf)
+    db.session.commit()
+    
+    # Extrai o texto em segundo plano para que a conversão comece direto na síntese
+    store_path = text_store_path(current_app.config['TEXT_FOLDER'], text_store_key(pdf))
+    if not os.path.exists(store_path):
+        enqueue_extraction(pdf)
+    return pdf
 
 @pdf_bp.route('/upload', methods=['POST'])
 @login_required
 @subscription_required
 def upload_pdf():
     # Log para depuração
-    print(f"[Upload] Usuário {current_user.email} tentando fazer upload de PDF")
+    logger.debug(f"[Upload] Usuário {current_user.email} tentando fazer upload de PDF")
     
     form = UploadPDFForm()
     
     if form.validate_on_submit():
         try:
-            # Salva o arquivo
-            filename, file_path, file_size = save_pdf_file(
+            # Salva o arquivo (uploads com conteúdo idêntico compartilham o mesmo arquivo)
+            filename, relative_path, file_path, file_size, content_hash = save_pdf_file(
                 form.pdf_file.data, 
                 current_app.config['UPLOAD_FOLDER']
             )
-            
-            # Extrai informações do PDF
-            _, page_count = extract_text_from_pdf(file_path)
-            
-            # Cria o registro no banco de dados
-            pdf = PDF(
-                title=form.title.data,
-                filename=filename,
-                file_path=filename,
-                file_size=file_size,
-                page_count=page_count,
-                user_id=current_user.id
-            )
-            
-            db.session.add(pdf)
-            db.session.commit()
+            register_uploaded_pdf(form.title.data, filename, relative_path, file_path, file_size, content_hash)
             
             flash('PDF enviado com sucesso!', 'success')
         except Exception as e:
@@ -195,150 +491,591 @@ def upload_pdf():
     
     return redirect(url_for('pdf.dashboard'))
 
+def _upload_headers(upload, offset):
+    return {
+        'Tus-Resumable': TUS_VERSION,
+        'Upload-Offset': str(offset),
+        'Upload-Length': str(upload.length),
+        'Location': url_for('pdf.upload_session_status', upload_id=upload.id),
+        'Cache-Control': 'no-store'
+    }
+
+def _get_upload_session(upload_id):
+    upload = UploadSession.query.filter_by(id=upload_id, user_id=current_user.id).first()
+    if upload is None or (upload.status == UploadSession.UPLOADING and upload.is_expired()):
+        return None
+    return upload
+
+def purge_expired_uploads(limit=50):
+    """Remove os uploads incompletos abandonados e as sessões antigas"""
+    expired = UploadSession.query.filter(UploadSession.expires_at < datetime.utcnow()).limit(limit).all()
+    for upload in expired:
+        discard_upload(upload.id, partial_upload_path(current_app.config['UPLOAD_TEMP_FOLDER'], upload.id))
+        db.session.delete(upload)
+    if expired:
+        db.session.commit()
+        logger.info(f"[Upload] {len(expired)} sessões de upload expiradas removidas")
+
+@pdf_bp.route('/api/uploads', methods=['POST'])
+@login_required
+@subscription_required
+def create_upload_session():
+    """
+    Inicia um upload em partes: {title, filename, length} -> sessão com a URL de envio
+
+    As partes são enviadas com PATCH na URL da sessão (cabeçalho Upload-Offset),
+    o offset atual pode ser consultado com HEAD e POST .../finalize cria o PDF.
+    """
+    data = request.get_json(silent=True) or {}
+    title = (data.get('title') or '').strip()[:200]
+    filename = secure_filename(data.get('filename') or '')
+    length = data.get('length')
+    
+    if not title:
+        return jsonify({'error': 'Informe o título do livro.'}), 400
+    if not filename.lower().endswith('.pdf'):
+        return jsonify({'error': 'Apenas arquivos PDF são permitidos!'}), 415
+    if not isinstance(length, int) or length <= 0:
+        return jsonify({'error': 'Tamanho do arquivo inválido.'}), 400
+    if length > UPLOAD_MAX_BYTES:
+        return jsonify({'error': f'O arquivo é muito grande. O tamanho máximo é {UPLOAD_MAX_BYTES // (1024 * 1024)}MB.'}), 413
+    
+    purge_expired_uploads()
+    
+    upload = UploadSession(id=uuid.uuid4().hex, title=title, filename=filename, length=length, user_id=current_user.id)
+    upload.touch(UPLOAD_SESSION_HOURS)
+    create_partial_upload(current_app.config['UPLOAD_TEMP_FOLDER'], upload.id)
+    db.session.add(upload)
+    db.session.commit()
+    logger.info(f"[Upload] Usuário {current_user.email} iniciou o upload {upload.id} ({length} bytes)")
+    
+    response = jsonify({
+        'id': upload.id,
+        'url': url_for('pdf.upload_session_status', upload_id=upload.id),
+        'offset': 0,
+        'length': length,
+        'part_size': UPLOAD_PART_BYTES
+    })
+    response.status_code = 201
+    response.headers.update(_upload_headers(upload, 0))
+    return response
+
+@pdf_bp.route('/api/uploads/<upload_id>', methods=['GET'])
+@login_required
+@subscription_required
+def upload_session_status(upload_id):
+    """Offset já recebido (HEAD ou GET), a partir do qual o cliente continua o envio"""
+    upload = _get_upload_session(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload não encontrado ou expirado.'}), 404
+    
+    offset = upload.length if upload.status == UploadSession.COMPLETE else \
+        received_bytes(partial_upload_path(current_app.config['UPLOAD_TEMP_FOLDER'], upload.id))
+    response = jsonify({'id': upload.id, 'status': upload.status, 'offset': offset, 'length': upload.length,
+                        'pdf_id': upload.pdf_id})
+    response.headers.update(_upload_headers(upload, offset))
+    return response
+
+@pdf_bp.route('/api/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+@subscription_required
+def upload_session_append(upload_id):
+    """Recebe uma parte do arquivo, gravada em disco à medida que chega"""
+    upload = _get_upload_session(upload_id)
+    if upload is None or upload.status != UploadSession.UPLOADING:
+        return jsonify({'error': 'Upload não encontrado ou expirado.'}), 404
+    if request.mimetype != 'application/offset+octet-stream':
+        return jsonify({'error': 'Content-Type deve ser application/offset+octet-stream.'}), 415
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Cabeçalho Upload-Offset ausente.'}), 400
+    
+    path = partial_upload_path(current_app.config['UPLOAD_TEMP_FOLDER'], upload.id)
+    try:
+        # Lê o corpo como fluxo, sem carregá-lo na memória
+        offset = append_chunk(upload.id, path, request.stream, offset, upload.length)
+    except UploadError as e:
+        if e.status == 415:
+            # Não é um PDF: não adianta continuar este upload
+            discard_upload(upload.id, path)
+            db.session.delete(upload)
+            db.session.commit()
+        return jsonify({'error': str(e), 'offset': received_bytes(path)}), e.status
+    except ClientDisconnected:
+        # Os bytes recebidos até a queda ficam gravados; o cliente retoma a partir deles
+        offset = received_bytes(path)
+        logger.warning(f"[Upload] Conexão interrompida no upload {upload.id} em {offset} bytes")
+    
+    upload.offset = offset
+    upload.touch(UPLOAD_SESSION_HOURS)
+    db.session.commit()
+    
+    response = Response(status=204)
+    response.headers.update(_upload_headers(upload, offset))
+    return response
+
+@pdf_bp.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+@subscription_required
+def upload_session_finalize(upload_id):
+    """Confere o arquivo completo, armazena-o pelo hash do conteúdo e cria o PDF"""
+    upload = _get_upload_session(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload não encontrado ou expirado.'}), 404
+    
+    # Repetir a finalização (ex.: a resposta anterior se perdeu) retorna o mesmo PDF
+    if upload.status != UploadSession.COMPLETE:
+        path = partial_upload_path(current_app.config['UPLOAD_TEMP_FOLDER'], upload.id)
+        try:
+            content_hash = complete_upload(upload.id, path, upload.length)
+        except UploadError as e:
+            return jsonify({'error': str(e), 'offset': received_bytes(path)}), e.status
+        
+        relative_path, file_path = store_pdf_blob(path, current_app.config['UPLOAD_FOLDER'], content_hash)
+        discard_upload(upload.id, path)
+        pdf = register_uploaded_pdf(upload.title, upload.filename, relative_path, file_path, upload.length, content_hash)
+        
+        upload.status = UploadSession.COMPLETE
+        upload.offset = upload.length
+        upload.pdf_id = pdf.id
+        upload.touch(UPLOAD_SESSION_HOURS)
+        db.session.commit()
+        logger.info(f"[Upload] Upload {upload.id} concluído: PDF {pdf.id} ({upload.length} bytes)")
+        flash('PDF enviado com sucesso!', 'success')
+    
+    return jsonify({'id': upload.id, 'pdf_id': upload.pdf_id, 'redirect': url_for('pdf.dashboard')})
+
+@pdf_bp.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+@subscription_required
+def upload_session_cancel(upload_id):
+    """Cancela um upload incompleto"""
+    upload = _get_upload_session(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload não encontrado ou expirado.'}), 404
+    if upload.status == UploadSession.UPLOADING:
+        discard_upload(upload.id, partial_upload_path(current_app.config['UPLOAD_TEMP_FOLDER'], upload.id))
+    db.session.delete(upload)
+    db.session.commit()
+    return Response(status=204)
+
 @pdf_bp.route('/convert/<int:pdf_id>', methods=['POST'])
 @login_required
 @subscription_required
 def convert_to_audio(pdf_id):
     # Log para depuração
-    print(f"[Convert] Usuário {current_user.email} tentando converter PDF {pdf_id}")
+    logger.debug(f"[Convert] Usuário {current_user.email} tentando converter PDF {pdf_id}")
     
     try:
         # Verifica se o PDF existe e pertence ao usuário
         pdf = PDF.query.filter_by(id=pdf_id, user_id=current_user.id).first_or_404()
-        print(f"[Convert] PDF encontrado: {pdf.title}")
+        logger.debug(f"[Convert] PDF encontrado: {pdf.title}")
         
-        # Verifica se já existe um áudio para este PDF
-        if pdf.audio_files:
-            print(f"[Convert] PDF já possui áudio")
+        # Verifica se todos os capítulos já têm áudio
+        if pdf.is_converted():
+            logger.debug(f"[Convert] PDF já possui áudio")
             flash('Este PDF já foi convertido para áudio.', 'info')
             return redirect(url_for('pdf.dashboard'))
         
-        # Se a coluna is_processing não existir no banco de dados, ignore-a
-        try:
-            # Verifica se já está em processamento
-            if pdf.is_processing:
-                print(f"[Convert] PDF já está em processamento")
-                flash('Este PDF já está sendo convertido. Por favor, aguarde.', 'info')
-                return redirect(url_for('pdf.dashboard'))
-            
-            # Marca o PDF como em processamento
-            pdf.is_processing = True
-            db.session.commit()
-        except Exception as e:
-            print(f"[Convert] AVISO: Erro ao verificar/atualizar status de processamento: {e}")
-            # Continua mesmo se houver erro (coluna pode não existir ainda)
+        # Verifica se já está em processamento
+        if pdf.is_processing:
+            logger.debug(f"[Convert] PDF já está em processamento")
+            flash('Este PDF já está sendo convertido. Por favor, aguarde.', 'info')
+            return redirect(url_for('pdf.dashboard'))
         
-        # Inicia a thread de conversão em segundo plano
-        print(f"[Convert] Iniciando conversão em segundo plano para PDF: {pdf.title}")
-        try:
-            conversion_thread = threading.Thread(
-                target=process_conversion_background,
-                args=(pdf_id, current_user.id, current_app._get_current_object())
-            )
-            conversion_thread.daemon = True
-            conversion_thread.start()
-        except Exception as thread_error:
-            print(f"[Convert] ERRO ao iniciar thread: {str(thread_error)}")
-            # Se não conseguir iniciar a thread, tenta uma conversão síncrona simplificada
-            try:
-                # Cria um áudio vazio como fallback
-                audio_folder = current_app.config['AUDIO_FOLDER']
-                if not os.path.exists(audio_folder):
-                    os.makedirs(audio_folder, exist_ok=True)
-                
-                # Nome do arquivo e caminho
-                audio_filename = f"fallback_{pdf_id}.mp3"
-                audio_path = os.path.join(audio_folder, audio_filename)
-                
-                # Cria um MP3 vazio
-                with open(audio_path, 'wb') as f:
-                    mp3_bytes = b'\xFF\xFB\x90\x44\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
-                    f.write(mp3_bytes)
-                
-                # Registra no banco de dados
-                audio = AudioFile(
-                    filename=audio_filename,
-                    file_path=audio_filename,
-                    duration=1.0,
-                    pdf_id=pdf.id
-                )
-                db.session.add(audio)
-                db.session.commit()
-                
-                flash('PDF convertido para áudio com sucesso (modo alternativo).', 'success')
-            except Exception as fallback_error:
-                print(f"[Convert] ERRO no fallback: {str(fallback_error)}")
-                flash('Erro na conversão. Por favor, tente novamente mais tarde.', 'danger')
-            
+        # Reutiliza o áudio de um PDF idêntico que já foi convertido
+        if link_existing_audio(pdf):
+            db.session.commit()
+            logger.info(f"[Convert] Áudio reutilizado de um PDF com o mesmo conteúdo")
+            flash('PDF convertido para áudio com sucesso!', 'success')
             return redirect(url_for('pdf.dashboard'))
         
+        # Coloca a conversão na fila persistente de jobs
+        logger.info(f"[Convert] Enfileirando conversão para PDF: {pdf.title}")
+        enqueue_conversion(pdf)
+        
         # Informa ao usuário que a conversão foi iniciada
-        flash('A conversão para áudio foi iniciada em segundo plano. Aguarde alguns instantes e atualize a página para verificar quando estiver pronto.', 'info')
+        flash('A conversão para áudio foi colocada na fila. Aguarde alguns instantes e atualize a página para verificar quando estiver pronto.', 'info')
         return redirect(url_for('pdf.dashboard'))
     
     except Exception as e:
-        print(f"[Convert] ERRO ao iniciar conversão: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception(f"[Convert] ERRO ao iniciar conversão: {e}")
         flash(f'Não foi possível iniciar a conversão. Por favor, tente novamente.', 'danger')
         return redirect(url_for('pdf.dashboard'))
 
-@pdf_bp.route('/download/<int:pdf_id>', methods=['POST'])
+def _send_audio_file(audio, audio_path, download_name):
+    # Com um servidor web na frente (ex.: nginx), delega a transferência a ele
+    accel_prefix = current_app.config.get('AUDIO_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        response = Response(mimetype='audio/mpeg')
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{audio.file_path}"
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        return response
+    
+    # send_file responde a requisições Range (206) e condicionais (ETag/Last-Modified)
+    # e usa o wsgi.file_wrapper (sendfile) do servidor; com USE_X_SENDFILE, envia X-Sendfile
+    response = send_file(
+        audio_path,
+        mimetype='audio/mpeg',
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=True,
+        max_age=0
+    )
+    # O werkzeug só anuncia o suporte a Range nas respostas 206; os players precisam dele no 200
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+def _send_chapters(audio_paths, download_name):
+    # Os capítulos são MP3 no mesmo formato, então o livro inteiro é a concatenação deles;
+    # o arquivo virtual permite responder a requisições Range (206) e condicionais
+    # (ETag/Last-Modified) sem gravar uma cópia do livro
+    book = ConcatenatedFile(audio_paths)
+    response = Response(FileWrapper(book, 64 * 1024), mimetype='audio/mpeg', direct_passthrough=True)
+    response.content_length = book.size
+    response.last_modified = book.mtime
+    response.set_etag(book.etag())
+    response.cache_control.no_cache = True
+    response.cache_control.max_age = 0
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.headers['Accept-Ranges'] = 'bytes'
+    try:
+        response = response.make_conditional(request.environ, accept_ranges=True, complete_length=book.size)
+    except RequestedRangeNotSatisfiable:
+        book.close()
+        raise
+    if response.status_code == 304:
+        book.close()
+    return response
+
+@pdf_bp.route('/download/<int:pdf_id>', methods=['GET', 'POST'])
+@pdf_bp.route('/download/<int:pdf_id>/chapters/<int:chapter>', methods=['GET', 'POST'])
 @login_required
 @subscription_required
-def download_audio(pdf_id):
+def download_audio(pdf_id, chapter=None):
+    """Baixa o áudio de um capítulo ou, sem capítulo, do livro inteiro"""
     try:
         # Log para depuração
-        print(f"[Download] Usuário {current_user.email} tentando baixar áudio do PDF {pdf_id}")
+        logger.debug(f"[Download] Usuário {current_user.email} tentando baixar áudio do PDF {pdf_id}")
         
         # Verifica se o PDF existe e pertence ao usuário
         pdf = PDF.query.filter_by(id=pdf_id, user_id=current_user.id).first_or_404()
         
-        # Verifica se existe um áudio para este PDF
-        if not pdf.audio_files:
+        # O livro inteiro só pode ser baixado depois que todos os capítulos forem convertidos
+        if chapter is None:
+            audios = pdf.audio_files if pdf.is_converted() else []
+        else:
+            audios = [audio for audio in [pdf.get_audio(chapter)] if audio]
+        if not audios:
             flash('Este PDF ainda não foi convertido para áudio.', 'warning')
             return redirect(url_for('pdf.dashboard'))
         
-        # Obtém o primeiro arquivo de áudio
-        audio = pdf.audio_files[0]
-        
-        # Verifica se o arquivo existe fisicamente
-        audio_path = os.path.join(current_app.config['AUDIO_FOLDER'], audio.file_path)
-        if not os.path.exists(audio_path):
+        # Verifica se os arquivos existem fisicamente e não estão vazios
+        audio_paths = [os.path.join(current_app.config['AUDIO_FOLDER'], audio.file_path) for audio in audios]
+        if not all(os.path.exists(path) for path in audio_paths):
             flash('Arquivo de áudio não encontrado no servidor.', 'danger')
             return redirect(url_for('pdf.dashboard'))
-            
-        # Verifica o tamanho do arquivo
-        file_size = os.path.getsize(audio_path)
-        if file_size == 0:
+        if any(os.path.getsize(path) == 0 for path in audio_paths):
             flash('O arquivo de áudio está corrompido.', 'danger')
             return redirect(url_for('pdf.dashboard'))
         
         # Nome para o arquivo de download (remove caracteres especiais)
         safe_title = re.sub(r'[^a-zA-Z0-9_-]', '_', pdf.title)
+        if chapter is not None and len(pdf.audio_files) > 1:
+            safe_title = f"{safe_title}_{chapter + 1:03d}"
         download_name = f"{safe_title}.mp3"
         
-        # Configura os headers para streaming
-        def generate():
-            with open(audio_path, 'rb') as f:
-                while True:
-                    chunk = f.read(8192)  # 8KB por chunk
-                    if not chunk:
-                        break
-                    yield chunk
-        
-        response = Response(generate(), mimetype='audio/mpeg')
-        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
-        response.headers['Content-Length'] = file_size
-        return response
+        if len(audios) == 1:
+            return _send_audio_file(audios[0], audio_paths[0], download_name)
+        return _send_chapters(audio_paths, download_name)
         
+    except HTTPException:
+        # Ex.: 404 do PDF ou 416 para um intervalo fora do arquivo
+        raise
     except Exception as e:
-        print(f"[Download] ERRO: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception(f"[Download] ERRO: {e}")
         flash('Erro ao baixar o arquivo de áudio. Por favor, tente novamente.', 'danger')
         return redirect(url_for('pdf.dashboard'))
 
+def parse_pdf_ids(value):
+    """Lista de ids separados por vírgula (?ids=1,2,3); None se não informada"""
+    if not value:
+        return None
+    return {int(part) for part in value.split(',') if part.strip().isdigit()}
+
+def active_pdf_ids(user_id):
+    """PDFs do usuário com conversão na fila ou em andamento"""
+    return {pdf_id for (pdf_id,) in db.session.query(ConversionJob.pdf_id).filter(
+        ConversionJob.user_id == user_id,
+        ConversionJob.kind == ConversionJob.CONVERT,
+        ConversionJob.status.in_(ConversionJob.ACTIVE_STATES)
+    )}
+
+def build_status(user_id, pdf_ids=None):
+    """
+    Estado de conversão dos PDFs do usuário (ou só dos pdf_ids), com uma consulta
+    para os PDFs e outra para os jobs
+    """
+    query = PDF.query_with_status(user_id)
+    jobs_query = ConversionJob.query.filter(
+        ConversionJob.user_id == user_id,
+        ConversionJob.kind == ConversionJob.CONVERT,
+        ConversionJob.status.in_(ConversionJob.ACTIVE_STATES)
+    )
+    if pdf_ids is not None:
+        if not pdf_ids:
+            return []
+        query = query.filter(PDF.id.in_(pdf_ids))
+        jobs_query = jobs_query.filter(ConversionJob.pdf_id.in_(pdf_ids))
+    rows = [(pdf.id, status) for pdf, status in query]
+    jobs = {job.pdf_id: job for job in jobs_query}
+    
+    statuses = []
+    for pdf_id, status in rows:
+        job = jobs.get(pdf_id)
+        statuses.append({
+            'id': pdf_id,
+            'status': status,
+            'job_state': job.status if job else None,
+            'percent': job.get_percent() if job else (100 if status == 'Convertido' else 0),
+            'pages_done': job.pages_done if job else None,
+            'pages_total': job.pages_total if job else None,
+            'segments_done': job.segments_done if job else None
+        })
+    return statuses
+
+@pdf_bp.route('/api/status')
+@login_required
+def conversion_status():
+    """Estado de conversão dos PDFs do usuário (ou só dos informados em ?ids=) em JSON"""
+    return jsonify({'pdfs': build_status(current_user.id, parse_pdf_ids(request.args.get('ids')))})
+
+@pdf_bp.route('/api/status/stream')
+@login_required
+def conversion_status_stream():
+    """
+    Envia (server-sent events) o estado dos PDFs em processamento sempre que ele muda
+
+    A cada intervalo, só a data da última alteração nos jobs do usuário é lida; os PDFs
+    são consultados quando ela muda, e apenas os em processamento (mais os informados em
+    ?ids=, que a página mostra em processamento). Sem conexões livres no processo, responde
+    503 e a página passa a consultar /api/status.
+    """
+    if not _status_streams.acquire(blocking=False):
+        response = jsonify({'error': 'Muitas conexões de acompanhamento abertas.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STATUS_STREAM_RETRY_MS // 1000)
+        return response
+    
+    user_id = current_user.id
+    requested_ids = parse_pdf_ids(request.args.get('ids')) or set()
+    
+    def generate():
+        # O navegador reconecta sozinho quando a conexão é encerrada
+        yield f"retry: {STATUS_STREAM_RETRY_MS}\n\n"
+        tracked = requested_ids
+        last_update = None
+        last_payload = None
+        last_sent = time.monotonic()
+        deadline = last_sent + STATUS_STREAM_MAX_SECONDS
+        
+        while time.monotonic() < deadline:
+            # Encerra a transação para enxergar o estado atual
+            db.session.rollback()
+            update = ConversionJob.last_update(user_id)
+            payload = last_payload
+            if last_payload is None or update != last_update:
+                last_update = update
+                # Os PDFs que deixaram de estar em processamento são enviados uma última vez
+                statuses = build_status(user_id, tracked | active_pdf_ids(user_id))
+                tracked = {status['id'] for status in statuses if status['status'] == 'Em Processamento'}
+                payload = json.dumps({'pdfs': statuses})
+            
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > 15:
+                # Comentário para manter a conexão aberta em proxies
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            
+            time.sleep(STATUS_STREAM_POLL_SECONDS)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Libera a vaga quando o servidor fecha a resposta (fim do fluxo ou cliente desconectado)
+    response.call_on_close(_status_streams.release)
+    return response
+
+@pdf_bp.route('/listen/<int:pdf_id>', defaults={'chapter': 0})
+@pdf_bp.route('/listen/<int:pdf_id>/chapters/<int:chapter>')
+@login_required
+@subscription_required
+def listen_audio(pdf_id, chapter):
+    """
+    Transmite o áudio de um capítulo em ordem enquanto os segmentos são sintetizados
+
+    A transmissão termina se nenhum segmento novo aparecer em LISTEN_IDLE_SECONDS ou
+    depois de LISTEN_MAX_SECONDS esperando; o dashboard usa a playlist HLS, que não
+    mantém a conexão aberta. Com o capítulo já convertido, ?t=<segundos> começa a transmissão no frame
+    correspondente àquele instante.
+    """
+    pdf = PDF.query.filter_by(id=pdf_id, user_id=current_user.id).first_or_404()
+    segment_folder = segment_folder_path(current_app.config['SEGMENT_FOLDER'], pdf.id, chapter)
+    audio_folder = current_app.config['AUDIO_FOLDER']
+    
+    start_offset = 0
+    seconds = request.args.get('t', type=float)
+    ready = pdf.get_audio(chapter)
+    if seconds and ready:
+        _, start_offset = ready.seek(seconds)
+    
+    def generate():
+        index = 0
+        sent = 0
+        last_data = time.monotonic()
+        deadline = last_data + LISTEN_MAX_SECONDS
+        
+        # Áudio pronto e posição pedida: pula direto para o arquivo final
+        if start_offset:
+            index = None
+            sent = start_offset
+        while True:
+            # Envia o próximo segmento, se já estiver pronto
+            data = None
+            if index is not None:
+                try:
+                    with open(os.path.join(segment_folder, segment_filename(index)), 'rb') as f:
+                        data = f.read()
+                except OSError:
+                    pass
+            
+            if data is not None:
+                yield data
+                sent += len(data)
+                index += 1
+                last_data = time.monotonic()
+                continue
+            
+            # Encerra a transação para enxergar o estado atual da conversão
+            db.session.rollback()
+            current = db.session.get(PDF, pdf_id)
+            if current is None:
+                return
+            
+            # Capítulo concluído: o arquivo final é a concatenação dos segmentos,
+            # então continua a partir do mesmo byte
+            audio = current.get_audio(chapter)
+            if audio:
+                with open(os.path.join(audio_folder, audio.file_path), 'rb') as f:
+                    f.seek(sent)
+                    while True:
+                        chunk = f.read(64 * 1024)
+                        if not chunk:
+                            return
+                        yield chunk
+            
+            if not current.is_processing:
+                return
+            
+            # Conversão parada (ex.: processo encerrado antes da recuperação do job) ou
+            # capítulo que ainda não começou: não prende a thread indefinidamente
+            now = time.monotonic()
+            if now >= deadline or now - last_data >= LISTEN_IDLE_SECONDS:
+                logger.info(f"[Listen] Encerrando a transmissão do PDF {pdf_id}, capítulo {chapter}: sem novos segmentos")
+                return
+            
+            time.sleep(LISTEN_POLL_SECONDS)
+    
+    response = Response(stream_with_context(generate()), mimetype='audio/mpeg')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@pdf_bp.route('/api/audio/<int:pdf_id>/seek')
+@login_required
+@subscription_required
+def seek_audio(pdf_id):
+    """
+    Converte um instante (?t=<segundos>) no byte do arquivo de áudio onde começar a tocar
+
+    O instante é relativo ao capítulo informado em ?chapter= (padrão: o primeiro).
+    """
+    pdf = PDF.query.filter_by(id=pdf_id, user_id=current_user.id).first_or_404()
+    chapter = request.args.get('chapter', default=0, type=int)
+    audio = pdf.get_audio(chapter)
+    if not audio:
+        return jsonify({'error': 'Este capítulo ainda não foi convertido para áudio.'}), 404
+    
+    seconds = request.args.get('t', default=0.0, type=float)
+    seconds = min(max(seconds, 0.0), audio.duration or 0.0)
+    time_at, offset = audio.seek(seconds)
+    return jsonify({
+        'chapter': chapter,
+        't': seconds,
+        'time': time_at,
+        'offset': offset,
+        'duration': audio.duration,
+        'range': f"bytes={offset}-",
+        'url': url_for('pdf.download_audio', pdf_id=pdf.id, chapter=chapter)
+    })
+
+@pdf_bp.route('/listen/<int:pdf_id>/playlist.m3u8', defaults={'chapter': 0})
+@pdf_bp.route('/listen/<int:pdf_id>/chapters/<int:chapter>/playlist.m3u8')
+@login_required
+@subscription_required
+def listen_playlist(pdf_id, chapter):
+    """Playlist HLS de um capítulo, que cresce à medida que a conversão avança"""
+    pdf = PDF.query.filter_by(id=pdf_id, user_id=current_user.id).first_or_404()
+    segment_folder = segment_folder_path(current_app.config['SEGMENT_FOLDER'], pdf.id, chapter)
+    
+    if os.path.exists(os.path.join(segment_folder, PLAYLIST_NAME)):
+        response = send_from_directory(segment_folder, PLAYLIST_NAME, mimetype='application/vnd.apple.mpegurl', max_age=0)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    # Capítulo concluído: a playlist aponta para o arquivo completo
+    audio = pdf.get_audio(chapter)
+    if audio:
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{int(audio.duration or 1) + 1}',
+            f'#EXTINF:{audio.duration or 0:.3f},',
+            url_for('pdf.download_audio', pdf_id=pdf.id, chapter=chapter),
+            '#EXT-X-ENDLIST'
+        ]
+        return Response("\n".join(lines) + "\n", mimetype='application/vnd.apple.mpegurl')
+    
+    return Response(status=404)
+
+@pdf_bp.route('/listen/<int:pdf_id>/segments/<filename>', defaults={'chapter': 0})
+@pdf_bp.route('/listen/<int:pdf_id>/chapters/<int:chapter>/segments/<filename>')
+@login_required
+@subscription_required
+def listen_segment(pdf_id, filename, chapter):
+    """Serve um segmento já sintetizado"""
+    pdf = PDF.query.filter_by(id=pdf_id, user_id=current_user.id).first_or_404()
+    segment_folder = segment_folder_path(current_app.config['SEGMENT_FOLDER'], pdf.id, chapter)
+    return send_from_directory(segment_folder, filename, mimetype='audio/mpeg', conditional=True)
+
+@pdf_bp.route('/pdfs/<int:pdf_id>/file')
+@login_required
+def view_pdf(pdf_id):
+    """Entrega o PDF enviado ao seu dono (a pasta de uploads não é pública)"""
+    pdf = PDF.query.filter_by(id=pdf_id, user_id=current_user.id).first_or_404()
+    # Vários PDFs podem apontar para o mesmo blob, então o nome vem do registro do usuário
+    return send_from_directory(
+        current_app.config['UPLOAD_FOLDER'],
+        pdf.file_path,
+        mimetype='application/pdf',
+        download_name=pdf.filename,
+        conditional=True,
+        max_age=0
+    )
+
 @pdf_bp.route('/delete/<int:pdf_id>', methods=['POST'])
 @login_required
 @subscription_required
@@ -347,15 +1084,21 @@ def delete_pdf(pdf_id):
     pdf = PDF.query.filter_by(id=pdf_id, user_id=current_user.id).first_or_404()
     
     try:
-        # Remove o arquivo PDF
-        pdf_path = os.path.join(current_app.config['UPLOAD_FOLDER'], pdf.file_path)
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
+        # Remove o arquivo PDF e o texto extraído, a menos que outro upload com o mesmo conteúdo ainda os use
+        if pdf.count_file_references() <= 1:
+            pdf_path = os.path.join(current_app.config['UPLOAD_FOLDER'], pdf.file_path)
+            store_path = text_store_path(current_app.config['TEXT_FOLDER'], text_store_key(pdf))
+            for path in (pdf_path, store_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        # Remove os segmentos de uma conversão em andamento ou interrompida
+        SegmentPlaylist.remove(segment_folder_path(current_app.config['SEGMENT_FOLDER'], pdf.id))
         
-        # Remove os arquivos de áudio associados
+        # Remove os arquivos de áudio associados que não são compartilhados
         for audio in pdf.audio_files:
             audio_path = os.path.join(current_app.config['AUDIO_FOLDER'], audio.file_path)
-            if os.path.exists(audio_path):
+            if audio.count_file_references() <= 1 and os.path.exists(audio_path):
                 os.remove(audio_path)
         
         # Remove o registro do banco de dados
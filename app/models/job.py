@@ -0,0 +1,71 @@
+from app.models.db import db
+from datetime import datetime
+from sqlalchemy import func
+
+class ConversionJob(db.Model):
+    __tablename__ = 'conversion_job'
+    __table_args__ = (
+        db.Index('ix_conversion_job_user_kind_status', 'user_id', 'kind', 'status'),
+        db.Index('ix_conversion_job_user_updated', 'user_id', 'updated_at'),
+    )
+
+    # Estados possíveis de um job
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    ACTIVE_STATES = (QUEUED, RUNNING)
+
+    # Tipos de job: conversão para áudio ou extração do texto logo após o upload
+    CONVERT = 'convert'
+    EXTRACT = 'extract'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), default=CONVERT, nullable=False)
+    status = db.Column(db.String(20), default=QUEUED, nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+
+    # Lease: o worker que pegou o job precisa renová-lo (heartbeat) antes de expirar,
+    # caso contrário o job é considerado abandonado e volta a ser executado
+    worker_id = db.Column(db.String(100), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    # Progresso: páginas lidas e segmentos de áudio enviados/concluídos
+    pages_done = db.Column(db.Integer, default=0, nullable=False)
+    pages_total = db.Column(db.Integer, nullable=True)
+    segments_done = db.Column(db.Integer, default=0, nullable=False)
+    segments_submitted = db.Column(db.Integer, default=0, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Última alteração do job (estado, progresso ou lease); o fluxo de estado do
+    # dashboard só consulta os PDFs quando a mais recente do usuário muda
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Relacionamento com o PDF e o usuário
+    pdf_id = db.Column(db.Integer, db.ForeignKey('pdf.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    @classmethod
+    def last_update(cls, user_id):
+        """Momento da última alteração nos jobs do usuário (uma leitura do índice)"""
+        return db.session.query(func.max(cls.updated_at)).filter(cls.user_id == user_id).scalar()
+
+    def is_active(self):
+        return self.status in self.ACTIVE_STATES
+
+    def get_percent(self):
+        """Percentual concluído estimado (0-100)"""
+        if self.status == self.DONE:
+            return 100
+        if not self.pages_total:
+            return 0
+        pages_fraction = min(self.pages_done / self.pages_total, 1.0)
+        if self.kind == self.EXTRACT:
+            return int(pages_fraction * 100)
+        # O texto das páginas lidas é dividido em segmentos; a síntese avança sobre eles
+        synthesized_fraction = self.segments_done / self.segments_submitted if self.segments_submitted else 0.0
+        return int(pages_fraction * synthesized_fraction * 100)
@@ -0,0 +1,277 @@
+from sqlalchemy import (
+    text, inspect, MetaData, Table, Column, ForeignKey, Index, Integer, BigInteger, String, Text, Boolean,
+    DateTime, Float, LargeBinary
+)
+from sqlalchemy.exc import IntegrityError
+from flask import current_app, has_app_context
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Migrações versionadas do esquema. Cada migração recebe a conexão (dentro da
+# transação da atualização) e deve funcionar tanto em bancos novos quanto em
+# bancos criados antes do controle de versões. Novas migrações entram no fim da lista
+# e descrevem o esquema por conta própria, sem usar os modelos atuais: assim um banco
+# novo passa pelas mesmas etapas que um antigo.
+
+# Esquema da versão 1: os modelos no momento em que as migrações passaram a ser versionadas
+_SCHEMA_V1 = MetaData()
+
+Table(
+    'user', _SCHEMA_V1,
+    Column('id', Integer, primary_key=True),
+    Column('email', String(100), unique=True),
+    Column('password_hash', String(200)),
+    Column('name', String(100)),
+    Column('created_at', DateTime),
+    Column('stripe_customer_id', String(100), nullable=True, index=True),
+    Column('stripe_subscription_id', String(100), nullable=True),
+    Column('subscription_status', String(50)),
+    Column('subscription_end_date', DateTime, nullable=True)
+)
+
+Table(
+    'pdf', _SCHEMA_V1,
+    Column('id', Integer, primary_key=True),
+    Column('title', String(200)),
+    Column('filename', String(200)),
+    Column('upload_date', DateTime),
+    Column('file_size', Integer),
+    Column('page_count', Integer),
+    Column('file_path', String(300)),
+    Column('content_hash', String(64), nullable=True, index=True),
+    Column('is_processing', Boolean),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Index('ix_pdf_user_upload_date', 'user_id', 'upload_date', 'id')
+)
+
+Table(
+    'audio_file', _SCHEMA_V1,
+    Column('id', Integer, primary_key=True),
+    Column('filename', String(200)),
+    Column('file_path', String(300)),
+    Column('creation_date', DateTime),
+    Column('duration', Float, nullable=True),
+    Column('pdf_id', Integer, ForeignKey('pdf.id'), nullable=False, index=True)
+)
+
+Table(
+    'conversion_job', _SCHEMA_V1,
+    Column('id', Integer, primary_key=True),
+    Column('kind', String(20), nullable=False),
+    Column('status', String(20), nullable=False, index=True),
+    Column('attempts', Integer, nullable=False),
+    Column('error', Text, nullable=True),
+    Column('worker_id', String(100), nullable=True),
+    Column('lease_expires_at', DateTime, nullable=True),
+    Column('heartbeat_at', DateTime, nullable=True),
+    Column('pages_done', Integer, nullable=False),
+    Column('pages_total', Integer, nullable=True),
+    Column('segments_done', Integer, nullable=False),
+    Column('segments_submitted', Integer, nullable=False),
+    Column('created_at', DateTime),
+    Column('started_at', DateTime, nullable=True),
+    Column('finished_at', DateTime, nullable=True),
+    Column('pdf_id', Integer, ForeignKey('pdf.id'), nullable=False, index=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Index('ix_conversion_job_user_kind_status', 'user_id', 'kind', 'status')
+)
+
+# Tabela de uploads em partes, como criada pela migração 7 (as tabelas referenciadas
+# aparecem só com a chave primária, para resolver as chaves estrangeiras)
+_SCHEMA_V7 = MetaData()
+Table('user', _SCHEMA_V7, Column('id', Integer, primary_key=True))
+Table('pdf', _SCHEMA_V7, Column('id', Integer, primary_key=True))
+Table(
+    'upload_session', _SCHEMA_V7,
+    Column('id', String(32), primary_key=True),
+    Column('status', String(20), nullable=False),
+    Column('title', String(200), nullable=False),
+    Column('filename', String(200), nullable=False),
+    Column('length', BigInteger, nullable=False),
+    Column('offset', BigInteger, nullable=False),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+    Column('expires_at', DateTime, nullable=False, index=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False, index=True),
+    Column('pdf_id', Integer, ForeignKey('pdf.id', ondelete='SET NULL'), nullable=True)
+)
+
+
+def _create_tables(conn):
+    # Bancos novos recebem o esquema da versão 1; nos antigos, só as tabelas ausentes
+    _SCHEMA_V1.create_all(conn)
+
+
+def _add_columns(conn, table, columns):
+    existing = {column['name'] for column in inspect(conn).get_columns(table)}
+    quoted_table = conn.dialect.identifier_preparer.quote(table)
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {quoted_table} ADD COLUMN {name} {ddl}"))
+            logger.info(f"[DB-Migrate] Coluna {table}.{name} adicionada")
+
+
+def _legacy_columns(conn):
+    # Colunas que eram adicionadas pela antiga rota /migrate-db
+    _add_columns(conn, 'pdf', [
+        ('is_processing', "BOOLEAN DEFAULT FALSE"),
+        ('content_hash', "VARCHAR(64)")
+    ])
+    _add_columns(conn, 'conversion_job', [
+        ('kind', "VARCHAR(20) NOT NULL DEFAULT 'convert'"),
+        ('pages_done', "INTEGER NOT NULL DEFAULT 0"),
+        ('pages_total', "INTEGER"),
+        ('segments_done', "INTEGER NOT NULL DEFAULT 0"),
+        ('segments_submitted', "INTEGER NOT NULL DEFAULT 0")
+    ])
+
+
+def _create_indexes(conn):
+    # Índices do esquema da versão 1 que ainda não existem no banco
+    for table in _SCHEMA_V1.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _remove_unreferenced_audio(conn, file_paths):
+    # Remove do disco os áudios que nenhum registro usa mais; sem a pasta configurada
+    # (migração fora da aplicação), apenas informa quais arquivos podem ser apagados
+    audio_folder = current_app.config.get('AUDIO_FOLDER') if has_app_context() else None
+    for file_path in sorted(set(file_paths)):
+        if conn.execute(text("SELECT COUNT(*) FROM audio_file WHERE file_path = :path"), {'path': file_path}).scalar():
+            continue
+        path = os.path.join(audio_folder, file_path) if audio_folder else file_path
+        if audio_folder and os.path.exists(path):
+            os.remove(path)
+            logger.info(f"[DB-Migrate] Arquivo removido: {path}")
+        elif not audio_folder:
+            logger.warning(f"[DB-Migrate] Arquivo sem registro, pode ser apagado da pasta de áudios: {path}")
+
+
+def _remove_placeholder_audio(conn):
+    # Arquivos de silêncio gravados quando a síntese falhava não são conversões;
+    # sem eles os PDFs voltam a aparecer como pendentes e podem ser convertidos
+    # (os áudios válidos têm como nome um uuid em hexadecimal). Eram gravados pelo
+    # serviço de TTS (<uuid>_empty.mp3) e pela rota de conversão (fallback_<id>.mp3)
+    placeholders = ("FROM audio_file WHERE filename LIKE '%!_empty.mp3' ESCAPE '!' "
+                    "OR filename LIKE 'fallback!_%.mp3' ESCAPE '!'")
+    file_paths = [row[0] for row in conn.execute(text(f"SELECT file_path {placeholders}")) if row[0]]
+    result = conn.execute(text(f"DELETE {placeholders}"))
+    if result.rowcount:
+        logger.info(f"[DB-Migrate] {result.rowcount} áudios de silêncio removidos")
+        _remove_unreferenced_audio(conn, file_paths)
+
+
+def _audio_seek_table(conn):
+    # Áudios antigos ficam sem tabela; ela é criada em segundo plano (AudioFile.index_missing_seek_tables)
+    _add_columns(conn, 'audio_file', [
+        ('seek_table', LargeBinary().compile(dialect=conn.dialect)),
+        ('seek_interval', "FLOAT")
+    ])
+
+
+def _chapters(conn):
+    # Áudios existentes correspondem ao livro inteiro (capítulo 0)
+    _add_columns(conn, 'pdf', [
+        ('chapter_plan', "TEXT"),
+        ('chapter_count', "INTEGER")
+    ])
+    _add_columns(conn, 'audio_file', [
+        ('chapter_index', "INTEGER NOT NULL DEFAULT 0"),
+        ('chapter_title', "VARCHAR(300)"),
+        ('start_page', "INTEGER"),
+        ('end_page', "INTEGER")
+    ])
+
+
+def _upload_sessions(conn):
+    _SCHEMA_V7.create_all(conn, tables=[_SCHEMA_V7.tables['upload_session']])
+
+
+def _unique_audio_chapters(conn):
+    # Jobs repetidos registravam o mesmo capítulo mais de uma vez; mantém o primeiro
+    # registro de cada capítulo antes de criar o índice único
+    rows = conn.execute(text(
+        "SELECT id, pdf_id, chapter_index, file_path FROM audio_file ORDER BY pdf_id, chapter_index, id"
+    )).fetchall()
+    seen = set()
+    duplicates = []
+    for audio_id, pdf_id, chapter_index, file_path in rows:
+        if (pdf_id, chapter_index) in seen:
+            duplicates.append((audio_id, file_path))
+        seen.add((pdf_id, chapter_index))
+    
+    for audio_id, _ in duplicates:
+        conn.execute(text("DELETE FROM audio_file WHERE id = :id"), {'id': audio_id})
+    if duplicates:
+        logger.info(f"[DB-Migrate] {len(duplicates)} áudios de capítulos duplicados removidos")
+        _remove_unreferenced_audio(conn, [file_path for _, file_path in duplicates if file_path])
+    
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_audio_file_pdf_chapter ON audio_file (pdf_id, chapter_index)"
+    ))
+
+
+def _job_updated_at(conn):
+    # Jobs existentes ficam sem data de alteração até a próxima mudança
+    _add_columns(conn, 'conversion_job', [
+        ('updated_at', DateTime().compile(dialect=conn.dialect))
+    ])
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_conversion_job_user_updated ON conversion_job (user_id, updated_at)"
+    ))
+
+
+MIGRATIONS = [
+    (1, 'Cria as tabelas ausentes', _create_tables),
+    (2, 'Adiciona as colunas criadas antes do controle de versões', _legacy_columns),
+    (3, 'Cria os índices declarados nos modelos', _create_indexes),
+    (4, 'Remove os áudios de silêncio registrados como conversões', _remove_placeholder_audio),
+    (5, 'Adiciona a tabela de busca por tempo dos áudios', _audio_seek_table),
+    (6, 'Adiciona os capítulos dos livros e dos áudios', _chapters),
+    (7, 'Cria a tabela de uploads em partes', _upload_sessions),
+    (8, 'Remove os capítulos duplicados e impede novas duplicações', _unique_audio_chapters),
+    (9, 'Remove os áudios de silêncio da rota de conversão e os arquivos', _remove_placeholder_audio),
+    (10, 'Registra a última alteração de cada job', _job_updated_at),
+]
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)"))
+    try:
+        with engine.begin() as conn:
+            if conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar() == 0:
+                conn.execute(text("INSERT INTO schema_version (id, version) VALUES (1, 0)"))
+    except IntegrityError:
+        # Outro processo criou a linha ao mesmo tempo
+        pass
+
+
+def current_version(engine):
+    """Versão do esquema aplicada ao banco (0 se nunca foi migrado)"""
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+
+
+def upgrade(engine):
+    """Aplica as migrações pendentes e retorna a versão final do esquema"""
+    _ensure_version_table(engine)
+    with engine.begin() as conn:
+        # A atualização da linha de versão bloqueia os demais processos (ex.: outros
+        # workers do gunicorn) até o fim desta transação, então cada migração roda uma vez
+        conn.execute(text("UPDATE schema_version SET version = version WHERE id = 1"))
+        version = conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+
+        for number, description, migrate in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info(f"[DB-Migrate] Aplicando migração {number}: {description}")
+            migrate(conn)
+            version = number
+
+        conn.execute(text("UPDATE schema_version SET version = :version WHERE id = 1"), {'version': version})
+    return version
@@ -1,9 +1,18 @@
 from app.models.db import db
 from datetime import datetime
+import json
+from sqlalchemy import case, func, select
+import os
+from app.utils.mp3_index import seek_offset, scan_mp3_file, MP3_SEEK_INTERVAL_SECONDS
 
 class PDF(db.Model):
     __tablename__ = 'pdf'  # Definindo explicitamente o nome da tabela em minúsculas
     
+    # Índice usado pela listagem do dashboard (PDFs do usuário, mais recentes primeiro)
+    __table_args__ = (
+        db.Index('ix_pdf_user_upload_date', 'user_id', 'upload_date', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200))
     filename = db.Column(db.String(200))
@@ -14,14 +23,84 @@ class PDF(db.Model):
     # Caminho relativo para o arquivo PDF
     file_path = db.Column(db.String(300))
     
+    # Hash SHA-256 do conteúdo; PDFs idênticos compartilham o mesmo arquivo
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+    
     # Status de processamento
     is_processing = db.Column(db.Boolean, default=False)
     
+    # Capítulos definidos na primeira conversão (JSON com título e páginas de cada um);
+    # cada capítulo convertido gera um AudioFile
+    chapter_plan = db.Column(db.Text, nullable=True)
+    chapter_count = db.Column(db.Integer, nullable=True)
+    
     # Relacionamento com o usuário
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     # Relacionamento com os áudios
-    audio_files = db.relationship('AudioFile', backref='pdf', lazy=True, cascade="all, delete-orphan")
+    audio_files = db.relationship('AudioFile', backref='pdf', lazy=True, cascade="all, delete-orphan",
+                                  order_by='AudioFile.chapter_index')
+    
+    # Relacionamento com os jobs de conversão
+    jobs = db.relationship('ConversionJob', backref='pdf', lazy=True, cascade="all, delete-orphan")
+    
+    def count_file_references(self):
+        """Conta quantos PDFs (incluindo este) usam o mesmo arquivo armazenado"""
+        return PDF.query.filter_by(file_path=self.file_path).count()
+    
+    def find_converted_duplicate(self):
+        """Retorna outro PDF com o mesmo conteúdo que já tenha sido convertido por completo"""
+        if not self.content_hash:
+            return None
+        candidates = PDF.query.filter(
+            PDF.content_hash == self.content_hash,
+            PDF.id != self.id,
+            PDF.audio_files.any()
+        )
+        for candidate in candidates:
+            if candidate.is_converted():
+                return candidate
+        return None
+    
+    def get_chapter_plan(self):
+        """Lista de capítulos ({index, title, start_page, end_page}) ou None se ainda não definida"""
+        return json.loads(self.chapter_plan) if self.chapter_plan else None
+    
+    def set_chapter_plan(self, plan):
+        self.chapter_plan = json.dumps(plan, ensure_ascii=False)
+        self.chapter_count = len(plan)
+    
+    def is_converted(self):
+        """Indica se todos os capítulos já têm áudio"""
+        return bool(self.audio_files) and len(self.audio_files) >= (self.chapter_count or 1)
+    
+    def get_audio(self, chapter=0):
+        """Áudio de um capítulo, ou None se ainda não foi convertido"""
+        for audio in self.audio_files:
+            if audio.chapter_index == chapter:
+                return audio
+        return None
+    
+    @classmethod
+    def query_with_status(cls, user_id):
+        """
+        Consulta os PDFs do usuário junto com o status calculado no banco,
+        sem carregar os áudios de cada PDF
+        """
+        # Contagem correlacionada: usa o índice audio_file.pdf_id só para os PDFs
+        # retornados, em vez de agrupar a tabela de áudios inteira
+        audio_count = select(func.count(AudioFile.id)) \
+            .where(AudioFile.pdf_id == cls.id) \
+            .correlate(cls) \
+            .scalar_subquery()
+        
+        status = case(
+            (cls.is_processing == True, 'Em Processamento'),
+            (audio_count >= func.coalesce(cls.chapter_count, 1), 'Convertido'),
+            else_='Pendente'
+        ).label('status')
+        
+        return db.session.query(cls, status).filter(cls.user_id == user_id)
     
     def get_status(self):
         # Verifica se o atributo is_processing existe e é True
@@ -32,8 +111,8 @@ class PDF(db.Model):
             # Ignora erros se a coluna ainda não existe
             pass
         
-        # Verifica se existem arquivos de áudio
-        if not self.audio_files:
+        # Verifica se todos os capítulos têm áudio
+        if not self.is_converted():
             return "Pendente"
         else:
             return "Convertido"
@@ -42,11 +121,66 @@ class PDF(db.Model):
 class AudioFile(db.Model):
     __tablename__ = 'audio_file'  # Definindo explicitamente o nome da tabela
     
+    # Cada capítulo de um PDF tem um único áudio (um job repetido não cria outro registro)
+    __table_args__ = (
+        db.Index('ux_audio_file_pdf_chapter', 'pdf_id', 'chapter_index', unique=True),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(200))
     file_path = db.Column(db.String(300))
     creation_date = db.Column(db.DateTime, default=datetime.utcnow)
     duration = db.Column(db.Float, nullable=True)  # Duração em segundos
     
+    # Tabela de busca: offset do frame MP3 a cada seek_interval segundos (ver app/utils/mp3_index.py)
+    seek_table = db.Column(db.LargeBinary, nullable=True)
+    seek_interval = db.Column(db.Float, nullable=True)
+    
+    # Capítulo do livro a que o áudio corresponde (páginas [start_page, end_page))
+    chapter_index = db.Column(db.Integer, default=0, nullable=False)
+    chapter_title = db.Column(db.String(300), nullable=True)
+    start_page = db.Column(db.Integer, nullable=True)
+    end_page = db.Column(db.Integer, nullable=True)
+    
     # Relacionamento com o PDF - corrigindo a referência para usar o nome da tabela em minúsculas
-    pdf_id = db.Column(db.Integer, db.ForeignKey('pdf.id'), nullable=False)
\ No newline at end of file
+    pdf_id = db.Column(db.Integer, db.ForeignKey('pdf.id'), nullable=False, index=True)
+    
+    def count_file_references(self):
+        """Conta quantos registros de áudio (incluindo este) usam o mesmo arquivo"""
+        return AudioFile.query.filter_by(file_path=self.file_path).count()
+    
+    def seek(self, seconds):
+        """Retorna (tempo, offset em bytes) de onde começar a tocar para chegar a seconds"""
+        return seek_offset(self.seek_table, seconds, self.seek_interval or MP3_SEEK_INTERVAL_SECONDS)
+    
+    @classmethod
+    def index_missing_seek_tables(cls, audio_folder, limit=20):
+        """
+        Cria a tabela de busca de até limit arquivos que ainda não a têm (áudios anteriores
+        a ela); retorna quantos arquivos foram processados
+
+        Cada arquivo é gravado em sua própria transação, então a varredura não segura o
+        banco. Arquivos ausentes recebem uma tabela vazia (tocam do início) para não serem
+        tentados de novo.
+        """
+        file_paths = [row[0] for row in db.session.query(cls.file_path).filter(
+            cls.seek_table.is_(None), cls.file_path.isnot(None)
+        ).distinct().limit(limit)]
+        db.session.rollback()
+        
+        for file_path in file_paths:
+            path = os.path.join(audio_folder, file_path)
+            values = {cls.seek_table: b'', cls.seek_interval: MP3_SEEK_INTERVAL_SECONDS}
+            if os.path.exists(path):
+                index = scan_mp3_file(path)
+                values = {
+                    cls.seek_table: index.pack_seek_table(),
+                    cls.seek_interval: MP3_SEEK_INTERVAL_SECONDS,
+                    cls.duration: index.duration
+                }
+            # Todos os registros que compartilham o arquivo recebem a mesma tabela; outro
+            # processo pode ter indexado o arquivo enquanto este o lia
+            cls.query.filter(cls.file_path == file_path, cls.seek_table.is_(None)) \
+                .update(values, synchronize_session=False)
+            db.session.commit()
+        return len(file_paths)
@@ -0,0 +1,45 @@
+from app.models.db import db
+from datetime import datetime, timedelta
+
+class UploadSession(db.Model):
+    """
+    Upload de um PDF em partes (protocolo no estilo tus)
+
+    O cliente cria a sessão informando o tamanho total, envia as partes em ordem
+    (cada uma a partir do offset já recebido) e finaliza o upload, que então vira
+    um PDF. O arquivo parcial fica em disco, então uma conexão interrompida
+    continua do último byte recebido.
+    """
+    __tablename__ = 'upload_session'
+
+    # Estados possíveis de uma sessão
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+
+    # Identificador aleatório usado na URL da sessão
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(20), default=UPLOADING, nullable=False)
+
+    title = db.Column(db.String(200), nullable=False)
+    filename = db.Column(db.String(200), nullable=False)
+    length = db.Column(db.BigInteger, nullable=False)
+    offset = db.Column(db.BigInteger, default=0, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    # Relacionamento com o usuário e com o PDF criado ao finalizar
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    pdf_id = db.Column(db.Integer, db.ForeignKey('pdf.id', ondelete='SET NULL'), nullable=True)
+
+    def is_expired(self):
+        return self.expires_at < datetime.utcnow()
+
+    def touch(self, hours):
+        """Registra atividade na sessão e adia a expiração"""
+        self.updated_at = datetime.utcnow()
+        self.expires_at = self.updated_at + timedelta(hours=hours)
+
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.offset}/{self.length}>'
@@ -11,7 +11,7 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Campos relacionados à assinatura
-    stripe_customer_id = db.Column(db.String(100), nullable=True)
+    stripe_customer_id = db.Column(db.String(100), nullable=True, index=True)
     stripe_subscription_id = db.Column(db.String(100), nullable=True)
     subscription_status = db.Column(db.String(50), default='inactive')
     subscription_end_date = db.Column(db.DateTime, nullable=True)
@@ -28,13 +28,10 @@ class User(UserMixin, db.Model):
     def is_subscribed(self):
         # Verifica se o status está ativo
         if self.subscription_status != 'active':
-            print(f"Usuário {self.email} não está inscrito - status: {self.subscription_status}")
             return False
             
         # Verifica a data de expiração
         if self.subscription_end_date is not None and self.subscription_end_date < datetime.utcnow():
-            print(f"Usuário {self.email} com assinatura expirada em {self.subscription_end_date}")
             return False
             
-        print(f"Usuário {self.email} com assinatura ativa até {self.subscription_end_date}")
-        return True 
\ No newline at end of file
+        return True
@@ -29,16 +29,49 @@ document.addEventListener('DOMContentLoaded', function() {
                     return;
                 }
                 
-                // Verifica o tamanho máximo (16MB)
-                const maxSize = 16 * 1024 * 1024; // 16MB em bytes
+                // Verifica o tamanho máximo (informado pelo servidor no formulário)
+                const form = e.target.form;
+                const maxSize = parseInt(form && form.dataset.maxBytes, 10) || 16 * 1024 * 1024;
                 if (file.size > maxSize) {
-                    alert('O arquivo é muito grande. O tamanho máximo permitido é 16MB.');
+                    alert('O arquivo é muito grande. O tamanho máximo permitido é ' + Math.floor(maxSize / (1024 * 1024)) + 'MB.');
                     e.target.value = '';
                 }
             }
         });
     }
     
+    // Upload em partes: o arquivo é enviado em pedaços e, se a conexão cair,
+    // o envio continua do último byte recebido pelo servidor
+    const uploadForm = document.querySelector('form[data-chunked-url]');
+    if (uploadForm && pdfFileInput && window.fetch && window.Blob && Blob.prototype.slice) {
+        uploadForm.addEventListener('submit', function(e) {
+            const file = pdfFileInput.files[0];
+            const title = uploadForm.querySelector('[name="title"]').value.trim();
+            if (!file || !title) {
+                return; // deixa o formulário mostrar a validação
+            }
+            e.preventDefault();
+            
+            const submitButton = uploadForm.querySelector('[type="submit"]');
+            const progress = uploadForm.querySelector('.upload-progress');
+            const progressBar = progress.querySelector('.progress-bar');
+            const progressText = uploadForm.querySelector('.upload-progress-text');
+            submitButton.disabled = true;
+            progress.classList.remove('d-none');
+            
+            chunkedUpload(uploadForm, file, title, function(sent) {
+                const percent = Math.floor(sent * 100 / file.size);
+                progressBar.style.width = percent + '%';
+                progressText.textContent = 'Enviando... ' + percent + '%';
+            }).then(function(result) {
+                window.location.href = result.redirect;
+            }).catch(function(error) {
+                submitButton.disabled = false;
+                progressText.textContent = error.message + ' Envie o arquivo novamente para continuar de onde parou.';
+            });
+        });
+    }
+    
     // Animação para os cards na dashboard
     const cards = document.querySelectorAll('.card');
     cards.forEach(card => {
@@ -52,4 +85,118 @@ document.addEventListener('DOMContentLoaded', function() {
             this.style.boxShadow = '0 5px 15px rgba(0, 0, 0, 0.05)';
         });
     });
-}); 
\ No newline at end of file
+});
+
+// Número máximo de falhas seguidas de rede antes de desistir de um upload
+const UPLOAD_MAX_RETRIES = 8;
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+async function uploadError(response) {
+    try {
+        const data = await response.json();
+        return new Error(data.error || 'Erro no envio do arquivo.');
+    } catch (e) {
+        return new Error('Erro no envio do arquivo (' + response.status + ').');
+    }
+}
+
+// Protocolo no estilo tus: cria a sessão, envia as partes com PATCH a partir do
+// offset já recebido (consultado com HEAD) e finaliza. A URL da sessão fica no
+// localStorage, então um novo envio do mesmo arquivo retoma o anterior.
+async function chunkedUpload(form, file, title, onProgress) {
+    const csrfToken = form.querySelector('[name="csrf_token"]').value;
+    const storageKey = 'upload:' + file.name + ':' + file.size + ':' + file.lastModified;
+    let session = JSON.parse(localStorage.getItem(storageKey) || 'null');
+    let offset = 0;
+    
+    async function currentOffset() {
+        const response = await fetch(session.url, {method: 'HEAD', credentials: 'same-origin'});
+        if (!response.ok) {
+            return null;
+        }
+        return parseInt(response.headers.get('Upload-Offset'), 10);
+    }
+    
+    if (session) {
+        offset = await currentOffset();
+        if (offset === null) {
+            session = null;
+            offset = 0;
+        }
+    }
+    if (!session) {
+        const response = await fetch(form.dataset.chunkedUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken},
+            body: JSON.stringify({title: title, filename: file.name, length: file.size})
+        });
+        if (!response.ok) {
+            throw await uploadError(response);
+        }
+        const data = await response.json();
+        session = {url: data.url, partSize: data.part_size};
+        localStorage.setItem(storageKey, JSON.stringify(session));
+    }
+    onProgress(offset);
+    
+    let failures = 0;
+    while (offset < file.size) {
+        let response;
+        try {
+            response = await fetch(session.url, {
+                method: 'PATCH',
+                credentials: 'same-origin',
+                headers: {
+                    'Content-Type': 'application/offset+octet-stream',
+                    'Upload-Offset': String(offset),
+                    'X-CSRFToken': csrfToken
+                },
+                body: file.slice(offset, offset + session.partSize)
+            });
+        } catch (e) {
+            response = null;
+        }
+        
+        if (response && response.status === 204) {
+            offset = parseInt(response.headers.get('Upload-Offset'), 10);
+            failures = 0;
+            onProgress(offset);
+            continue;
+        }
+        if (response && response.status !== 409 && response.status < 500) {
+            // Erros definitivos (ex.: o arquivo não é um PDF)
+            localStorage.removeItem(storageKey);
+            throw await uploadError(response);
+        }
+        
+        // Falha de rede ou offset divergente: espera e continua do que o servidor recebeu
+        failures += 1;
+        if (failures > UPLOAD_MAX_RETRIES) {
+            throw new Error('Não foi possível concluir o envio.');
+        }
+        await sleep(Math.min(1000 * Math.pow(2, failures - 1), 30000));
+        try {
+            const received = await currentOffset();
+            if (received !== null) {
+                offset = received;
+            }
+        } catch (e) {
+            // Sem conexão: tenta de novo na próxima volta
+        }
+    }
+    
+    const response = await fetch(session.url + '/finalize', {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {'X-CSRFToken': csrfToken}
+    });
+    if (!response.ok) {
+        throw await uploadError(response);
+    }
+    localStorage.removeItem(storageKey);
+    return response.json();
+}
@@ -0,0 +1,142 @@
+import os
+import logging
+import re
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument, PDFNoOutlines
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import PSLiteral
+from pdfminer.utils import decode_text
+
+logger = logging.getLogger(__name__)
+
+# Número máximo de capítulos de um livro (os excedentes são unidos ao último)
+MAX_CHAPTERS = int(os.environ.get('MAX_CHAPTERS', 200))
+
+# Tamanho máximo do título de um capítulo
+_TITLE_MAX_CHARS = 200
+
+# Títulos de capítulo reconhecidos no início de uma página quando o PDF não tem sumário
+_HEADING_RE = re.compile(
+    r'^\s*(cap[íi]tulo|chapter|parte|part|livro)\s+([0-9]+|[ivxlcdm]+|[a-zà-ú]+)\b',
+    re.IGNORECASE
+)
+
+
+def _title_text(value):
+    value = resolve1(value)
+    if isinstance(value, bytes):
+        value = decode_text(value)
+    if not isinstance(value, str):
+        return None
+    return " ".join(value.split())[:_TITLE_MAX_CHARS] or None
+
+
+def _destination_page(document, dest, action, page_numbers):
+    """Número da página (a partir de zero) para onde aponta uma entrada do sumário"""
+    if dest is None and action is not None:
+        action = resolve1(action)
+        if isinstance(action, dict):
+            dest = action.get('D')
+    dest = resolve1(dest)
+
+    # Destinos nomeados precisam ser procurados no catálogo
+    if isinstance(dest, PSLiteral):
+        dest = dest.name
+    if isinstance(dest, (str, bytes)):
+        dest = resolve1(document.get_dest(dest))
+    if isinstance(dest, dict):
+        dest = resolve1(dest.get('D'))
+
+    if isinstance(dest, list) and dest:
+        objid = getattr(dest[0], 'objid', None)
+        return page_numbers.get(objid)
+    return None
+
+
+def outline_chapters(pdf_path):
+    """Entradas de primeiro nível do sumário do PDF: [(título, página inicial)]"""
+    try:
+        with open(pdf_path, 'rb') as f:
+            document = PDFDocument(PDFParser(f))
+            page_numbers = {page.pageid: number for number, page in enumerate(PDFPage.create_pages(document))}
+
+            entries = []
+            for level, title, dest, action, _ in document.get_outlines():
+                entries.append((level, title, dest, action))
+            if not entries:
+                return []
+
+            top_level = min(level for level, _, _, _ in entries)
+            chapters = []
+            for level, title, dest, action in entries:
+                if level != top_level:
+                    continue
+                try:
+                    page = _destination_page(document, dest, action, page_numbers)
+                except Exception:
+                    page = None
+                if page is not None:
+                    chapters.append((_title_text(title), page))
+            return chapters
+    except PDFNoOutlines:
+        return []
+    except Exception as e:
+        logger.warning(f"[Chapters] Erro ao ler o sumário do PDF: {e}")
+        return []
+
+
+def heading_chapters(pages):
+    """Detecta capítulos pelas páginas que começam com um título ("Capítulo 3", "Parte II"...)"""
+    chapters = []
+    for number, text in enumerate(pages):
+        for line in (text or "").splitlines():
+            if not line.strip():
+                continue
+            title = " ".join(line.split())[:_TITLE_MAX_CHARS]
+            # Um título repetido no topo das páginas seguintes é cabeçalho, não um novo capítulo
+            if _HEADING_RE.match(line) and (not chapters or chapters[-1][0] != title):
+                chapters.append((title, number))
+            break
+    return chapters
+
+
+def plan_chapters(starts, page_count):
+    """
+    Monta o plano de capítulos a partir de [(título, página inicial)]
+
+    Cada capítulo cobre as páginas [start_page, end_page); as páginas antes do
+    primeiro capítulo entram nele, e um livro sem capítulos vira um capítulo só.
+    """
+    seen = set()
+    ordered = []
+    for title, start in sorted(starts, key=lambda item: item[1]):
+        if 0 <= start < page_count and start not in seen:
+            seen.add(start)
+            ordered.append((title, start))
+    ordered = ordered[:MAX_CHAPTERS]
+
+    if not ordered:
+        return [{'index': 0, 'title': None, 'start_page': 0, 'end_page': page_count}]
+
+    plan = []
+    for number, (title, start) in enumerate(ordered):
+        end = ordered[number + 1][1] if number + 1 < len(ordered) else page_count
+        plan.append({'index': number, 'title': title, 'start_page': 0 if number == 0 else start, 'end_page': end})
+    return plan
+
+
+def merge_empty_chapters(plan, has_text):
+    """Une ao capítulo anterior (ou ao seguinte) os capítulos sem texto, como páginas só de imagens"""
+    merged = []
+    for chapter in plan:
+        if merged and not has_text(chapter['start_page'], chapter['end_page']):
+            merged[-1]['end_page'] = chapter['end_page']
+        elif merged and not has_text(merged[-1]['start_page'], merged[-1]['end_page']):
+            merged[-1] = dict(chapter, start_page=merged[-1]['start_page'])
+        else:
+            merged.append(dict(chapter))
+
+    for number, chapter in enumerate(merged):
+        chapter['index'] = number
+    return merged
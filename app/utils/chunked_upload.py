@@ -0,0 +1,131 @@
+import os
+import fcntl
+import hashlib
+import threading
+from app.utils.pdf_processor import UPLOAD_CHUNK_SIZE
+
+# Tamanho máximo de um PDF enviado em partes
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 512 * 1024 * 1024))
+
+# Tamanho das partes sugerido ao cliente (cada parte é uma requisição, limitada por MAX_CONTENT_LENGTH)
+UPLOAD_PART_BYTES = int(os.environ.get('UPLOAD_PART_BYTES', 4 * 1024 * 1024))
+
+# Tempo sem atividade depois do qual um upload incompleto é descartado
+UPLOAD_SESSION_HOURS = float(os.environ.get('UPLOAD_SESSION_HOURS', 24))
+
+# Todo PDF começa com esta assinatura
+PDF_MAGIC = b'%PDF-'
+
+# Estado do SHA-256 de cada upload em andamento neste processo: id -> (offset, hash)
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Parte de upload recusada; status é o código HTTP da resposta"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def partial_upload_path(folder, upload_id):
+    """Arquivo com os bytes já recebidos de um upload"""
+    return os.path.join(folder, f"{upload_id}.part")
+
+
+def received_bytes(path):
+    """Bytes já gravados do upload (o arquivo parcial é a referência, mesmo após uma falha)"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _hasher_at(upload_id, path, offset):
+    # O hash é atualizado a cada parte; se a parte anterior foi recebida por outro
+    # processo (ou antes de um reinício), ele é refeito a partir do arquivo parcial
+    with _hashers_lock:
+        entry = _hashers.pop(upload_id, None)
+    if entry and entry[0] == offset:
+        return entry[1]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = offset
+        while remaining:
+            block = f.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def create_partial_upload(folder, upload_id):
+    os.makedirs(folder, exist_ok=True)
+    open(partial_upload_path(folder, upload_id), 'wb').close()
+
+
+def append_chunk(upload_id, path, stream, offset, length):
+    """
+    Grava no arquivo parcial os bytes de stream, que devem começar em offset
+
+    Os bytes são lidos e gravados em blocos (nada é mantido na memória) e o hash
+    do conteúdo é atualizado no caminho; os primeiros bytes do arquivo precisam
+    ser a assinatura de um PDF. Retorna o novo offset. Se a conexão cair no meio
+    da parte, os bytes já recebidos continuam gravados e o cliente retoma dali.
+    """
+    if not os.path.exists(path):
+        raise UploadError('Upload não encontrado', 404)
+
+    with open(path, 'ab') as f:
+        # Duas partes do mesmo upload não podem ser gravadas ao mesmo tempo
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Outra parte deste upload está sendo enviada', 409)
+
+        received = os.fstat(f.fileno()).st_size
+        if offset != received:
+            raise UploadError(f'Offset {offset} não corresponde aos {received} bytes já recebidos', 409)
+
+        digest = _hasher_at(upload_id, path, received)
+        try:
+            while True:
+                block = stream.read(UPLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                if received + len(block) > length:
+                    raise UploadError('O upload excede o tamanho declarado', 413)
+                # Confere a assinatura assim que os primeiros bytes chegam
+                if received < len(PDF_MAGIC):
+                    expected = PDF_MAGIC[received:received + len(block)]
+                    if block[:len(expected)] != expected:
+                        raise UploadError('O arquivo enviado não é um PDF', 415)
+                f.write(block)
+                digest.update(block)
+                received += len(block)
+        finally:
+            f.flush()
+            with _hashers_lock:
+                _hashers[upload_id] = (received, digest)
+
+    return received
+
+
+def complete_upload(upload_id, path, length):
+    """Confere se todos os bytes foram recebidos e retorna o SHA-256 do conteúdo"""
+    received = received_bytes(path)
+    if received != length:
+        raise UploadError(f'Upload incompleto: {received} de {length} bytes recebidos', 409)
+    content_hash = _hasher_at(upload_id, path, received).hexdigest()
+    return content_hash
+
+
+def discard_upload(upload_id, path):
+    """Remove o arquivo parcial e o estado do hash de um upload"""
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    if os.path.exists(path):
+        os.remove(path)
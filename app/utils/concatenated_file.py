@@ -0,0 +1,84 @@
+import io
+import os
+import bisect
+from zlib import adler32
+
+
+class ConcatenatedFile(io.RawIOBase):
+    """
+    Vários arquivos lidos como se fossem um só, com busca (seek) em qualquer posição
+
+    Usado para entregar o livro inteiro a partir dos MP3 dos capítulos sem gravar
+    uma cópia concatenada: a busca abre apenas o arquivo que contém a posição pedida,
+    então uma requisição Range no fim do livro não lê os capítulos anteriores.
+    """
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = list(paths)
+        stats = [os.stat(path) for path in self.paths]
+        self.sizes = [stat.st_size for stat in stats]
+        self.mtime = max((stat.st_mtime for stat in stats), default=0)
+        # Posição inicial de cada arquivo dentro do conjunto
+        self.starts = []
+        total = 0
+        for size in self.sizes:
+            self.starts.append(total)
+            total += size
+        self.size = total
+        self._position = 0
+        self._index = None
+        self._file = None
+
+    def etag(self):
+        """Identifica o conteúdo pelos arquivos, tamanhos e datas de modificação"""
+        check = adler32("|".join(
+            f"{path}:{size}:{os.path.getmtime(path)}" for path, size in zip(self.paths, self.sizes)
+        ).encode('utf-8')) & 0xFFFFFFFF
+        return f"{self.mtime}-{self.size}-{check}"
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("posição negativa")
+        self._position = offset
+        return self._position
+
+    def _open(self, index):
+        if self._index != index:
+            if self._file:
+                self._file.close()
+            self._file = open(self.paths[index], 'rb')
+            self._index = index
+        return self._file
+
+    def readinto(self, buffer):
+        if self._position >= self.size or not len(buffer):
+            return 0
+        # Arquivo que contém a posição atual (arquivos vazios são pulados)
+        index = bisect.bisect_right(self.starts, self._position) - 1
+        while self.sizes[index] == 0 or self._position >= self.starts[index] + self.sizes[index]:
+            index += 1
+        f = self._open(index)
+        f.seek(self._position - self.starts[index])
+        count = f.readinto(memoryview(buffer)[:self.starts[index] + self.sizes[index] - self._position])
+        self._position += count
+        return count
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        super().close()
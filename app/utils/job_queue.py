@@ -0,0 +1,383 @@
+import os
+import logging
+import socket
+import multiprocessing
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from app.models.db import db
+from app.models.pdf import PDF, AudioFile
+from app.models.job import ConversionJob
+
+logger = logging.getLogger(__name__)
+
+# Número de workers de conversão por processo
+CONVERSION_WORKERS = int(os.environ.get('CONVERSION_WORKERS', 2))
+
+# Duração do lease de um job e intervalo entre heartbeats (em segundos)
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 120))
+JOB_HEARTBEAT_SECONDS = int(os.environ.get('JOB_HEARTBEAT_SECONDS', 30))
+
+# Intervalo entre consultas à fila quando não há jobs
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+
+# Número máximo de tentativas de um job abandonado antes de marcá-lo como falho
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+
+# Intervalo mínimo entre gravações do progresso de um job
+JOB_PROGRESS_SECONDS = float(os.environ.get('JOB_PROGRESS_SECONDS', 2))
+
+# Pausa entre os lotes da indexação dos áudios antigos (tabela de busca), feita em segundo plano
+AUDIO_INDEX_PAUSE_SECONDS = float(os.environ.get('AUDIO_INDEX_PAUSE_SECONDS', 1))
+
+_workers = []
+_stop_event = threading.Event()
+
+
+class LeaseLost(Exception):
+    """O worker perdeu o lease do job (outro worker pode tê-lo assumido); o trabalho é interrompido"""
+
+
+def _enqueue(pdf, kind):
+    job = ConversionJob.query.filter(
+        ConversionJob.pdf_id == pdf.id,
+        ConversionJob.kind == kind,
+        ConversionJob.status.in_(ConversionJob.ACTIVE_STATES)
+    ).first()
+
+    if job is None:
+        job = ConversionJob(pdf_id=pdf.id, user_id=pdf.user_id, kind=kind, status=ConversionJob.QUEUED)
+        db.session.add(job)
+    return job
+
+
+def enqueue_conversion(pdf):
+    """Cria um job de conversão para o PDF, se ainda não houver um ativo"""
+    job = _enqueue(pdf, ConversionJob.CONVERT)
+    pdf.is_processing = True
+    db.session.commit()
+    return job
+
+
+def enqueue_extraction(pdf):
+    """Cria um job para extrair e armazenar o texto do PDF, se ainda não houver um ativo"""
+    job = _enqueue(pdf, ConversionJob.EXTRACT)
+    db.session.commit()
+    return job
+
+
+def claim_next_job(worker_id):
+    """Reserva o próximo job disponível (na fila ou com lease expirado) para o worker"""
+    now = datetime.utcnow()
+    claimable = or_(
+        ConversionJob.status == ConversionJob.QUEUED,
+        and_(
+            ConversionJob.status == ConversionJob.RUNNING,
+            ConversionJob.lease_expires_at < now,
+            ConversionJob.attempts < JOB_MAX_ATTEMPTS
+        )
+    )
+
+    candidates = [
+        job_id for (job_id,) in db.session.query(ConversionJob.id)
+        .filter(claimable)
+        .order_by(ConversionJob.created_at)
+        .limit(5)
+    ]
+
+    for job_id in candidates:
+        # A atualização condicional garante que apenas um worker fique com o job,
+        # mesmo entre processos diferentes
+        claimed = ConversionJob.query.filter(ConversionJob.id == job_id, claimable).update({
+            ConversionJob.status: ConversionJob.RUNNING,
+            ConversionJob.worker_id: worker_id,
+            ConversionJob.attempts: ConversionJob.attempts + 1,
+            ConversionJob.started_at: now,
+            ConversionJob.heartbeat_at: now,
+            ConversionJob.lease_expires_at: now + timedelta(seconds=JOB_LEASE_SECONDS)
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if claimed:
+            return db.session.get(ConversionJob, job_id)
+
+    return None
+
+
+def heartbeat(job_id, worker_id):
+    """Renova o lease do job; retorna False se o worker perdeu o job"""
+    now = datetime.utcnow()
+    renewed = ConversionJob.query.filter_by(
+        id=job_id, worker_id=worker_id, status=ConversionJob.RUNNING
+    ).update({
+        ConversionJob.heartbeat_at: now,
+        ConversionJob.lease_expires_at: now + timedelta(seconds=JOB_LEASE_SECONDS)
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(renewed)
+
+
+def finish_job(job_id, worker_id, succeeded, error=None):
+    """Marca o job como concluído ou falho"""
+    ConversionJob.query.filter_by(id=job_id, worker_id=worker_id).update({
+        ConversionJob.status: ConversionJob.DONE if succeeded else ConversionJob.FAILED,
+        ConversionJob.error: error,
+        ConversionJob.finished_at: datetime.utcnow(),
+        ConversionJob.lease_expires_at: None
+    }, synchronize_session=False)
+    db.session.commit()
+
+
+class JobProgress:
+    """
+    Acompanha o progresso de um job e o grava no banco de forma espaçada
+
+    Os contadores podem ser atualizados por várias threads; as gravações acontecem
+    no máximo a cada JOB_PROGRESS_SECONDS, na thread que chamar flush().
+    """
+
+    def __init__(self, job_id, pages_total=None, lease=None):
+        self.job_id = job_id
+        self.pages_total = pages_total
+        # Evento sinalizado pelo heartbeat quando o worker perde o lease do job
+        self.lease = lease
+        self.pages_done = 0
+        self.segments_done = 0
+        self.segments_submitted = 0
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def page_read(self):
+        with self._lock:
+            self.pages_done += 1
+
+    def segment_submitted(self):
+        with self._lock:
+            self.segments_submitted += 1
+
+    def segment_done(self):
+        with self._lock:
+            self.segments_done += 1
+
+    def lease_lost(self):
+        return self.lease is not None and self.lease.is_set()
+
+    def check_lease(self):
+        """Interrompe o trabalho (LeaseLost) se o job passou a outro worker"""
+        if self.lease_lost():
+            raise LeaseLost(f"Lease do job {self.job_id} perdido")
+
+    def track_pages(self, pages):
+        """Repassa as páginas contando as que já foram lidas"""
+        for page in pages:
+            self.check_lease()
+            self.page_read()
+            yield page
+            self.flush()
+
+    def flush(self, force=False):
+        """Grava o progresso no banco (requer um contexto da aplicação)"""
+        if self.job_id is None:
+            return
+        self.check_lease()
+        now = time.monotonic()
+        if not force and now - self._last_flush < JOB_PROGRESS_SECONDS:
+            return
+        self._last_flush = now
+
+        with self._lock:
+            values = {
+                ConversionJob.pages_done: self.pages_done,
+                ConversionJob.pages_total: self.pages_total,
+                ConversionJob.segments_done: self.segments_done,
+                ConversionJob.segments_submitted: self.segments_submitted
+            }
+        try:
+            ConversionJob.query.filter_by(id=self.job_id).update(values, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"[JobQueue] Erro ao gravar progresso do job {self.job_id}: {e}")
+            db.session.rollback()
+
+
+def fail_exhausted_jobs():
+    """Marca como falhos os jobs abandonados que já esgotaram as tentativas"""
+    now = datetime.utcnow()
+    exhausted = ConversionJob.query.filter(
+        ConversionJob.status == ConversionJob.RUNNING,
+        ConversionJob.lease_expires_at < now,
+        ConversionJob.attempts >= JOB_MAX_ATTEMPTS
+    ).all()
+
+    for job in exhausted:
+        logger.warning(f"[JobQueue] Job {job.id} abandonado após {job.attempts} tentativas, marcando como falho")
+        job.status = ConversionJob.FAILED
+        job.error = 'Número máximo de tentativas excedido'
+        job.finished_at = now
+        job.lease_expires_at = None
+        pdf = db.session.get(PDF, job.pdf_id)
+        if pdf and job.kind == ConversionJob.CONVERT:
+            pdf.is_processing = False
+
+    if exhausted:
+        db.session.commit()
+
+
+def recover_stale_jobs():
+    """Recoloca na fila os PDFs marcados como em processamento que não têm job ativo"""
+    active_pdf_ids = db.session.query(ConversionJob.pdf_id).filter(
+        ConversionJob.kind == ConversionJob.CONVERT,
+        ConversionJob.status.in_(ConversionJob.ACTIVE_STATES)
+    )
+    stale_pdfs = PDF.query.filter(
+        PDF.is_processing == True,
+        ~PDF.id.in_(active_pdf_ids)
+    ).all()
+
+    for pdf in stale_pdfs:
+        logger.info(f"[JobQueue] Recolocando na fila o PDF {pdf.id} que estava em processamento")
+        enqueue_conversion(pdf)
+
+    return len(stale_pdfs)
+
+
+def _heartbeat_loop(app, job_id, worker_id, done_event, lease_lost):
+    """Renova o lease periodicamente enquanto o job está em execução"""
+    with app.app_context():
+        try:
+            interval = JOB_HEARTBEAT_SECONDS
+            while not done_event.wait(interval):
+                try:
+                    renewed = heartbeat(job_id, worker_id)
+                except Exception as e:
+                    # Erros transitórios (ex.: "database is locked" no SQLite) não encerram os
+                    # heartbeats: tenta de novo em seguida, antes que o lease expire
+                    logger.warning(f"[JobQueue] Erro ao renovar o lease do job {job_id}: {e}")
+                    db.session.rollback()
+                    interval = min(JOB_HEARTBEAT_SECONDS, 5)
+                    continue
+                interval = JOB_HEARTBEAT_SECONDS
+                if not renewed:
+                    logger.warning(f"[JobQueue] Worker {worker_id} perdeu o lease do job {job_id}")
+                    lease_lost.set()
+                    return
+        finally:
+            db.session.remove()
+
+
+def run_job(app, job, worker_id):
+    """Executa um job mantendo o lease ativo"""
+    from app.controllers.pdf_controller import process_conversion_background, process_extraction_background
+
+    job_id, pdf_id, user_id, kind = job.id, job.pdf_id, job.user_id, job.kind
+    logger.info(f"[JobQueue] Worker {worker_id} executando job {job_id} ({kind}, PDF {pdf_id}, tentativa {job.attempts})")
+
+    done_event = threading.Event()
+    lease_lost = threading.Event()
+    heartbeat_thread = threading.Thread(
+        target=_heartbeat_loop, args=(app, job_id, worker_id, done_event, lease_lost), daemon=True
+    )
+    heartbeat_thread.start()
+
+    error = None
+    try:
+        if kind == ConversionJob.EXTRACT:
+            succeeded = process_extraction_background(pdf_id, app, job_id=job_id, lease=lease_lost)
+        else:
+            succeeded = process_conversion_background(pdf_id, user_id, app, job_id=job_id, lease=lease_lost)
+        if not succeeded:
+            error = 'Falha na extração' if kind == ConversionJob.EXTRACT else 'Falha na conversão'
+    except Exception as e:
+        succeeded = False
+        error = str(e)
+    finally:
+        done_event.set()
+        heartbeat_thread.join()
+
+    # Sem o lease, o job pertence a outro worker (ou voltará para a fila): o resultado é descartado
+    if lease_lost.is_set():
+        logger.warning(f"[JobQueue] Job {job_id} interrompido no worker {worker_id} após a perda do lease")
+        return
+
+    finish_job(job_id, worker_id, succeeded, error)
+    logger.info(f"[JobQueue] Job {job_id} finalizado: {'concluído' if succeeded else 'falhou'}")
+
+
+def _worker_loop(app, worker_id):
+    """Loop principal de um worker de conversão"""
+    while not _stop_event.is_set():
+        with app.app_context():
+            try:
+                fail_exhausted_jobs()
+                job = claim_next_job(worker_id)
+                if job is not None:
+                    run_job(app, job, worker_id)
+                    continue
+            except Exception as e:
+                logger.exception(f"[JobQueue] Erro no worker {worker_id}: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+        _stop_event.wait(JOB_POLL_SECONDS)
+
+
+def start_workers(app, count=CONVERSION_WORKERS):
+    """Inicia o pool de workers de conversão deste processo"""
+    if _workers:
+        return _workers
+
+    for index in range(count):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+        worker = threading.Thread(target=_worker_loop, args=(app, worker_id), daemon=True)
+        worker.start()
+        _workers.append(worker)
+
+    logger.info(f"[JobQueue] {count} workers de conversão iniciados")
+    return _workers
+
+
+def _index_audio_loop(app):
+    # Indexa os áudios antigos em lotes pequenos, um arquivo por transação, até não sobrar nenhum
+    with app.app_context():
+        total = 0
+        while not _stop_event.is_set():
+            try:
+                count = AudioFile.index_missing_seek_tables(app.config['AUDIO_FOLDER'])
+            except Exception as e:
+                logger.error(f"[JobQueue] Erro ao indexar áudios antigos: {e}")
+                db.session.rollback()
+                break
+            finally:
+                db.session.remove()
+            if not count:
+                break
+            total += count
+            _stop_event.wait(AUDIO_INDEX_PAUSE_SECONDS)
+        if total:
+            logger.info(f"[JobQueue] Tabela de busca criada para {total} áudios antigos")
+
+
+def init_job_queue(app):
+    """Recupera conversões interrompidas e inicia os workers"""
+    # Processos filhos (ex.: pool de extração de páginas) importam o app, mas não executam jobs
+    if multiprocessing.current_process().name != 'MainProcess':
+        return
+
+    app.config.setdefault('CONVERSION_WORKERS', CONVERSION_WORKERS)
+
+    with app.app_context():
+        try:
+            recovered = recover_stale_jobs()
+            if recovered:
+                logger.info(f"[JobQueue] {recovered} conversões interrompidas foram recolocadas na fila")
+        except Exception as e:
+            logger.error(f"[JobQueue] Erro ao recuperar conversões interrompidas: {e}")
+            db.session.rollback()
+        finally:
+            db.session.remove()
+
+    if app.config['CONVERSION_WORKERS'] > 0:
+        start_workers(app, app.config['CONVERSION_WORKERS'])
+        threading.Thread(target=_index_audio_loop, args=(app,), name='audio-index', daemon=True).start()
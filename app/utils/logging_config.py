@@ -0,0 +1,57 @@
+import os
+import re
+import sys
+import json
+import logging
+from datetime import datetime, timezone
+
+# Nível mínimo das mensagens da aplicação (DEBUG, INFO, WARNING, ERROR)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+# Formato das mensagens: 'text' (uma linha legível) ou 'json' (um objeto por linha)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+
+# As mensagens começam com o componente entre colchetes, ex.: "[BG-Convert] ..."
+_COMPONENT_RE = re.compile(r'^\[([^\]]+)\]\s*')
+
+
+class JSONFormatter(logging.Formatter):
+    """Uma linha JSON por mensagem, com o componente separado do texto"""
+
+    def format(self, record):
+        message = record.getMessage()
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.process,
+            'thread': record.threadName
+        }
+        match = _COMPONENT_RE.match(message)
+        if match:
+            entry['component'] = match.group(1)
+            message = message[match.end():]
+        entry['message'] = message
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Configura os loggers da aplicação (app.*); bibliotecas mantêm a configuração própria"""
+    logger = logging.getLogger('app')
+    if getattr(logger, '_aireader_configured', False):
+        return logger
+
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == 'json':
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    logger.addHandler(handler)
+    logger.setLevel(getattr(logging, level, logging.INFO))
+    # Evita mensagens duplicadas quando o servidor (ex.: gunicorn) configura o logger raiz
+    logger.propagate = False
+    logger._aireader_configured = True
+    return logger
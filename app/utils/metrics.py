@@ -0,0 +1,260 @@
+import os
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+# Coleta de métricas (0 desativa a coleta e o endpoint /metrics)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+
+# Token exigido em /metrics (Authorization: Bearer <token>); sem ele o endpoint é aberto
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Limites dos histogramas de tempo, em segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} espera os rótulos {self.label_names}, recebeu {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels_text(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+    def render(self):
+        return self.header() + self.samples()
+
+
+class Counter(_Metric):
+    """Valor que só aumenta (ex.: bytes enviados, eventos processados)"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce (ex.: conversões em andamento)"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Distribuição de valores em faixas cumulativas, com soma e contagem"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels_text(self.label_names, key, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels_text(self.label_names, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels_text(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels_text(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Métricas deste processo e coletores avaliados a cada leitura
+
+    Um coletor é uma função sem argumentos que retorna métricas já preenchidas
+    (ex.: lidas das estatísticas de um cache); ele só roda quando /metrics é lido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+        with self._lock:
+            self._collectors.append(function)
+        return function
+
+    def render(self):
+        """Todas as métricas no formato de texto do Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            for metric in collect():
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def counter(name, documentation, labels=()):
+    return registry.register(Counter(name, documentation, labels))
+
+
+def gauge(name, documentation, labels=()):
+    return registry.register(Gauge(name, documentation, labels))
+
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    return registry.register(Histogram(name, documentation, labels, buckets))
+
+
+def snapshot_gauge(name, documentation, values, labels=()):
+    """Gauge montado na hora da leitura a partir de {valores dos rótulos: valor}"""
+    metric = Gauge(name, documentation, labels)
+    for key, value in values.items():
+        metric.set(value, **dict(zip(metric.label_names, key if isinstance(key, tuple) else (key,))))
+    return metric
+
+
+def snapshot_counter(name, documentation, values, labels=()):
+    """Counter montado na hora da leitura a partir de contadores mantidos por outro componente"""
+    metric = Counter(name, documentation, labels)
+    for key, value in values.items():
+        metric._values[metric._key(dict(zip(metric.label_names, key if isinstance(key, tuple) else (key,))))] = value
+    return metric
+
+
+# Requisições HTTP, por rota
+HTTP_REQUEST_SECONDS = histogram(
+    'aireader_http_request_duration_seconds',
+    'Tempo de resposta das requisições até o envio dos cabeçalhos, por rota, método e status',
+    ('endpoint', 'method', 'status')
+)
+
+# Conversão
+EXTRACTION_PAGE_SECONDS = histogram(
+    'aireader_extraction_page_seconds', 'Tempo de extração do texto de cada página',
+    ('mode',), buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+CONVERSION_STAGE_SECONDS = histogram(
+    'aireader_conversion_stage_seconds', 'Duração de cada etapa das conversões', ('stage',),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+)
+CONVERSIONS_IN_FLIGHT = gauge('aireader_conversions_in_flight', 'Conversões em andamento neste processo')
+CONVERSIONS_TOTAL = counter('aireader_conversions_total', 'Conversões finalizadas, por resultado', ('result',))
+
+# Síntese de voz
+TTS_REQUEST_SECONDS = histogram(
+    'aireader_tts_request_seconds', 'Latência das chamadas aos provedores de TTS', ('provider', 'result')
+)
+TTS_SECONDS_PER_CHAR = histogram(
+    'aireader_tts_seconds_per_character', 'Latência das chamadas bem-sucedidas dividida pelos caracteres do segmento',
+    ('provider',), buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+)
+TTS_CHARACTERS = counter('aireader_tts_characters_total', 'Caracteres sintetizados, por provedor', ('provider',))
+TTS_FALLBACKS = counter(
+    'aireader_tts_fallbacks_total', 'Segmentos que passaram ao próximo provedor, por provedor abandonado e motivo',
+    ('provider', 'reason')
+)
+TTS_SEGMENT_FAILURES = counter('aireader_tts_segment_failures_total', 'Segmentos que nenhum provedor sintetizou')
+MP3_WRITE_SECONDS = histogram(
+    'aireader_mp3_write_seconds', 'Tempo de gravação de cada segmento de MP3', ('target',),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+)
+
+# Downloads e pagamentos
+DOWNLOAD_BYTES = counter('aireader_download_bytes_total', 'Bytes de áudio enviados, por rota', ('endpoint',))
+WEBHOOK_EVENTS = counter('aireader_webhook_events_total', 'Eventos do Stripe recebidos, por tipo e resultado',
+                         ('type', 'result'))
@@ -0,0 +1,211 @@
+import os
+import struct
+
+# Intervalo (em segundos) entre as entradas da tabela de busca gravada com cada áudio
+MP3_SEEK_INTERVAL_SECONDS = float(os.environ.get('MP3_SEEK_INTERVAL_SECONDS', 10))
+
+# Bitrates (kbps) por versão/camada; índice 0 é "livre" e 15 é inválido
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+_LAYERS = {1: 3, 2: 2, 3: 1}
+
+_ID3V2_HEADER = 10
+_ID3V1_SIZE = 128
+_SEEK_ENTRY = struct.Struct('<I')
+# Bloco lido de cada vez ao varrer um arquivo
+_READ_BLOCK = 64 * 1024
+
+
+def parse_frame_header(header):
+    """
+    Interpreta os 4 bytes do cabeçalho de um frame MPEG de áudio
+
+    Retorna (tamanho do frame em bytes, amostras por frame, taxa de amostragem)
+    ou None se os bytes não formarem um cabeçalho válido.
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = _VERSIONS.get((header[1] >> 3) & 0x03)
+    layer = _LAYERS.get((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version is None or layer is None or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and version != 1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def _side_info_size(header):
+    # Tamanho dos dados laterais de um frame da camada III, onde fica a marca Xing/Info
+    mpeg1 = (header[1] >> 3) & 0x03 == 3
+    mono = (header[3] >> 6) == 3
+    if mpeg1:
+        return 17 if mono else 32
+    return 9 if mono else 17
+
+
+def _is_info_frame(data, offset, header):
+    # Frames Xing/Info/VBRI guardam metadados do codificador e não contêm áudio
+    if _LAYERS.get((header[1] >> 1) & 0x03) != 3:
+        return False
+    tag_offset = offset + 4 + _side_info_size(header)
+    if data[tag_offset:tag_offset + 4] in (b'Xing', b'Info'):
+        return True
+    return data[offset + 36:offset + 40] == b'VBRI'
+
+
+class _FileWindow:
+    """
+    Acesso por fatias a um arquivo, lendo um bloco de cada vez
+
+    A varredura avança quase sempre para a frente e só olha alguns bytes por frame,
+    então o arquivo é lido uma única vez, em blocos, sem carregá-lo inteiro na memória;
+    as tags ID3 grandes são puladas com seek.
+    """
+
+    def __init__(self, f, size):
+        self._file = f
+        self._size = size
+        self._start = 0
+        self._buffer = b''
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start, stop = key.start, min(key.stop, self._size)
+        if start < self._start or stop > self._start + len(self._buffer):
+            self._file.seek(start)
+            self._buffer = self._file.read(max(_READ_BLOCK, stop - start))
+            self._start = start
+        return self._buffer[start - self._start:stop - self._start]
+
+
+class Mp3Index:
+    """Resultado da varredura de um MP3: duração exata e posição de cada frame no tempo"""
+
+    def __init__(self):
+        self.frame_count = 0
+        self.duration = 0.0
+        self.audio_bytes = 0
+        self.skipped_bytes = 0
+        self.sample_rates = set()
+        # (tempo de início, offset) de um frame a cada MP3_SEEK_INTERVAL_SECONDS
+        self.seek_points = []
+
+    def is_valid(self, min_frames=2):
+        """Indica se o arquivo contém áudio de verdade (e não só lixo ou um arquivo truncado)"""
+        return self.frame_count >= min_frames and self.duration > 0
+
+    def pack_seek_table(self):
+        """Serializa a tabela de busca (offsets em intervalos fixos de tempo)"""
+        return pack_seek_table([offset for _, offset in self.seek_points])
+
+
+def scan_mp3(data, seek_interval=MP3_SEEK_INTERVAL_SECONDS):
+    """
+    Percorre os cabeçalhos dos frames de um MP3 (bytes ou janela de arquivo) sem decodificar o áudio
+
+    Tags ID3 (inclusive no meio do arquivo, entre segmentos concatenados) e frames
+    de metadados são ignorados; bytes que não formam frames válidos são pulados até
+    o próximo cabeçalho confirmado pelo frame seguinte.
+    """
+    index = Mp3Index()
+    # Bytes são lidos pela memoryview (fatias sem cópia); arquivos, pela janela de leitura
+    view = memoryview(data) if isinstance(data, (bytes, bytearray)) else data
+    size = len(data)
+    offset = 0
+    next_seek = 0.0
+    resyncing = False
+
+    while offset + 4 <= size:
+        # Tag ID3v2: cabeçalho de 10 bytes com o tamanho em inteiros de 7 bits
+        if data[offset:offset + 3] == b'ID3' and offset + _ID3V2_HEADER <= size:
+            tag_size = 0
+            for byte in data[offset + 6:offset + 10]:
+                tag_size = (tag_size << 7) | (byte & 0x7F)
+            footer = _ID3V2_HEADER if data[offset + 5] & 0x10 else 0
+            offset += _ID3V2_HEADER + tag_size + footer
+            continue
+        # Tag ID3v1 no fim do arquivo
+        if data[offset:offset + 3] == b'TAG' and size - offset == _ID3V1_SIZE:
+            break
+
+        header = view[offset:offset + 4]
+        frame = parse_frame_header(header)
+        if frame is None or offset + frame[0] > size:
+            offset += 1
+            index.skipped_bytes += 1
+            resyncing = True
+            continue
+
+        length, samples, sample_rate = frame
+        # Depois de um trecho inválido, só aceita o cabeçalho se o próximo frame também for válido
+        next_offset = offset + length
+        if resyncing and next_offset + 4 <= size and parse_frame_header(view[next_offset:next_offset + 4]) is None:
+            offset += 1
+            index.skipped_bytes += 1
+            continue
+        resyncing = False
+
+        if not _is_info_frame(data, offset, header):
+            if index.duration >= next_seek:
+                index.seek_points.append((index.duration, offset))
+                next_seek += seek_interval
+            index.frame_count += 1
+            index.audio_bytes += length
+            index.sample_rates.add(sample_rate)
+            index.duration += samples / sample_rate
+        offset = next_offset
+
+    return index
+
+
+def scan_mp3_file(path, seek_interval=MP3_SEEK_INTERVAL_SECONDS):
+    """Varre um arquivo MP3 do disco em blocos, sem lê-lo inteiro para a memória (ver scan_mp3)"""
+    with open(path, 'rb') as f:
+        return scan_mp3(_FileWindow(f, os.fstat(f.fileno()).st_size), seek_interval)
+
+
+def mp3_duration(data):
+    """Duração exata do áudio em segundos (0 se não for um MP3 válido)"""
+    return scan_mp3(data).duration
+
+
+def pack_seek_table(offsets):
+    """Tabela de busca compacta: offsets de 4 bytes em ordem de tempo"""
+    return b''.join(_SEEK_ENTRY.pack(offset) for offset in offsets)
+
+
+def seek_offset(seek_table, seconds, seek_interval=MP3_SEEK_INTERVAL_SECONDS):
+    """
+    Retorna (tempo, offset) do frame a partir do qual tocar para chegar a seconds
+
+    O tempo retornado é o do início da entrada da tabela (no máximo seek_interval antes
+    do pedido). Sem tabela, retorna (0, 0).
+    """
+    count = len(seek_table or b'') // _SEEK_ENTRY.size
+    if not count:
+        return 0.0, 0
+    position = min(max(int(seconds // seek_interval), 0), count - 1)
+    offset, = _SEEK_ENTRY.unpack_from(seek_table, position * _SEEK_ENTRY.size)
+    return position * seek_interval, offset
+
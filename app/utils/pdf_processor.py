@@ -1,32 +1,276 @@
 import pdfplumber
 import os
-import uuid
+import time
+import logging
+import shutil
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument, PDFPasswordIncorrect
+from pdfminer.pdftypes import resolve1
+from pdfminer.utils import decode_text
 from werkzeug.utils import secure_filename
+from app.utils.metrics import EXTRACTION_PAGE_SECONDS
+from extraction_worker import extract_page_range
+
+logger = logging.getLogger(__name__)
+
+# Tamanho dos blocos lidos do upload durante a gravação em disco
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+def _available_cores():
+    """Número de núcleos que este processo pode usar"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# Processos usados na extração paralela de páginas (padrão: até 4). Cada processo web e
+# cada processo com workers de conversão tem o seu pool, então o total de processos de
+# extração é esse número vezes os processos da aplicação
+EXTRACTION_PROCESSES = int(os.environ.get('EXTRACTION_PROCESSES', 0)) or min(4, _available_cores())
+
+# Páginas extraídas por tarefa e número mínimo de páginas para usar o pool
+EXTRACTION_PAGES_PER_TASK = int(os.environ.get('EXTRACTION_PAGES_PER_TASK', 16))
+PARALLEL_EXTRACTION_MIN_PAGES = int(os.environ.get('PARALLEL_EXTRACTION_MIN_PAGES', 32))
+
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+def _info_text(info, key):
+    """Lê um campo de texto do dicionário de informações do PDF"""
+    value = resolve1(info.get(key))
+    if isinstance(value, bytes):
+        return decode_text(value).strip() or None
+    if isinstance(value, str):
+        return value.strip() or None
+    return None
+
+def probe_pdf_metadata(pdf_path):
+    """
+    Lê apenas a estrutura do PDF (árvore de páginas, informações e sumário),
+    sem extrair texto nem analisar o layout das páginas
+    """
+    metadata = {
+        'page_count': 0,
+        'title': None,
+        'author': None,
+        'has_outline': False,
+        'is_encrypted': False
+    }
+
+    try:
+        with open(pdf_path, 'rb') as f:
+            try:
+                document = PDFDocument(PDFParser(f))
+            except PDFPasswordIncorrect:
+                # Protegido por senha de usuário: não é possível ler a estrutura
+                metadata['is_encrypted'] = True
+                return metadata
+
+            metadata['is_encrypted'] = document.encryption is not None
+
+            # A contagem de páginas fica na raiz da árvore de páginas
+            pages = resolve1(document.catalog.get('Pages'))
+            if isinstance(pages, dict):
+                metadata['page_count'] = int(resolve1(pages.get('Count')) or 0)
+
+            metadata['has_outline'] = 'Outlines' in document.catalog
+
+            if document.info:
+                info = document.info[-1]
+                metadata['title'] = _info_text(info, 'Title')
+                metadata['author'] = _info_text(info, 'Author')
+    except Exception as e:
+        logger.error(f"Erro ao ler metadados do PDF: {e}")
+
+    return metadata
+
+def iter_pdf_pages(pdf_path):
+    """Gera o texto de cada página do PDF à medida que as páginas são processadas"""
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            start = time.perf_counter()
+            page_text = page.extract_text()
+            # Libera os objetos da página já processada para não acumular memória
+            page.flush_cache()
+            EXTRACTION_PAGE_SECONDS.observe(time.perf_counter() - start, mode='serial')
+            yield page_text or ""
+
+def _get_extraction_pool():
+    """Retorna o pool de processos de extração deste processo, criando-o se necessário"""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            # 'spawn' evita copiar as threads (workers da fila, heartbeats) do processo web
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _extraction_pool
+
+def _reset_extraction_pool():
+    """Descarta o pool após uma falha de um dos processos"""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is not None:
+            _extraction_pool.shutdown(wait=False, cancel_futures=True)
+            _extraction_pool = None
+
+def iter_pdf_pages_parallel(pdf_path):
+    """
+    Gera o texto de cada página, em ordem, extraindo intervalos de páginas em paralelo
+    em um pool de processos (a análise de layout do pdfplumber é limitada pela CPU e pelo GIL)
+
+    Documentos pequenos, ou com apenas um processo configurado, são extraídos em série.
+    """
+    page_count = probe_pdf_metadata(pdf_path)['page_count']
+    if EXTRACTION_PROCESSES <= 1 or page_count < PARALLEL_EXTRACTION_MIN_PAGES:
+        yield from iter_pdf_pages(pdf_path)
+        return
+
+    pool = _get_extraction_pool()
+    futures = [
+        pool.submit(extract_page_range, pdf_path, start, min(start + EXTRACTION_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, EXTRACTION_PAGES_PER_TASK)
+    ]
+
+    try:
+        # Os intervalos terminam fora de ordem, mas são entregues na ordem das páginas
+        for future in futures:
+            texts, durations = future.result()
+            for duration in durations:
+                EXTRACTION_PAGE_SECONDS.observe(duration, mode='parallel')
+            yield from texts
+    except BrokenProcessPool:
+        _reset_extraction_pool()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
 
 def extract_text_from_pdf(pdf_path):
     """Extrai o texto de um arquivo PDF"""
-    text = ""
-    
+    pages = []
+
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"
-                    
-            return text, len(pdf.pages)
+        for page_text in iter_pdf_pages(pdf_path):
+            pages.append(page_text)
+
+        text = "".join(page_text + "\n\n" for page_text in pages if page_text)
+        return text, len(pages)
     except Exception as e:
-        print(f"Erro ao processar PDF: {e}")
+        logger.error(f"Erro ao processar PDF: {e}")
         return None, 0
 
+def pdf_blob_path(content_hash):
+    """Caminho relativo (dentro da pasta de uploads) do PDF com o hash informado"""
+    return os.path.join('blobs', content_hash[:2], f"{content_hash}.pdf")
+
 def save_pdf_file(pdf_file, upload_folder):
-    """Salva o arquivo PDF no servidor e retorna o caminho relativo"""
+    """
+    Salva o arquivo PDF no servidor, endereçado pelo hash SHA-256 do conteúdo
+
+    O hash é calculado enquanto o arquivo é gravado; se já existir um arquivo com o
+    mesmo conteúdo, a cópia recém-enviada é descartada e o arquivo existente é reutilizado.
+
+    Returns:
+        str: Nome original do arquivo (sanitizado)
+        str: Caminho relativo para armazenar no banco de dados
+        str: Caminho completo do arquivo
+        int: Tamanho do arquivo em bytes
+        str: Hash SHA-256 do conteúdo
+    """
     filename = secure_filename(pdf_file.filename)
-    # Adiciona um identificador único para evitar conflitos de nome
-    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-    
-    file_path = os.path.join(upload_folder, unique_filename)
-    pdf_file.save(file_path)
-    
-    # Retorna o caminho relativo para armazenar no banco de dados
-    return unique_filename, file_path, pdf_file.content_length 
\ No newline at end of file
+    os.makedirs(upload_folder, exist_ok=True)
+    digest = hashlib.sha256()
+    file_size = 0
+
+    with tempfile.NamedTemporaryFile(delete=False, dir=upload_folder, suffix='.upload') as temp_file:
+        temp_path = temp_file.name
+        try:
+            while True:
+                chunk = pdf_file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp_file.write(chunk)
+                file_size += len(chunk)
+        except Exception:
+            temp_file.close()
+            os.remove(temp_path)
+            raise
+
+    content_hash = digest.hexdigest()
+    relative_path, file_path = store_pdf_blob(temp_path, upload_folder, content_hash)
+    return filename, relative_path, file_path, file_size, content_hash
+
+def store_pdf_blob(temp_path, upload_folder, content_hash):
+    """
+    Move um arquivo recebido para o caminho endereçado pelo hash do conteúdo
+
+    Returns:
+        str: Caminho relativo para armazenar no banco de dados
+        str: Caminho completo do arquivo
+    """
+    relative_path = pdf_blob_path(content_hash)
+    file_path = os.path.join(upload_folder, relative_path)
+
+    if os.path.exists(file_path):
+        # Conteúdo já armazenado: descarta a cópia duplicada
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(temp_path, file_path)
+
+    return relative_path, file_path
+
+def relocate_legacy_uploads(legacy_folder, upload_folder):
+    """
+    Move os PDFs gravados por versões anteriores na pasta pública (static/uploads)
+    para a pasta de uploads, fora do alcance de /static; retorna quantos foram movidos
+
+    Os caminhos relativos registrados no banco continuam válidos. Arquivos temporários
+    de uploads interrompidos (.upload) são apagados. Pode rodar em vários processos ao
+    mesmo tempo: um arquivo já movido por outro processo é ignorado.
+    """
+    if not os.path.isdir(legacy_folder) or os.path.abspath(legacy_folder) == os.path.abspath(upload_folder):
+        return 0
+
+    moved = 0
+    for root, dirs, files in os.walk(legacy_folder, topdown=False):
+        for name in files:
+            source = os.path.join(root, name)
+            try:
+                if name.endswith('.upload'):
+                    os.remove(source)
+                    continue
+                target = os.path.join(upload_folder, os.path.relpath(source, legacy_folder))
+                if os.path.exists(target):
+                    # Mesmo conteúdo já movido (ex.: arquivos endereçados pelo hash)
+                    if os.path.getsize(target) == os.path.getsize(source):
+                        os.remove(source)
+                    else:
+                        logger.warning(f"[Uploads] {source} não foi movido: {target} já existe com outro conteúdo")
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                # Copia com um nome temporário (a pasta nova pode estar em outro volume)
+                # e só então publica o arquivo, para nunca expor um PDF pela metade
+                temp_target = f"{target}.{os.getpid()}.moving"
+                shutil.move(source, temp_target)
+                os.replace(temp_target, target)
+                moved += 1
+            except FileNotFoundError:
+                continue
+        if root != legacy_folder:
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+
+    if moved:
+        logger.info(f"[Uploads] {moved} PDFs movidos de {legacy_folder} para {upload_folder}")
+    return moved
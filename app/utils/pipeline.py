@@ -0,0 +1,56 @@
+import queue
+import threading
+
+# Marcador de fim do fluxo
+_DONE = object()
+
+
+class _ProducerError:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, maxsize=8):
+    """
+    Consome o iterável em uma thread separada, entregando os itens por uma fila limitada
+
+    Permite que o produtor (ex.: extração de páginas) trabalhe enquanto o consumidor
+    (ex.: síntese de voz) processa os itens anteriores. Quando a fila enche, o produtor
+    espera; exceções do produtor são repassadas ao consumidor.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop_event = threading.Event()
+
+    def put(item):
+        # Tenta inserir até conseguir ou até o consumidor desistir
+        while not stop_event.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(_ProducerError(e))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _ProducerError):
+                raise item.error
+            yield item
+    finally:
+        # Sinaliza o produtor caso o consumidor pare antes do fim
+        stop_event.set()
@@ -0,0 +1,151 @@
+import os
+import json
+import math
+import shutil
+import hashlib
+import tempfile
+
+PLAYLIST_NAME = 'playlist.m3u8'
+CHECKPOINT_NAME = 'checkpoint.jsonl'
+
+
+def segment_filename(index):
+    """Nome do arquivo de um segmento (a ordem alfabética é a ordem de reprodução)"""
+    return f"{index:05d}.mp3"
+
+
+def segment_folder_path(segment_root, pdf_id, chapter=None):
+    """Pasta com os segmentos já sintetizados de um PDF (ou de um dos seus capítulos)"""
+    folder = os.path.join(segment_root, str(pdf_id))
+    return folder if chapter is None else os.path.join(folder, str(chapter))
+
+
+def segment_digest(text):
+    """Identifica o texto de um segmento no checkpoint (ignorando diferenças de espaços)"""
+    return hashlib.sha256(" ".join(text.split()).encode('utf-8')).hexdigest()
+
+
+def _atomic_write(path, data):
+    with tempfile.NamedTemporaryFile(delete=False, dir=os.path.dirname(path), suffix='.tmp') as temp_file:
+        temp_file.write(data)
+    os.replace(temp_file.name, path)
+
+
+class SegmentPlaylist:
+    """
+    Publica os segmentos de áudio à medida que são sintetizados
+
+    Cada segmento é gravado como um MP3 independente e uma playlist HLS (tipo EVENT)
+    é regravada a cada novo segmento, permitindo ouvir o início do livro enquanto
+    o restante ainda está sendo convertido.
+
+    A pasta também serve de checkpoint da conversão: cada segmento gravado é
+    registrado (posição, texto e duração) em checkpoint.jsonl, e uma nova tentativa
+    aproveita os segmentos cujo texto não mudou em vez de sintetizá-los de novo.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._entries = []
+        self._digests = []
+        os.makedirs(folder, exist_ok=True)
+        self._load_checkpoint()
+
+    @property
+    def checkpointed(self):
+        """Número de segmentos já gravados (de uma tentativa anterior ou desta)"""
+        return len(self._entries)
+
+    def _load_checkpoint(self):
+        # Vale o prefixo contínuo de segmentos cujo arquivo existe com o tamanho registrado;
+        # uma linha incompleta (processo interrompido durante a gravação) encerra a leitura
+        path = os.path.join(self.folder, CHECKPOINT_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                size = os.path.getsize(os.path.join(self.folder, segment_filename(entry['index'])))
+            except (ValueError, KeyError, OSError):
+                break
+            if entry['index'] != len(self._entries) or size != entry['bytes']:
+                break
+            self._entries.append((segment_filename(entry['index']), entry['duration']))
+            self._digests.append(entry['digest'])
+
+        if len(self._entries) < len(lines):
+            self._rewrite_checkpoint()
+        if self._entries:
+            self._write_playlist(finished=False)
+
+    def _rewrite_checkpoint(self):
+        lines = [
+            json.dumps({'index': index, 'digest': digest, 'bytes': os.path.getsize(os.path.join(self.folder, name)),
+                        'duration': duration})
+            for index, ((name, duration), digest) in enumerate(zip(self._entries, self._digests))
+        ]
+        _atomic_write(os.path.join(self.folder, CHECKPOINT_NAME), "".join(line + "\n" for line in lines).encode('utf-8'))
+
+    def resume(self, index, text):
+        """
+        Retorna o áudio já gravado do segmento index se o texto for o mesmo
+
+        Se o texto mudou, os checkpoints a partir desse segmento são descartados.
+        """
+        if index >= len(self._entries):
+            return None
+        if self._digests[index] == segment_digest(text):
+            with open(os.path.join(self.folder, segment_filename(index)), 'rb') as f:
+                return f.read()
+        del self._entries[index:]
+        del self._digests[index:]
+        self._rewrite_checkpoint()
+        return None
+
+    def add(self, index, audio, duration, text=None):
+        """
+        Publica o segmento de número index (os segmentos devem chegar em ordem)
+
+        Com o texto do segmento, ele também é registrado no checkpoint. Segmentos
+        retomados de uma tentativa anterior já estão publicados e são ignorados.
+        """
+        if index < len(self._entries):
+            return
+        _atomic_write(os.path.join(self.folder, segment_filename(index)), audio)
+        self._entries.append((segment_filename(index), duration))
+        self._digests.append(segment_digest(text) if text is not None else None)
+        if text is not None:
+            # O arquivo do segmento é gravado antes, então o checkpoint nunca aponta para um arquivo incompleto
+            with open(os.path.join(self.folder, CHECKPOINT_NAME), 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'index': index, 'digest': self._digests[-1], 'bytes': len(audio),
+                                    'duration': duration}) + "\n")
+        self._write_playlist(finished=False)
+
+    def finish(self):
+        """Marca a playlist como completa"""
+        self._write_playlist(finished=True)
+
+    def _write_playlist(self, finished):
+        target = max([math.ceil(duration) for _, duration in self._entries] + [1])
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            '#EXT-X-PLAYLIST-TYPE:EVENT',
+            f'#EXT-X-TARGETDURATION:{target}',
+            '#EXT-X-MEDIA-SEQUENCE:0'
+        ]
+        for name, duration in self._entries:
+            lines.append(f'#EXTINF:{duration:.3f},')
+            lines.append(f'segments/{name}')
+        if finished:
+            lines.append('#EXT-X-ENDLIST')
+        _atomic_write(os.path.join(self.folder, PLAYLIST_NAME), ("\n".join(lines) + "\n").encode('utf-8'))
+
+    @staticmethod
+    def remove(folder):
+        """Remove os segmentos publicados"""
+        shutil.rmtree(folder, ignore_errors=True)
@@ -1,10 +1,17 @@
 import stripe
 import os
+import logging
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 # Configura a API key do Stripe
 stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
 
+# Endereço alternativo da API (ex.: o Stripe simulado do teste de carga em loadtest/)
+if os.environ.get('STRIPE_API_BASE'):
+    stripe.api_base = os.environ['STRIPE_API_BASE'].rstrip('/')
+
 def create_customer(name, email):
     """Cria um cliente no Stripe"""
     try:
@@ -15,7 +22,7 @@ def create_customer(name, email):
         )
         return customer.id
     except Exception as e:
-        print(f"Erro ao criar cliente no Stripe: {e}")
+        logger.error(f"Erro ao criar cliente no Stripe: {e}")
         return None
 
 def create_checkout_session(customer_id, price_id, success_url, cancel_url):
@@ -34,7 +41,7 @@ def create_checkout_session(customer_id, price_id, success_url, cancel_url):
         )
         return checkout_session
     except Exception as e:
-        print(f"Erro ao criar sessão de checkout: {e}")
+        logger.error(f"Erro ao criar sessão de checkout: {e}")
         return None
 
 def get_subscription(subscription_id):
@@ -42,48 +49,48 @@ def get_subscription(subscription_id):
     try:
         return stripe.Subscription.retrieve(subscription_id)
     except Exception as e:
-        print(f"Erro ao obter assinatura: {e}")
+        logger.error(f"Erro ao obter assinatura: {e}")
         return None
 
 def cancel_subscription(subscription_id):
     """Cancela uma assinatura"""
     try:
-        print(f"[Stripe Service] Iniciando cancelamento da assinatura ID: {subscription_id}")
+        logger.debug(f"[Stripe Service] Iniciando cancelamento da assinatura ID: {subscription_id}")
         
         # Verifica se o subscription_id é válido
         if not subscription_id:
-            print("[Stripe Service] ID de assinatura inválido ou vazio")
+            logger.warning("[Stripe Service] ID de assinatura inválido ou vazio")
             return None
             
         # Recupera a assinatura
         try:
             subscription = stripe.Subscription.retrieve(subscription_id)
-            print(f"[Stripe Service] Assinatura recuperada: {subscription.id} - Status atual: {subscription.status}")
+            logger.debug(f"[Stripe Service] Assinatura recuperada: {subscription.id} - Status atual: {subscription.status}")
         except stripe.error.InvalidRequestError as e:
-            print(f"[Stripe Service] Assinatura não encontrada: {str(e)}")
+            logger.warning(f"[Stripe Service] Assinatura não encontrada: {e}")
             # Se a assinatura não existe, informamos isso de forma explícita
             return None
         
         # Se a assinatura já estiver cancelada, apenas retorne-a
         if subscription.status == 'canceled':
-            print(f"[Stripe Service] A assinatura já está cancelada")
+            logger.info(f"[Stripe Service] A assinatura já está cancelada")
             return subscription
         
         # Cancela a assinatura
         try:
             canceled_subscription = stripe.Subscription.delete(subscription_id)
-            print(f"[Stripe Service] Assinatura cancelada com sucesso: {canceled_subscription.id} - Novo status: {canceled_subscription.status}")
+            logger.info(f"[Stripe Service] Assinatura cancelada com sucesso: {canceled_subscription.id} - Novo status: {canceled_subscription.status}")
             return canceled_subscription
         except stripe.error.StripeError as e:
-            print(f"[Stripe Service] Erro ao excluir assinatura: {str(e)}")
+            logger.error(f"[Stripe Service] Erro ao excluir assinatura: {e}")
             return None
             
     except stripe.error.StripeError as e:
         # Trata erros específicos do Stripe com mais detalhes
-        print(f"[Stripe Service] Erro Stripe ao cancelar assinatura: {str(e)}")
+        logger.error(f"[Stripe Service] Erro Stripe ao cancelar assinatura: {e}")
         return None
     except Exception as e:
-        print(f"[Stripe Service] Erro ao cancelar assinatura: {str(e)}")
+        logger.error(f"[Stripe Service] Erro ao cancelar assinatura: {e}")
         return None
 
 def handle_subscription_event(subscription):
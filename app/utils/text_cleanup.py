@@ -0,0 +1,223 @@
+import os
+import re
+import threading
+from collections import Counter, deque
+
+# Limpeza do texto extraído antes da síntese (0 desativa)
+TEXT_CLEANUP = os.environ.get('TEXT_CLEANUP', '1') not in ('0', 'false', 'False')
+
+# Páginas antes e depois de cada página comparadas na busca por cabeçalhos e rodapés repetidos
+TEXT_CLEANUP_LOOKAHEAD = int(os.environ.get('TEXT_CLEANUP_LOOKAHEAD', 8))
+# Número mínimo de páginas com a mesma linha na margem para considerá-la cabeçalho/rodapé
+TEXT_CLEANUP_MIN_REPEATS = int(os.environ.get('TEXT_CLEANUP_MIN_REPEATS', 3))
+
+# Linhas do topo e do fim de cada página que podem ser cabeçalho ou rodapé
+_EDGE_LINES = 2
+# Cabeçalhos e rodapés são curtos; linhas maiores são sempre tratadas como texto
+_EDGE_MAX_CHARS = 120
+
+# Ligaduras tipográficas que o extrator devolve como um único caractere
+_LIGATURES = str.maketrans({
+    'ﬀ': 'ff', 'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬃ': 'ffi', 'ﬄ': 'ffl', 'ﬅ': 'st', 'ﬆ': 'st'
+})
+
+# Linha só com o número da página ("12", "- 12 -", "xii", "Página 12", "12 de 300")
+_PAGE_NUMBER_RE = re.compile(
+    r'^\s*(?:p[áa]g(?:ina)?\.?|page)?\s*[-–—(\[]?\s*(?:\d{1,4}|[ivxlcdm]{1,7})\s*[-–—)\]]?'
+    r'\s*(?:(?:de|of|/)\s*\d{1,4})?\s*$',
+    re.IGNORECASE
+)
+
+# Palavra quebrada no fim da linha ("pala-\nvra"), inclusive com hífen suave
+_HYPHENATION_RE = re.compile('([^\\W\\d_])[-\u00ad\u2010]\\n[ \\t]*(?=[^\\W\\d_A-Z\u00c0-\u00dd])')
+_TRAILING_HYPHEN_RE = re.compile('([^\\W\\d_]+)[-\u00ad\u2010]\\s*$')
+
+# Pontilhado do sumário e o número da página que o segue ("Introdução ........ 12")
+_LEADER_RE = re.compile('[ \\t]*(?:(?:\\.[ \\t]?){4,}|(?:\u2026[ \\t]?){2,}|_{4,})[ \\t]*(?:\\d{1,4}\\b)?')
+
+# Caracteres sem leitura: controles, formatação invisível, uso privado, marcadores,
+# desenhos de caixa, formas geométricas, dingbats e emojis
+_UNSPEAKABLE_RE = re.compile(
+    '[\x00-\x08\x0b-\x1f\x7f-\x9f\u00ad\u200b-\u200f\u202a-\u202e\u2060-\u206f\ufeff\ufffd'
+    '\ue000-\uf8ff\u2022\u2023\u2043\u25e6\u2500-\u27bf\U0001f000-\U0001faff]'
+)
+
+_SPACES_RE = re.compile('[ \t\u00a0\u2000-\u200a\u202f\u205f\u3000]+')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_DIGITS_RE = re.compile(r'\d+')
+
+
+class CleanupStats:
+    """Contadores da limpeza: caracteres lidos e enviados à síntese e o que foi removido"""
+
+    def __init__(self):
+        self.pages = 0
+        self.chars_in = 0
+        self.chars_out = 0
+        self.boilerplate_lines = 0
+        self.page_numbers = 0
+        self.hyphenations = 0
+        self.leaders = 0
+        self.glyphs = 0
+
+    @property
+    def removed(self):
+        return self.chars_in - self.chars_out
+
+    @property
+    def removed_ratio(self):
+        return self.removed / self.chars_in if self.chars_in else 0.0
+
+    def add(self, other):
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        return dict(vars(self), removed=self.removed, removed_ratio=self.removed_ratio)
+
+
+_totals = CleanupStats()
+_totals_lock = threading.Lock()
+
+
+def cleanup_stats():
+    """Totais da limpeza de texto neste processo"""
+    with _totals_lock:
+        return _totals.as_dict()
+
+
+def _speakable_length(text):
+    # Os espaços são normalizados na divisão em segmentos, então não contam como economia
+    return len(" ".join(text.split()))
+
+
+def _signature(line):
+    # Cabeçalhos e rodapés costumam variar só no número (ex.: "Capítulo 3 - 45")
+    line = " ".join(line.split()).lower()
+    if not line or len(line) > _EDGE_MAX_CHARS:
+        return None
+    return _DIGITS_RE.sub('#', line)
+
+
+def _edge_positions(lines):
+    """Margem ('top' ou 'bottom') das primeiras e últimas linhas não vazias da página, por índice"""
+    filled = [number for number, line in enumerate(lines) if line.strip()]
+    positions = {number: 'bottom' for number in filled[-_EDGE_LINES:]}
+    positions.update({number: 'top' for number in filled[:_EDGE_LINES]})
+    return positions
+
+
+def _edge_signatures(text):
+    # Um cabeçalho só é comparado com os cabeçalhos das outras páginas, e um rodapé com os rodapés
+    lines = text.splitlines()
+    signatures = set()
+    for number, edge in _edge_positions(lines).items():
+        signature = _signature(lines[number])
+        if signature:
+            signatures.add((edge, signature))
+    return signatures
+
+
+def clean_page(text, repeated=(), stats=None):
+    """
+    Normaliza o texto de uma página para a síntese
+
+    Remove as linhas de margem cuja (margem, assinatura) está em repeated
+    (cabeçalhos e rodapés) e os números de página, junta palavras hifenizadas, remove o
+    pontilhado do sumário e caracteres sem leitura e normaliza os espaços.
+    """
+    stats = stats if stats is not None else CleanupStats()
+    text = text.translate(_LIGATURES)
+
+    lines = text.splitlines()
+    edges = _edge_positions(lines)
+    kept = []
+    for number, line in enumerate(lines):
+        if number in edges:
+            if _PAGE_NUMBER_RE.match(line):
+                stats.page_numbers += 1
+                continue
+            if (edges[number], _signature(line)) in repeated:
+                stats.boilerplate_lines += 1
+                continue
+        kept.append(line)
+    text = "\n".join(kept)
+
+    text, count = _HYPHENATION_RE.subn(r'\1', text)
+    stats.hyphenations += count
+    text, count = _UNSPEAKABLE_RE.subn(' ', text)
+    stats.glyphs += count
+    text, count = _LEADER_RE.subn('', text)
+    stats.leaders += count
+
+    text = "\n".join(_SPACES_RE.sub(' ', line).strip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def clean_pages(pages, stats=None):
+    """
+    Aplica clean_page a um fluxo de páginas, em ordem
+
+    Cada página é comparada com as TEXT_CLEANUP_LOOKAHEAD páginas anteriores e
+    seguintes: linhas de margem que se repetem (ignorando números) em pelo menos
+    TEXT_CLEANUP_MIN_REPEATS delas são cabeçalhos ou rodapés. Palavras hifenizadas
+    na virada da página são juntadas na página seguinte. Os contadores são somados
+    a stats (se informado) e aos totais do processo.
+    """
+    if not TEXT_CLEANUP:
+        yield from pages
+        return
+
+    stats = stats if stats is not None else CleanupStats()
+    page_stats = CleanupStats()
+    window = deque()
+    history = deque()
+    counts = Counter()
+    carry = ""
+
+    def emit():
+        nonlocal carry
+        text, signatures = window.popleft()
+        repeated = {signature for signature in signatures if counts[signature] >= TEXT_CLEANUP_MIN_REPEATS}
+
+        history.append(signatures)
+        if len(history) > TEXT_CLEANUP_LOOKAHEAD:
+            counts.subtract(history.popleft())
+
+        page_stats.pages += 1
+        page_stats.chars_in += _speakable_length(text)
+        cleaned = clean_page(text, repeated, page_stats)
+
+        # Completa a palavra quebrada no fim da página anterior
+        if carry:
+            if cleaned[:1].islower():
+                cleaned = carry + cleaned
+                page_stats.hyphenations += 1
+            else:
+                cleaned = f"{carry}-\n{cleaned}" if cleaned else f"{carry}-"
+            carry = ""
+        match = _TRAILING_HYPHEN_RE.search(cleaned)
+        if match:
+            carry = match.group(1)
+            cleaned = cleaned[:match.start()].rstrip()
+
+        page_stats.chars_out += _speakable_length(cleaned)
+        return cleaned
+
+    try:
+        for text in pages:
+            text = text or ""
+            signatures = _edge_signatures(text)
+            window.append((text, signatures))
+            counts.update(signatures)
+            if len(window) > TEXT_CLEANUP_LOOKAHEAD:
+                yield emit()
+        while window:
+            yield emit()
+        if carry:
+            page_stats.chars_out += len(carry) + 1
+            yield f"{carry}-"
+    finally:
+        stats.add(page_stats)
+        with _totals_lock:
+            _totals.add(page_stats)
@@ -0,0 +1,144 @@
+import os
+import logging
+import zlib
+import struct
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Formato do arquivo:
+#   cabeçalho | páginas comprimidas (zlib) | índice (offset, tamanho por página) | rodapé
+# O rodapé aponta para o índice, então qualquer página pode ser lida sem descomprimir as demais.
+_HEADER = b'AITXT1\n'
+_FOOTER_MAGIC = b'AITXTEND'
+_INDEX_ENTRY = struct.Struct('<QI')
+_FOOTER = struct.Struct('<QI8s')
+
+
+def text_store_key(pdf):
+    """Chave do texto armazenado: o hash do conteúdo, compartilhado por PDFs idênticos"""
+    return pdf.content_hash or f"pdf-{pdf.id}"
+
+
+def text_store_path(text_folder, key):
+    """Caminho do arquivo de texto armazenado para a chave informada"""
+    return os.path.join(text_folder, key[:2], f"{key}.pages")
+
+
+class TextStoreWriter:
+    """Grava as páginas em um arquivo temporário que só se torna visível ao ser finalizado"""
+
+    def __init__(self, path, compression_level=6):
+        self.path = path
+        self.compression_level = compression_level
+        self._entries = []
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(delete=False, dir=os.path.dirname(path), suffix='.tmp')
+        self._file.write(_HEADER)
+
+    def add_page(self, text):
+        data = zlib.compress((text or "").encode('utf-8'), self.compression_level)
+        self._entries.append((self._file.tell(), len(data)))
+        self._file.write(data)
+
+    def commit(self):
+        """Grava o índice e move o arquivo para o destino final"""
+        index_offset = self._file.tell()
+        for offset, length in self._entries:
+            self._file.write(_INDEX_ENTRY.pack(offset, length))
+        self._file.write(_FOOTER.pack(index_offset, len(self._entries), _FOOTER_MAGIC))
+        self._file.close()
+        os.replace(self._file.name, self.path)
+        return len(self._entries)
+
+    def abort(self):
+        """Descarta o arquivo temporário"""
+        self._file.close()
+        try:
+            os.remove(self._file.name)
+        except OSError:
+            pass
+
+
+def write_text_store(path, pages):
+    """Grava todas as páginas no arquivo e retorna o número de páginas"""
+    writer = TextStoreWriter(path)
+    try:
+        for text in pages:
+            writer.add_page(text)
+    except Exception:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
+def store_pages(path, pages):
+    """
+    Repassa as páginas ao consumidor enquanto as grava no arquivo
+
+    O arquivo só é finalizado se todas as páginas forem consumidas.
+    """
+    writer = TextStoreWriter(path)
+    completed = False
+    try:
+        for text in pages:
+            writer.add_page(text)
+            yield text
+        completed = True
+    finally:
+        if completed:
+            writer.commit()
+        else:
+            writer.abort()
+
+
+class TextStore:
+    """Leitura das páginas de texto armazenadas"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(_HEADER)) != _HEADER:
+                raise ValueError(f"Arquivo de texto inválido: {path}")
+            f.seek(-_FOOTER.size, os.SEEK_END)
+            self._index_offset, self.page_count, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic != _FOOTER_MAGIC:
+                raise ValueError(f"Arquivo de texto incompleto: {path}")
+
+    @classmethod
+    def open(cls, path):
+        """Abre o arquivo, retornando None se ele não existir ou estiver corrompido"""
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"[TextStore] Ignorando arquivo de texto inválido {path}: {e}")
+            return None
+
+    def _read_index(self, f, start, end):
+        f.seek(self._index_offset + start * _INDEX_ENTRY.size)
+        data = f.read((end - start) * _INDEX_ENTRY.size)
+        return [_INDEX_ENTRY.unpack_from(data, i * _INDEX_ENTRY.size) for i in range(end - start)]
+
+    def read_pages(self, start=0, end=None):
+        """Retorna as páginas no intervalo [start, end), numeradas a partir de zero"""
+        return list(self.iter_pages(start, end))
+
+    def read_page(self, number):
+        """Retorna o texto de uma página, numerada a partir de zero"""
+        if not 0 <= number < self.page_count:
+            raise IndexError(f"Página {number} fora do intervalo (0-{self.page_count - 1})")
+        return self.read_pages(number, number + 1)[0]
+
+    def iter_pages(self, start=0, end=None):
+        """Gera as páginas no intervalo [start, end) uma a uma"""
+        end = self.page_count if end is None else min(end, self.page_count)
+        start = max(start, 0)
+        if start >= end:
+            return
+
+        with open(self.path, 'rb') as f:
+            for offset, length in self._read_index(f, start, end):
+                f.seek(offset)
+                yield zlib.decompress(f.read(length)).decode('utf-8')
@@ -0,0 +1,240 @@
+import os
+import abc
+import logging
+import io
+import shutil
+import subprocess
+import threading
+import time
+from app.utils.tts_client import get_speech_client, OPENAI_TTS_MAX_CONNECTIONS
+from app.utils.tts_router import record_local_wait
+
+logger = logging.getLogger(__name__)
+
+try:
+    from gtts import gTTS
+except ImportError:
+    gTTS = None
+
+# Parâmetros da síntese em cada provedor (fazem parte da chave do cache de segmentos)
+OPENAI_TTS_MODEL = os.environ.get('OPENAI_TTS_MODEL', 'tts-1')
+OPENAI_TTS_VOICE = os.environ.get('OPENAI_TTS_VOICE', 'alloy')
+GTTS_LANG = 'pt-br'
+ESPEAK_VOICE = os.environ.get('ESPEAK_VOICE', 'pt-br')
+ESPEAK_WORDS_PER_MINUTE = int(os.environ.get('ESPEAK_WORDS_PER_MINUTE', 160))
+
+# Sínteses simultâneas do motor local (cada uma ocupa um núcleo)
+ESPEAK_MAX_CONCURRENCY = int(os.environ.get('ESPEAK_MAX_CONCURRENCY', os.cpu_count() or 1))
+ESPEAK_TIMEOUT_SECONDS = float(os.environ.get('ESPEAK_TIMEOUT_SECONDS', 300))
+
+
+class TTSBackend(abc.ABC):
+    """
+    Interface comum dos provedores de TTS
+
+    Cada provedor declara suas capacidades (tamanho máximo do texto, vozes e
+    formatos disponíveis, chamadas simultâneas permitidas e se depende de rede)
+    e implementa _synthesize(text), que retorna o áudio em MP3 ou None. Um
+    provedor sem _synthesize não pode ser instanciado (nem, portanto, registrado).
+    """
+
+    name = None
+    max_chars = 4096
+    voices = ()
+    formats = ('mp3',)
+    max_concurrency = 4
+    requires_network = True
+
+    def __init__(self):
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    @property
+    def model(self):
+        return self.name
+
+    @property
+    def voice(self):
+        return self.voices[0] if self.voices else None
+
+    def is_available(self):
+        """Indica se o provedor pode ser usado neste ambiente"""
+        return True
+
+    def cache_params(self):
+        """Identificação do provedor, modelo e voz usada na chave do cache"""
+        return (self.name, self.model, self.voice)
+
+    def capabilities(self):
+        return {
+            'name': self.name,
+            'available': self.is_available(),
+            'max_chars': self.max_chars,
+            'voices': list(self.voices),
+            'formats': list(self.formats),
+            'max_concurrency': self.max_concurrency,
+            'requires_network': self.requires_network
+        }
+
+    def synthesize(self, text):
+        """Sintetiza o texto respeitando o limite de chamadas simultâneas do provedor"""
+        start = time.monotonic()
+        with self._slots:
+            # A espera por uma vaga não conta como latência do provedor
+            record_local_wait(time.monotonic() - start)
+            return self._synthesize(text)
+
+    @abc.abstractmethod
+    def _synthesize(self, text):
+        """Sintetiza o texto no provedor; retorna o áudio em MP3 ou None"""
+
+
+class OpenAIBackend(TTSBackend):
+    name = 'openai'
+    max_chars = 4096
+    voices = ('alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer')
+    formats = ('mp3', 'opus', 'aac', 'flac')
+    max_concurrency = OPENAI_TTS_MAX_CONNECTIONS
+
+    @property
+    def model(self):
+        return OPENAI_TTS_MODEL
+
+    @property
+    def voice(self):
+        return OPENAI_TTS_VOICE
+
+    def is_available(self):
+        return bool(os.environ.get("OPENAI_API_KEY"))
+
+    def _synthesize(self, text):
+        client = get_speech_client()
+        if not client:
+            logger.warning("[TTS-OpenAI] API key não encontrada")
+            return None
+        # O cliente compartilhado respeita os limites de taxa e repete erros temporários
+        return client.speech(text, model=OPENAI_TTS_MODEL, voice=OPENAI_TTS_VOICE, response_format="mp3")
+
+
+class GTTSBackend(TTSBackend):
+    name = 'gtts'
+    max_chars = 5000
+    voices = (GTTS_LANG,)
+    max_concurrency = 4
+
+    def is_available(self):
+        return gTTS is not None
+
+    def _synthesize(self, text):
+        if gTTS is None:
+            logger.warning("[TTS-Google] Pacote gtts não instalado")
+            return None
+
+        # Cria o áudio com gTTS (português Brasil)
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=GTTS_LANG, slow=False).write_to_fp(buffer)
+        audio = buffer.getvalue()
+
+        # Verifica se o áudio foi criado
+        if len(audio) < 100:  # verifica tamanho mínimo
+            logger.warning(f"[TTS-Google] Áudio não criado corretamente")
+            return None
+        return audio
+
+
+class EspeakBackend(TTSBackend):
+    """
+    Motor de voz local (espeak-ng), sem rede nem custo por caractere
+
+    O WAV gerado pelo espeak-ng é codificado em MP3 pelo lame, em 24 kHz mono,
+    o mesmo formato dos demais provedores, para que os segmentos possam ser
+    concatenados no mesmo arquivo.
+    """
+
+    name = 'espeak'
+    max_chars = 20000
+    voices = (ESPEAK_VOICE,)
+    max_concurrency = ESPEAK_MAX_CONCURRENCY
+    requires_network = False
+
+    @property
+    def model(self):
+        return f"espeak-ng-{ESPEAK_WORDS_PER_MINUTE}wpm"
+
+    def is_available(self):
+        return bool(shutil.which('espeak-ng') and shutil.which('lame'))
+
+    def _synthesize(self, text):
+        if not self.is_available():
+            logger.warning("[TTS-Espeak] espeak-ng ou lame não encontrado")
+            return None
+
+        speak = subprocess.Popen(
+            ['espeak-ng', '-v', ESPEAK_VOICE, '-s', str(ESPEAK_WORDS_PER_MINUTE), '--stdin', '--stdout'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        encode = subprocess.Popen(
+            ['lame', '--quiet', '-m', 'm', '--resample', '24', '-b', '48', '-', '-'],
+            stdin=speak.stdout, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        # O lame passa a ser o único leitor da saída do espeak-ng
+        speak.stdout.close()
+
+        # O texto é escrito em outra thread para não travar enquanto o lame produz a saída
+        writer = threading.Thread(target=self._write_input, args=(speak, text), daemon=True)
+        writer.start()
+        try:
+            audio, _ = encode.communicate(timeout=ESPEAK_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            speak.kill()
+            encode.kill()
+            encode.communicate()
+            logger.warning(f"[TTS-Espeak] Tempo esgotado ao sintetizar {len(text)} caracteres")
+            return None
+        finally:
+            writer.join()
+            speak.wait()
+
+        if speak.returncode != 0 or encode.returncode != 0 or not audio:
+            logger.error(f"[TTS-Espeak] Falha na síntese (espeak-ng {speak.returncode}, lame {encode.returncode})")
+            return None
+        return audio
+
+    @staticmethod
+    def _write_input(process, text):
+        try:
+            process.stdin.write(text.encode('utf-8'))
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def register_backend(backend):
+    """Registra (ou substitui) um provedor de TTS pelo nome"""
+    if not isinstance(backend, TTSBackend):
+        raise TypeError(f"{backend!r} não é um provedor de TTS (TTSBackend)")
+    with _backends_lock:
+        _backends[backend.name] = backend
+    return backend
+
+
+def get_backend(name):
+    """Retorna o provedor registrado com o nome informado, ou None"""
+    return _backends.get(name)
+
+
+def registered_backends():
+    """Provedores registrados, por nome"""
+    return dict(_backends)
+
+
+register_backend(OpenAIBackend())
+register_backend(GTTSBackend())
+register_backend(EspeakBackend())
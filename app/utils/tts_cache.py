@@ -0,0 +1,208 @@
+import os
+import logging
+import json
+import hashlib
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Diretório e tamanho máximo do cache de segmentos sintetizados. O diretório é compartilhado
+# pelos processos (workers do gunicorn), e o limite vale para ele inteiro: cada processo relê
+# a pasta a cada TTS_CACHE_SCAN_SECONDS, ou ao passar do limite, antes de remover arquivos
+_PROJECT_ROOT = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+_DATA_DIR = os.environ.get('DATA_DIR') or os.path.join(_PROJECT_ROOT, 'instance')
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', os.path.join(_DATA_DIR, 'tts_cache'))
+TTS_CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+TTS_CACHE_SCAN_SECONDS = float(os.environ.get('TTS_CACHE_SCAN_SECONDS', 60))
+
+# Fração do limite a que o cache é reduzido quando passa dele (evita reler a pasta a cada gravação)
+_EVICT_TO = 0.9
+
+
+def segment_cache_key(text, provider, model, voice, audio_format):
+    """Gera a chave do segmento a partir do texto normalizado e dos parâmetros da síntese"""
+    normalized = " ".join(text.split())
+    payload = json.dumps([normalized, provider, model, voice, audio_format], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SegmentCache:
+    """
+    Cache em disco de segmentos de áudio, endereçado pelo conteúdo
+
+    Os arquivos são removidos do menos para o mais recentemente usado quando o
+    tamanho total passa de max_bytes. Pedidos simultâneos do mesmo segmento são
+    agrupados: apenas um chama o provedor e os demais aguardam o mesmo resultado.
+
+    A pasta é compartilhada por vários processos, então o índice de cada um é só uma
+    estimativa: as leituras vão direto ao disco (valem os arquivos gravados pelos outros),
+    a ordem de uso fica na data de modificação dos arquivos e, antes de remover qualquer
+    arquivo, o índice é reconstruído a partir da pasta inteira.
+    """
+
+    def __init__(self, directory, max_bytes, scan_seconds=TTS_CACHE_SCAN_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.scan_seconds = scan_seconds
+        self._lock = threading.Lock()
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        self._last_scan = 0.0
+        self._inflight = {}
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'errors': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._rescan()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _rescan(self):
+        """
+        Reconstrói o índice LRU a partir dos arquivos da pasta, de todos os processos
+        (ordenados pelo último uso), e remove os menos usados se passar do limite
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.mp3'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        with self._lock:
+            self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+            self._total_bytes = sum(size for _, _, size in entries)
+            self._last_scan = time.monotonic()
+            self._evict()
+
+    def _evict(self):
+        # Deve ser chamado com o lock adquirido, logo após reler a pasta
+        if self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * _EVICT_TO
+        while self._total_bytes > target and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self._stats['evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def get(self, key):
+        """Retorna o áudio do segmento ou None se não estiver no cache"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Atualiza a data de modificação: é a ordem LRU vista por todos os processos
+            os.utime(path)
+        except OSError:
+            # Ainda não sintetizado, ou removido por outro processo
+            with self._lock:
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+                self._stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self._stats['hits'] += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+            else:
+                # Gravado por outro processo
+                self._index[key] = len(data)
+                self._total_bytes += len(data)
+        return data
+
+    def put(self, key, data):
+        """Armazena o áudio de um segmento"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(delete=False, dir=os.path.dirname(path), suffix='.tmp') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_file.name, path)
+
+        with self._lock:
+            self._total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            # Os outros processos também gravam na pasta: o total só é conhecido relendo-a
+            rescan = self._total_bytes > self.max_bytes or time.monotonic() - self._last_scan >= self.scan_seconds
+        if rescan:
+            self._rescan()
+
+    def get_or_create(self, key, create):
+        """
+        Retorna o segmento do cache ou o cria chamando create()
+
+        Se outro pedido já estiver criando o mesmo segmento, aguarda o resultado dele.
+        Resultados vazios (falhas) não são armazenados.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._stats['coalesced'] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            data = create()
+            if data:
+                try:
+                    self.put(key, data)
+                except OSError as e:
+                    logger.warning(f"[TTS-Cache] Erro ao gravar segmento no cache: {e}")
+                    with self._lock:
+                        self._stats['errors'] += 1
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        """Retorna as estatísticas de uso do cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._index)
+            stats['bytes'] = self._total_bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+_segment_cache = None
+_segment_cache_lock = threading.Lock()
+
+
+def get_segment_cache():
+    """Retorna o cache de segmentos compartilhado por este processo"""
+    global _segment_cache
+    if _segment_cache is None:
+        with _segment_cache_lock:
+            if _segment_cache is None:
+                _segment_cache = SegmentCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+    return _segment_cache
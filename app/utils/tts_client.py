@@ -0,0 +1,241 @@
+import os
+import logging
+import time
+import random
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import httpx
+import openai
+from openai import OpenAI
+from app.utils.tts_router import record_local_wait
+
+logger = logging.getLogger(__name__)
+
+# Limites da conta no provedor: requisições e caracteres por minuto (0 desativa o limite)
+OPENAI_TTS_RPM = float(os.environ.get('OPENAI_TTS_RPM', 50))
+OPENAI_TTS_CPM = float(os.environ.get('OPENAI_TTS_CPM', 0))
+
+# Tentativas após erros temporários (429, 5xx, falhas de conexão) e intervalos do backoff
+OPENAI_TTS_MAX_RETRIES = int(os.environ.get('OPENAI_TTS_MAX_RETRIES', 5))
+OPENAI_TTS_BACKOFF_SECONDS = float(os.environ.get('OPENAI_TTS_BACKOFF_SECONDS', 1))
+OPENAI_TTS_MAX_BACKOFF_SECONDS = float(os.environ.get('OPENAI_TTS_MAX_BACKOFF_SECONDS', 60))
+
+# Tempo máximo de uma requisição e conexões mantidas abertas com o provedor
+OPENAI_TTS_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_TTS_TIMEOUT_SECONDS', 120))
+OPENAI_TTS_MAX_CONNECTIONS = int(os.environ.get('OPENAI_TTS_MAX_CONNECTIONS', 16))
+
+# Número de chamadas consideradas no cálculo dos percentis de latência
+_LATENCY_WINDOW = 200
+
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+class TokenBucket:
+    """Balde de fichas reabastecido continuamente a uma taxa por minuto"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Tempo até haver amount fichas disponíveis (0 se já houver)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Distribui as chamadas ao provedor dentro dos limites de requisições e caracteres por minuto
+
+    Compartilhado por todas as threads do processo. Quando o provedor responde 429,
+    pause() suspende novas chamadas pelo tempo indicado, evitando que as demais
+    threads também estourem o limite.
+    """
+
+    def __init__(self, requests_per_minute, chars_per_minute):
+        self._lock = threading.Lock()
+        self._buckets = []
+        if requests_per_minute > 0:
+            self._buckets.append(('requests', TokenBucket(requests_per_minute)))
+        if chars_per_minute > 0:
+            self._buckets.append(('chars', TokenBucket(chars_per_minute)))
+        self._paused_until = 0.0
+
+    def acquire(self, chars):
+        """Aguarda até que a chamada caiba nos limites; retorna o tempo de espera"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = max(0.0, self._paused_until - now)
+                for name, bucket in self._buckets:
+                    delay = max(delay, bucket.wait_time(1 if name == 'requests' else chars, now))
+                if delay <= 0:
+                    for name, bucket in self._buckets:
+                        bucket.take(1 if name == 'requests' else chars)
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class LatencyStats:
+    """Contadores e latências das chamadas ao provedor"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=_LATENCY_WINDOW)
+        self._stats = {'calls': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0,
+                       'total_latency': 0.0, 'throttle_wait': 0.0}
+
+    def record(self, latency, ok):
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['total_latency'] += latency
+            if ok:
+                self._recent.append(latency)
+            else:
+                self._stats['errors'] += 1
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            recent = sorted(self._recent)
+        stats['avg_latency'] = stats['total_latency'] / stats['calls'] if stats['calls'] else 0.0
+        stats['p50_latency'] = recent[len(recent) // 2] if recent else 0.0
+        stats['p95_latency'] = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return stats
+
+
+def _retry_after(error):
+    """Tempo de espera indicado pelo provedor nos cabeçalhos da resposta, se houver"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # O cabeçalho também pode trazer uma data HTTP
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error):
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in _RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt, error=None):
+    """Espera antes da próxima tentativa: Retry-After do provedor ou backoff exponencial com jitter"""
+    retry_after = _retry_after(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, OPENAI_TTS_MAX_BACKOFF_SECONDS)
+    ceiling = min(OPENAI_TTS_MAX_BACKOFF_SECONDS, OPENAI_TTS_BACKOFF_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+class SpeechClient:
+    """
+    Cliente compartilhado da API de voz da OpenAI
+
+    Mantém um único pool de conexões HTTP para todas as threads, respeita os
+    limites de taxa configurados e repete chamadas que falharam por erros
+    temporários (as tentativas automáticas do SDK ficam desativadas).
+    """
+
+    def __init__(self, api_key, requests_per_minute=OPENAI_TTS_RPM, chars_per_minute=OPENAI_TTS_CPM,
+                 max_retries=OPENAI_TTS_MAX_RETRIES):
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(requests_per_minute, chars_per_minute)
+        self.latency = LatencyStats()
+        http_client = httpx.Client(
+            timeout=OPENAI_TTS_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=OPENAI_TTS_MAX_CONNECTIONS,
+                                max_keepalive_connections=OPENAI_TTS_MAX_CONNECTIONS)
+        )
+        self._client = OpenAI(api_key=api_key, max_retries=0, timeout=OPENAI_TTS_TIMEOUT_SECONDS,
+                              http_client=http_client)
+
+    def speech(self, text, model, voice, response_format='mp3'):
+        """Sintetiza o texto e retorna o áudio; levanta a última exceção se todas as tentativas falharem"""
+        attempt = 0
+        while True:
+            waited = self.limiter.acquire(len(text))
+            self.latency.increment('throttle_wait', waited)
+            record_local_wait(waited)
+            start = time.monotonic()
+            try:
+                response = self._client.audio.speech.create(
+                    model=model, voice=voice, input=text, response_format=response_format
+                )
+                audio = response.content
+                self.latency.record(time.monotonic() - start, ok=True)
+                return audio
+            except Exception as e:
+                self.latency.record(time.monotonic() - start, ok=False)
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise
+
+                delay = backoff_delay(attempt, e)
+                if isinstance(e, openai.RateLimitError):
+                    # Segura todas as threads, não só esta, até o limite ser liberado
+                    self.latency.increment('rate_limited')
+                    self.limiter.pause(delay)
+                self.latency.increment('retries')
+                attempt += 1
+                logger.warning(f"[TTS-OpenAI] {type(e).__name__}; nova tentativa ({attempt}/{self.max_retries}) em {delay:.1f}s")
+                time.sleep(delay)
+                record_local_wait(delay)
+
+    def stats(self):
+        """Retorna as estatísticas das chamadas (contadores e latências em segundos)"""
+        return self.latency.snapshot()
+
+
+_speech_client = None
+_speech_client_lock = threading.Lock()
+
+
+def get_speech_client():
+    """Retorna o cliente de voz compartilhado por este processo, ou None sem chave de API"""
+    global _speech_client
+    if _speech_client is None:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        with _speech_client_lock:
+            if _speech_client is None:
+                _speech_client = SpeechClient(api_key)
+    return _speech_client
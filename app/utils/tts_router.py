@@ -0,0 +1,223 @@
+import os
+import logging
+import time
+import threading
+from collections import deque
+from app.utils.metrics import TTS_REQUEST_SECONDS, TTS_SECONDS_PER_CHAR, TTS_CHARACTERS
+
+logger = logging.getLogger(__name__)
+
+# Janela de chamadas recentes usada para calcular a taxa de erros de cada provedor
+TTS_BREAKER_WINDOW = int(os.environ.get('TTS_BREAKER_WINDOW', 20))
+# Chamadas mínimas na janela e taxa de erros a partir da qual o circuito abre
+TTS_BREAKER_MIN_CALLS = int(os.environ.get('TTS_BREAKER_MIN_CALLS', 4))
+TTS_BREAKER_ERROR_RATE = float(os.environ.get('TTS_BREAKER_ERROR_RATE', 0.5))
+# Tempo com o circuito aberto antes de testar o provedor novamente (dobra a cada teste falho)
+TTS_BREAKER_COOLDOWN_SECONDS = float(os.environ.get('TTS_BREAKER_COOLDOWN_SECONDS', 30))
+TTS_BREAKER_MAX_COOLDOWN_SECONDS = float(os.environ.get('TTS_BREAKER_MAX_COOLDOWN_SECONDS', 600))
+# Chamadas mais lentas que isso contam como falha (o áudio é usado, mas o provedor é preterido)
+TTS_SLOW_SECONDS = float(os.environ.get('TTS_SLOW_SECONDS', 30))
+# Provedor degradado (antes de o circuito abrir): taxa de erros ou latência média a partir
+# das quais ele passa para depois dos provedores saudáveis
+TTS_DEGRADED_ERROR_RATE = float(os.environ.get('TTS_DEGRADED_ERROR_RATE', 0.2))
+TTS_DEGRADED_SECONDS = float(os.environ.get('TTS_DEGRADED_SECONDS', TTS_SLOW_SECONDS / 2))
+
+# Peso das chamadas mais recentes na média móvel de latência
+_LATENCY_ALPHA = 0.2
+
+# Espera local acumulada pela chamada em andamento em cada thread
+_local_wait = threading.local()
+
+
+def record_local_wait(seconds):
+    """
+    Registra um tempo de espera da própria aplicação durante a chamada em andamento
+    nesta thread (limite de taxa, backoff entre tentativas, vaga de concorrência)
+
+    Esse tempo é descontado da latência da chamada: ele não diz nada sobre o provedor
+    e não deve abrir o circuito por lentidão.
+    """
+    if seconds > 0:
+        _local_wait.seconds = getattr(_local_wait, 'seconds', 0.0) + seconds
+
+
+class CircuitOpenError(Exception):
+    """O provedor está com o circuito aberto e não deve ser chamado agora"""
+
+
+class CircuitBreaker:
+    """
+    Disjuntor de um provedor de TTS
+
+    closed: as chamadas passam e os resultados entram na janela recente.
+    open: as chamadas são recusadas imediatamente até o fim do cooldown.
+    half_open: uma única chamada de teste passa; sucesso fecha o circuito,
+    falha o reabre com o dobro do cooldown.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name):
+        self.name = name
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._results = deque(maxlen=TTS_BREAKER_WINDOW)
+        self._cooldown = TTS_BREAKER_COOLDOWN_SECONDS
+        self._opened_at = 0.0
+        self._probing = False
+        self._last_call_at = 0.0
+        self.latency = None
+        self.calls = 0
+        self.failures = 0
+        self.slow = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def _refresh(self, now):
+        if self.state == self.OPEN and now - self._opened_at >= self._cooldown:
+            self.state = self.HALF_OPEN
+            self._probing = False
+
+    def available(self):
+        """Indica se o provedor aceitaria uma chamada agora"""
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self._probing)
+
+    def before_call(self):
+        """Reserva a chamada; levanta CircuitOpenError se o circuito não permitir"""
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self.state == self.OPEN or (self.state == self.HALF_OPEN and self._probing):
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuito do provedor {self.name} aberto")
+            if self.state == self.HALF_OPEN:
+                self._probing = True
+
+    def health(self):
+        """
+        Taxa de erros e latência média recentes, ou (0, None) sem histórico
+
+        Um provedor preterido deixa de receber chamadas, então o histórico que não
+        é renovado em TTS_BREAKER_COOLDOWN_SECONDS é esquecido e ele volta a ser tentado.
+        """
+        with self._lock:
+            if self._results and time.monotonic() - self._last_call_at >= TTS_BREAKER_COOLDOWN_SECONDS:
+                self._results.clear()
+                self.latency = None
+            return self._error_rate(), self.latency
+
+    def record(self, ok, latency):
+        with self._lock:
+            now = time.monotonic()
+            self._last_call_at = now
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            elif latency > TTS_SLOW_SECONDS:
+                self.slow += 1
+                ok = False
+            self._results.append(ok)
+            self.latency = latency if self.latency is None else \
+                _LATENCY_ALPHA * latency + (1 - _LATENCY_ALPHA) * self.latency
+
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if ok:
+                    logger.info(f"[TTS-Router] Provedor {self.name} respondeu ao teste, fechando o circuito")
+                    self.state = self.CLOSED
+                    self._cooldown = TTS_BREAKER_COOLDOWN_SECONDS
+                    self._results.clear()
+                else:
+                    self._cooldown = min(self._cooldown * 2, TTS_BREAKER_MAX_COOLDOWN_SECONDS)
+                    self._open(now)
+            elif self.state == self.CLOSED and len(self._results) >= TTS_BREAKER_MIN_CALLS \
+                    and self._error_rate() >= TTS_BREAKER_ERROR_RATE:
+                self._open(now)
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self._opened_at = now
+        self.opened += 1
+        logger.warning(f"[TTS-Router] Abrindo o circuito do provedor {self.name} por {self._cooldown:.0f}s")
+
+    def _error_rate(self):
+        if not self._results:
+            return 0.0
+        return sum(1 for ok in self._results if not ok) / len(self._results)
+
+    def stats(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            return {
+                'state': self.state,
+                'error_rate': self._error_rate(),
+                'latency': self.latency,
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow': self.slow,
+                'rejected': self.rejected,
+                'opened': self.opened
+            }
+
+
+class ProviderRouter:
+    """
+    Escolhe o provedor de TTS para cada segmento a partir do histórico recente
+
+    Os provedores saudáveis são tentados em ordem de preferência, para manter a
+    mesma voz ao longo do livro: um provedor local mais rápido não passa à frente
+    de um saudável só pela latência. Os degradados (taxa de erros a partir de
+    TTS_DEGRADED_ERROR_RATE ou latência média a partir de TTS_DEGRADED_SECONDS)
+    vêm em seguida, do mais para o menos saudável (taxa de erros, depois latência).
+    Os que estão com o circuito aberto vão para o fim da lista e só recebem chamadas
+    de teste depois do cooldown, então uma indisponibilidade não custa um timeout
+    por segmento.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.breakers = {name: CircuitBreaker(name) for name in self.names}
+
+    def ranked(self):
+        """Provedores do mais para o menos indicado"""
+        available = [name for name in self.names if self.breakers[name].available()]
+
+        def health_key(name):
+            error_rate, latency = self.breakers[name].health()
+            degraded = error_rate >= TTS_DEGRADED_ERROR_RATE or (latency or 0.0) >= TTS_DEGRADED_SECONDS
+            if not degraded:
+                return (0, 0.0, 0.0, self.names.index(name))
+            return (1, error_rate, latency or 0.0, self.names.index(name))
+
+        return sorted(available, key=health_key) + [name for name in self.names if name not in available]
+
+    def call(self, name, synthesize, text):
+        """
+        Chama o provedor registrando o resultado no disjuntor
+
+        Retorna o áudio ou None em caso de falha; levanta CircuitOpenError se o
+        circuito não permitir a chamada.
+        """
+        breaker = self.breakers[name]
+        breaker.before_call()
+        _local_wait.seconds = 0.0
+        start = time.monotonic()
+        audio = None
+        try:
+            audio = synthesize(text)
+            return audio
+        finally:
+            # Apenas o tempo gasto no provedor, sem as esperas da própria aplicação
+            latency = max(0.0, time.monotonic() - start - _local_wait.seconds)
+            breaker.record(bool(audio), latency)
+            TTS_REQUEST_SECONDS.observe(latency, provider=name, result='ok' if audio else 'error')
+            if audio and text:
+                TTS_SECONDS_PER_CHAR.observe(latency / len(text), provider=name)
+                TTS_CHARACTERS.inc(len(text), provider=name)
+
+    def stats(self):
+        """Estado do disjuntor de cada provedor"""
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
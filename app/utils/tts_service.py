@@ -1,173 +1,297 @@
 import os
+import logging
+import re
 import uuid
 import time
-from openai import OpenAI
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
 import tempfile
+from app.utils.tts_cache import get_segment_cache, segment_cache_key
+from app.utils.tts_backends import get_backend
+from app.utils.mp3_index import mp3_duration
+from app.utils.tts_router import ProviderRouter, CircuitOpenError
+from app.utils.metrics import MP3_WRITE_SECONDS, TTS_FALLBACKS, TTS_SEGMENT_FAILURES
+
+logger = logging.getLogger(__name__)
+
+# Limite de caracteres por requisição do provedor (a API da OpenAI aceita até 4096)
+TTS_CHUNK_CHARS = int(os.environ.get('TTS_CHUNK_CHARS', 4000))
+
+# Número máximo de segmentos sintetizados ao mesmo tempo
+TTS_MAX_WORKERS = int(os.environ.get('TTS_MAX_WORKERS', 4))
+
+# Provedores de TTS em ordem de preferência (ver app/utils/tts_backends.py)
+TTS_PROVIDERS = [name.strip() for name in os.environ.get('TTS_PROVIDERS', 'openai,gtts,espeak').split(',') if name.strip()]
+
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_SENTENCE_RE = re.compile(r'(?<=[.!?…;:])\s+')
+
+
+def _split_long_piece(piece, max_chars):
+    """Quebra um trecho maior que o limite em palavras (ou cortes fixos, em último caso)"""
+    parts = []
+    current = ""
+    for word in piece.split():
+        while len(word) > max_chars:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(word[:max_chars])
+            word = word[max_chars:]
+        if not word:
+            continue
+        if current and len(current) + 1 + len(word) > max_chars:
+            parts.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_text(text, max_chars=TTS_CHUNK_CHARS):
+    """
+    Divide o texto em segmentos de até max_chars caracteres,
+    respeitando os limites de parágrafos e frases sempre que possível
+    """
+    chunks = []
+    current = ""
+
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+
+        # Separa o parágrafo em frases; frases maiores que o limite são quebradas em palavras
+        pieces = []
+        for sentence in _SENTENCE_RE.split(paragraph):
+            if len(sentence) > max_chars:
+                pieces.extend(_split_long_piece(sentence, max_chars))
+            elif sentence:
+                pieces.append(sentence)
+
+        # Junta as frases no segmento atual; um novo parágrafo começa em nova linha
+        separator = "\n\n"
+        for piece in pieces:
+            if current and len(current) + len(separator) + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}{separator}{piece}" if current else piece
+            separator = " "
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def iter_text_chunks(texts, max_chars=TTS_CHUNK_CHARS):
+    """
+    Gera segmentos de até max_chars caracteres a partir de um fluxo de textos (ex.: páginas),
+    emitindo cada segmento assim que o texto seguinte garante que ele está completo
+    """
+    buffer = ""
+    for text in texts:
+        if not text:
+            continue
+        buffer = f"{buffer}\n\n{text}" if buffer else text
+
+        # Mantém o último segmento no buffer, pois ele pode continuar na próxima página
+        if len(buffer) > 2 * max_chars:
+            chunks = split_text(buffer, max_chars)
+            for chunk in chunks[:-1]:
+                yield chunk
+            buffer = chunks[-1] if chunks else ""
+
+    for chunk in split_text(buffer, max_chars):
+        yield chunk
+
 
 def text_to_speech(text, output_folder):
     """
     Converte texto para fala usando a API TTS da OpenAI
-    
+
+    O texto é dividido em segmentos do tamanho aceito pelo provedor, que são
+    sintetizados em paralelo e concatenados na ordem original em um único MP3.
+
     Args:
         text (str): Texto a ser convertido em fala
         output_folder (str): Pasta onde o áudio será salvo
-        
+
     Returns:
         str: Caminho para o arquivo de áudio gerado
-        float: Duração do áudio em segundos (aproximada)
+        float: Duração do áudio em segundos
     """
-    print(f"[TTS] Iniciando conversão de texto para áudio. Tamanho do texto: {len(text)} caracteres")
-    
-    # Verifica se o texto é muito longo e trunca se necessário
-    # O limite é de aproximadamente 4000 tokens (cerca de 16000 caracteres)
-    max_chars = 16000
-    if len(text) > max_chars:
-        print(f"[TTS] Texto muito longo ({len(text)} caracteres). Truncando para {max_chars} caracteres.")
-        text = text[:max_chars]
-    
-    # Tenta usar o método OpenAI primeiro
-    try:
-        print(f"[TTS] Tentando converter com OpenAI...")
-        result = tts_with_openai(text, output_folder)
-        if result[0]:  # Se conseguiu gerar o áudio
-            print(f"[TTS] Conversão com OpenAI bem-sucedida!")
-            return result
-    except Exception as e:
-        print(f"[TTS] Erro na conversão com OpenAI: {e}")
-    
-    # Se falhar com OpenAI, tenta o método alternativo com gTTS
-    try:
-        print(f"[TTS] Tentando converter com Google TTS...")
-        result = tts_with_gtts(text, output_folder)
-        if result[0]:
-            print(f"[TTS] Conversão com Google TTS bem-sucedida!")
-            return result
-    except Exception as e:
-        print(f"[TTS] Erro na conversão com Google TTS: {e}")
-    
-    # Se ambos falharem, tenta um método de último recurso
-    try:
-        print(f"[TTS] Tentando método de último recurso...")
-        result = dummy_audio_fallback(output_folder)
-        if result[0]:
-            print(f"[TTS] Método de último recurso bem-sucedido")
-            return result
-    except Exception as e:
-        print(f"[TTS] Todos os métodos de conversão falharam: {e}")
-    
-    # Se tudo falhar, retorna None
-    return None, 0
+    logger.info(f"[TTS] Iniciando conversão de texto para áudio. Tamanho do texto: {len(text)} caracteres")
+    return stream_to_speech([text], output_folder)
+
+
+def stream_to_speech(texts, output_folder, on_segment=None, progress=None, checkpoint=None):
+    """
+    Converte um fluxo de textos (ex.: páginas extraídas) para um único MP3
+
+    Os segmentos são enviados ao provedor assim que ficam prontos, com no máximo
+    2 * TTS_MAX_WORKERS segmentos em andamento, e gravados em ordem no arquivo final.
+    Se on_segment for informado, é chamado como on_segment(index, audio, duration)
+    para cada segmento, em ordem, assim que ele é gravado. Se progress for informado,
+    seus métodos segment_submitted() e segment_done() são chamados a cada segmento.
+
+    Se checkpoint for informado (ex.: SegmentPlaylist), cada segmento gravado é
+    registrado com checkpoint.add(index, audio, duration, text), e os segmentos para os
+    quais checkpoint.resume(index, text) retornar áudio não são sintetizados de novo.
+
+    Returns:
+        str: Caminho para o arquivo de áudio gerado
+        float: Duração do áudio em segundos
+    """
+    unique_filename = f"{uuid.uuid4().hex}.mp3"
+    output_path = os.path.join(output_folder, unique_filename)
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3", dir=output_folder)
+    temp_path = temp_file.name
+
+    start_time = time.time()
+    pending = deque()
+    segment_count = 0
+    resumed = 0
+    succeeded = True
+
+    written = 0
+    total_duration = 0.0
+
+    def write_next():
+        nonlocal written, total_duration
+        # Frames MP3 são independentes, então os segmentos podem ser concatenados diretamente
+        future, text = pending.popleft()
+        audio = future.result()
+        if not audio:
+            return False
+        # A duração vem dos cabeçalhos dos frames; um segmento sem frames válidos não é áudio
+        duration = mp3_duration(audio)
+        if not duration:
+            logger.error(f"[TTS] Segmento {written} não contém áudio MP3 válido ({len(audio)} bytes)")
+            return False
+        with MP3_WRITE_SECONDS.time(target='output'):
+            temp_file.write(audio)
+        total_duration += duration
+        if progress:
+            progress.segment_done()
+        if checkpoint:
+            with MP3_WRITE_SECONDS.time(target='checkpoint'):
+                checkpoint.add(written, audio, duration, text)
+        if on_segment:
+            temp_file.flush()
+            on_segment(written, audio, duration)
+        written += 1
+        return True
 
-def tts_with_openai(text, output_folder):
-    """Converte texto para áudio usando OpenAI."""
     try:
-        api_key = os.environ.get("OPENAI_API_KEY")
-        print(f"[TTS-OpenAI] Verificando API key: {api_key[:5]}...{api_key[-4:] if api_key and len(api_key) > 8 else 'INVÁLIDA'}")
-        
-        if not api_key:
-            print("[TTS-OpenAI] API key não encontrada")
-            return None, 0
-            
-        client = OpenAI(api_key=api_key)
-        
-        # Gera um nome de arquivo único
-        unique_filename = f"{uuid.uuid4().hex}.mp3"
-        output_path = os.path.join(output_folder, unique_filename)
-        
-        # Utiliza um arquivo temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
-            temp_path = temp_file.name
-            
-            # Faz a chamada para a API
-            response = client.audio.speech.create(
-                model="tts-1",
-                voice="alloy",
-                input=text,
-                response_format="mp3"
-            )
-            
-            # Salva a resposta no arquivo temporário
-            response.stream_to_file(temp_path)
-            
-            # Move o arquivo para o destino final
-            import shutil
-            shutil.move(temp_path, output_path)
-        
-        # Estima a duração
-        word_count = len(text.split())
-        estimated_duration = (word_count / 150) * 60  # em segundos
-        
-        return unique_filename, estimated_duration
-        
-    except Exception as e:
-        print(f"[TTS-OpenAI] Erro: {e}")
-        import traceback
-        print(traceback.format_exc())
-        
-        # Limpa arquivos temporários
-        if 'temp_path' in locals() and os.path.exists(temp_path):
+        with ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS) as executor:
             try:
-                os.remove(temp_path)
-            except:
-                pass
-                
+                for chunk in iter_text_chunks(texts, segment_chars()):
+                    # Segmentos gravados por uma tentativa anterior são aproveitados
+                    audio = checkpoint.resume(segment_count, chunk) if checkpoint else None
+                    if audio:
+                        future = Future()
+                        future.set_result(audio)
+                        resumed += 1
+                    else:
+                        future = executor.submit(synthesize_segment, chunk)
+                    pending.append((future, chunk))
+                    segment_count += 1
+                    if progress:
+                        progress.segment_submitted()
+
+                    # Limita os segmentos em andamento e grava os que já terminaram em ordem
+                    while pending and (len(pending) >= 2 * TTS_MAX_WORKERS or pending[0][0].done()):
+                        if not write_next():
+                            succeeded = False
+                            break
+                    if not succeeded:
+                        break
+
+                while succeeded and pending:
+                    succeeded = write_next()
+            finally:
+                for future, _ in pending:
+                    future.cancel()
+    except Exception:
+        # Erros na leitura do texto (ex.: falha na extração do PDF) são repassados ao chamador
+        temp_file.close()
+        os.remove(temp_path)
+        raise
+    finally:
+        temp_file.close()
+
+    if succeeded and segment_count:
+        logger.info(f"[TTS] {segment_count} segmentos ({resumed} retomados do checkpoint) em {time.time() - start_time:.1f}s")
+        os.replace(temp_path, output_path)
+        return unique_filename, total_duration
+
+    os.remove(temp_path)
+
+    if not segment_count:
+        logger.info("[TTS] Nenhum texto para converter")
         return None, 0
 
-def tts_with_gtts(text, output_folder):
-    """Converte texto para áudio usando Google Text-to-Speech."""
-    try:
-        # Tenta importar gTTS
+    # Um arquivo de silêncio não é registrado como conversão; o job falha e pode ser repetido
+    logger.error(f"[TTS] Falha na conversão de um dos {segment_count} segmentos")
+    return None, 0
+
+def configured_backends():
+    """Provedores registrados que constam em TTS_PROVIDERS, em ordem de preferência"""
+    return [get_backend(name) for name in TTS_PROVIDERS if get_backend(name)]
+
+
+def segment_chars():
+    """Tamanho dos segmentos: o menor limite entre TTS_CHUNK_CHARS e os provedores configurados"""
+    return min([TTS_CHUNK_CHARS] + [backend.max_chars for backend in configured_backends()])
+
+
+_tts_router = None
+_tts_router_lock = threading.Lock()
+
+
+def get_tts_router():
+    """Retorna o roteador de provedores compartilhado por este processo"""
+    global _tts_router
+    if _tts_router is None:
+        with _tts_router_lock:
+            if _tts_router is None:
+                _tts_router = ProviderRouter([backend.name for backend in configured_backends()])
+    return _tts_router
+
+
+def synthesize_segment(text):
+    """Sintetiza um segmento de texto no provedor mais indicado, passando aos demais em caso de falha"""
+    cache = get_segment_cache()
+    router = get_tts_router()
+    skipped = []
+
+    for name in router.ranked():
+        backend = get_backend(name)
+        key = segment_cache_key(text, *backend.cache_params(), 'mp3')
         try:
-            from gtts import gTTS
-        except ImportError:
-            print("[TTS-Google] gTTS não encontrado, tentando instalar...")
-            import subprocess
-            subprocess.check_call(["pip", "install", "gtts==2.3.2"])
-            from gtts import gTTS
-            
-        # Gera um nome de arquivo único
-        unique_filename = f"{uuid.uuid4().hex}_gtts.mp3"
-        output_path = os.path.join(output_folder, unique_filename)
-        
-        # Cria o áudio com gTTS (português Brasil)
-        tts = gTTS(text=text, lang='pt-br', slow=False)
-        tts.save(output_path)
-        
-        # Verifica se o arquivo foi criado
-        if not os.path.exists(output_path) or os.path.getsize(output_path) < 100:  # verifica tamanho mínimo
-            print(f"[TTS-Google] Arquivo de áudio não criado corretamente")
-            return None, 0
-            
-        # Estima a duração
-        word_count = len(text.split())
-        estimated_duration = (word_count / 150) * 60
-        
-        return unique_filename, estimated_duration
-        
-    except Exception as e:
-        print(f"[TTS-Google] Erro: {e}")
-        import traceback
-        print(traceback.format_exc())
-        return None, 0
+            if not backend.is_available():
+                # Segmentos sintetizados antes continuam valendo (ex.: sem a chave da API)
+                audio = cache.get(key)
+                reason = 'unavailable'
+            else:
+                # Segmentos já sintetizados são servidos do cache mesmo com o circuito aberto
+                audio = cache.get_or_create(key, lambda: router.call(name, backend.synthesize, text))
+                reason = 'failed'
+            if audio:
+                # Conta as passagens para o próximo provedor só quando um deles resolveu o segmento
+                for skipped_name, skipped_reason in skipped:
+                    TTS_FALLBACKS.inc(provider=skipped_name, reason=skipped_reason)
+                return audio
+        except CircuitOpenError:
+            reason = 'circuit_open'
+        except Exception as e:
+            logger.warning(f"[TTS] Erro na conversão com {name}: {e}")
+            reason = 'error'
+        skipped.append((name, reason))
 
-def dummy_audio_fallback(output_folder):
-    """Cria um arquivo de áudio vazio como último recurso."""
-    try:
-        print("[TTS-Fallback] Criando arquivo de áudio dummy...")
-        
-        # Gera um nome de arquivo único
-        unique_filename = f"{uuid.uuid4().hex}_empty.mp3"
-        output_path = os.path.join(output_folder, unique_filename)
-        
-        # Cria um arquivo MP3 mínimo válido (silêncio)
-        # Estes bytes representam um MP3 válido de 1 segundo de silêncio
-        mp3_bytes = b'\xFF\xFB\x90\x44\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
-        
-        with open(output_path, 'wb') as f:
-            f.write(mp3_bytes)
-            
-        return unique_filename, 1.0  # 1 segundo de duração
-        
-    except Exception as e:
-        print(f"[TTS-Fallback] Erro no método de último recurso: {e}")
-        return None, 0 
\ No newline at end of file
+    TTS_SEGMENT_FAILURES.inc()
+    return None
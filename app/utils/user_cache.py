@@ -0,0 +1,98 @@
+import os
+import time
+import threading
+from sqlalchemy.orm import make_transient_to_detached
+from app.models.db import db
+from app.models.user import User
+
+# Tempo (em segundos) que os dados do usuário autenticado ficam em cache (0 desativa)
+USER_CACHE_SECONDS = float(os.environ.get('USER_CACHE_SECONDS', 60))
+
+
+class UserCache:
+    """
+    Cache por processo da identidade e do estado da assinatura dos usuários
+
+    Guarda uma cópia desanexada de cada usuário (apenas as colunas); a cada requisição
+    ela é associada à sessão atual sem consultar o banco. As rotas que alteram a
+    assinatura invalidam a entrada, mas só no processo que as atendeu.
+
+    Por isso apenas usuários com assinatura ativa ficam em cache: um pagamento confirmado
+    por webhook em outro processo vale já na próxima requisição, em vez de o usuário
+    continuar sendo enviado à página de assinatura até o TTL. O caso inverso (assinatura
+    cancelada) fica limitado pelo TTL, e o fim do período é conferido a cada requisição.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidations': 0}
+
+    def get(self, user_id):
+        """Retorna a cópia em cache do usuário ou None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            expires_at, snapshot = entry
+            if expires_at < now:
+                del self._entries[user_id]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            return snapshot
+
+    def put(self, user):
+        """Armazena uma cópia das colunas do usuário, se ele tiver assinatura ativa"""
+        if self.ttl <= 0 or not user.is_subscribed():
+            return
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        snapshot = User(**values)
+        # Marca a cópia como já persistida, para poder ser associada à sessão sem consulta
+        make_transient_to_detached(snapshot)
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, snapshot)
+
+    def invalidate(self, user_id):
+        """Remove o usuário do cache (ex.: após uma mudança na assinatura)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Retorna as estatísticas de uso do cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+user_cache = UserCache(USER_CACHE_SECONDS)
+
+
+def load_cached_user(user_id):
+    """Carrega o usuário para a requisição atual, consultando o banco apenas sem cache válido"""
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return db.session.merge(snapshot, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.put(user)
+    return user
+
+
+def invalidate_user(user_id):
+    """Descarta os dados em cache do usuário"""
+    user_cache.invalidate(user_id)
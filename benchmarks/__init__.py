@@ -0,0 +1 @@
+# Este arquivo permite que o diretório 'benchmarks' seja importado como um pacote Python 
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""Geração de PDFs sintéticos para os benchmarks (sem dependências além da biblioteca padrão)"""
+import random
+
+# Palavras usadas no texto gerado (ASCII, para caber na codificação padrão da Helvetica)
+WORDS = (
+    "o a de que e do da em um para com nao uma os no se na por mais as dos como mas ao ele das "
+    "seu sua ou quando muito nos ja eu tambem so pelo pela ate isso ela entre depois sem mesmo aos "
+    "seus quem nas me esse eles voce essa num nem suas meu minha numa pelos elas qual lhe deles "
+    "livro capitulo historia cidade tempo noite caminho janela palavra memoria silencio viagem "
+    "conhecimento universidade extraordinario desenvolvimento responsabilidade compreensao"
+).split()
+
+# Layouts disponíveis: texto corrido, duas colunas e livro (cabeçalho, rodapé, sumário, hifenização)
+LAYOUTS = ('prosa', 'colunas', 'livro')
+
+_PAGE_WIDTH = 595
+_PAGE_HEIGHT = 842
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _lines(rng, count, width):
+    lines = []
+    current = []
+    length = 0
+    while len(lines) < count:
+        word = rng.choice(WORDS)
+        if length + len(word) + 1 > width:
+            lines.append(" ".join(current))
+            current, length = [], 0
+        current.append(word)
+        length += len(word) + 1
+        if rng.random() < 0.08:
+            current[-1] += '.'
+    return lines
+
+
+def _text_block(lines, x, y, size=10, leading=13):
+    ops = [f"BT /F1 {size} Tf {x} {y} Td {leading} TL"]
+    ops.extend(f"({_escape(line)}) Tj T*" for line in lines)
+    ops.append("ET")
+    return ops
+
+
+def _page_content(rng, layout, number, page_count, title):
+    if layout == 'colunas':
+        left = _lines(rng, 58, 42)
+        right = _lines(rng, 58, 42)
+        return _text_block(left, 40, 800) + _text_block(right, 310, 800)
+
+    if layout == 'livro':
+        ops = _text_block([f"{title} - Capitulo {number // 10 + 1}"], 200, 815, size=8)
+        if number < 2:
+            # Sumário com pontilhado
+            body = [f"Capitulo {entry + 1} {'.' * 60} {entry * 10 + 3}" for entry in range(number * 25, number * 25 + 25)]
+        else:
+            body = _lines(rng, 56, 90)
+            # Palavras quebradas no fim de algumas linhas
+            for index in range(0, len(body) - 1, 7):
+                word = rng.choice([w for w in WORDS if len(w) > 8])
+                body[index] += f" {word[:4]}-"
+                body[index + 1] = f"{word[4:]} {body[index + 1]}"
+        ops += _text_block(body, 50, 790)
+        ops += _text_block([f"{number + 1}"], 290, 30, size=9)
+        return ops
+
+    return _text_block(_lines(rng, 60, 95), 50, 800)
+
+
+def make_pdf(path, page_count, layout='prosa', seed=0, title="Livro Sintetico"):
+    """Grava em path um PDF com page_count páginas de texto no layout informado"""
+    rng = random.Random(f"{seed}:{layout}:{page_count}")
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")
+    kids = []
+    for number in range(page_count):
+        stream = "\n".join(_page_content(rng, layout, number, page_count, title)).encode('latin-1')
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, _PAGE_WIDTH, _PAGE_HEIGHT, content, font)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+
+    catalog_extra = b""
+    if layout == 'livro' and page_count > 10:
+        # Sumário do PDF com um capítulo a cada 10 páginas
+        starts = list(range(0, page_count, 10))
+        outlines = add(b"")
+        items = [add(b"") for _ in starts]
+        for index, start in enumerate(starts):
+            entry = b"<< /Title (Capitulo %d) /Parent %d 0 R /Dest [%d 0 R /Fit]" % (index + 1, outlines, kids[start])
+            if index > 0:
+                entry += b" /Prev %d 0 R" % items[index - 1]
+            if index < len(items) - 1:
+                entry += b" /Next %d 0 R" % items[index + 1]
+            objects[items[index] - 1] = entry + b" >>"
+        objects[outlines - 1] = b"<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>" % (
+            items[0], items[-1], len(items)
+        )
+        catalog_extra = b" /Outlines %d 0 R" % outlines
+
+    info = add(b"<< /Title (%s) /Author (Benchmark) >>" % title.encode('latin-1'))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R%s >>" % (pages_id, catalog_extra))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, info, xref
+    )
+
+    with open(path, 'wb') as f:
+        f.write(output)
+    return path
+
+
+def synthetic_pages(page_count, seed=0, chars_per_page=3000):
+    """Texto de páginas sintéticas, sem passar por um PDF (para os benchmarks de síntese)"""
+    rng = random.Random(f"{seed}:texto:{page_count}")
+    pages = []
+    for _ in range(page_count):
+        lines = _lines(rng, chars_per_page // 90 + 1, 90)
+        pages.append("\n".join(lines))
+    return pages
@@ -0,0 +1,419 @@
+"""
+Benchmarks dos caminhos críticos: extração de texto, orquestração da síntese,
+listagem do dashboard e download dos áudios
+
+Uso (na raiz do projeto):
+    python -m benchmarks.run                      # roda tudo e grava benchmarks/results/latest.json
+    python -m benchmarks.run --quick              # tamanhos menores, para uma verificação rápida
+    python -m benchmarks.run --only extraction    # só um grupo (extraction, synthesis, dashboard, download)
+    python -m benchmarks.run --save-baseline      # grava o resultado como benchmarks/baseline.json
+
+Quando existe um baseline, cada métrica é comparada com ele e o comando termina
+com código 1 se alguma piorar mais que --tolerance. O baseline é local (não versionado):
+grave-o antes da mudança, na mesma máquina em que a comparação será feita.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+# O ambiente precisa ser configurado antes de importar a aplicação: banco, cache e
+# arquivos ficam em uma pasta temporária e o único provedor de TTS é o simulado.
+# Os processos do pool de extração herdam a mesma pasta pela variável de ambiente.
+WORK_DIR = os.environ.get('AIREADER_BENCH_DIR') or tempfile.mkdtemp(prefix='aireader-bench-')
+os.environ['AIREADER_BENCH_DIR'] = WORK_DIR
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORK_DIR, 'bench.db')
+os.environ['CONVERSION_WORKERS'] = '0'
+os.environ['DB_AUTO_MIGRATE'] = '1'
+os.environ['TTS_PROVIDERS'] = 'stub'
+os.environ['TTS_CACHE_DIR'] = os.path.join(WORK_DIR, 'tts_cache')
+
+from benchmarks.pdfs import make_pdf, synthetic_pages, LAYOUTS
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'latest.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+GROUPS = ('extraction', 'synthesis', 'dashboard', 'download')
+
+# Tamanhos usados em cada modo
+SIZES = {
+    'full': {
+        'extraction_pages': (10, 50, 150),
+        'synthesis_pages': 60,
+        'synthesis_latencies': (0.0, 0.05, 0.2),
+        'dashboard_pdfs': (10, 100, 1000, 5000),
+        'download_mb': (8, 64),
+        'repeat': 3
+    },
+    'quick': {
+        'extraction_pages': (5, 15),
+        'synthesis_pages': 15,
+        'synthesis_latencies': (0.0, 0.05),
+        'dashboard_pdfs': (10, 200),
+        'download_mb': (8,),
+        'repeat': 2
+    }
+}
+
+
+def result(name, value, unit, higher_is_better=True, **params):
+    return {'name': name, 'value': value, 'unit': unit, 'higher_is_better': higher_is_better, 'params': params}
+
+
+def best_time(fn, repeat):
+    """Menor tempo de repeat execuções (o menos afetado por ruído da máquina) e o último retorno"""
+    times = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), value
+
+
+def bench_extraction(sizes, repeat):
+    """Páginas por segundo na extração serial, paralela e em extract_text_from_pdf"""
+    from app.utils.pdf_processor import iter_pdf_pages, iter_pdf_pages_parallel, extract_text_from_pdf
+
+    pdf_dir = os.path.join(WORK_DIR, 'pdfs')
+    os.makedirs(pdf_dir, exist_ok=True)
+    results = []
+    for layout in LAYOUTS:
+        # O maior tamanho só no texto corrido; os outros layouts mudam pouco a proporção
+        counts = sizes['extraction_pages'] if layout == 'prosa' else sizes['extraction_pages'][:-1]
+        for pages in counts:
+            path = make_pdf(os.path.join(pdf_dir, f"{layout}_{pages}.pdf"), pages, layout)
+            elapsed, _ = best_time(lambda: list(iter_pdf_pages(path)), repeat)
+            results.append(result(f"extraction.serial.{layout}.{pages}", pages / elapsed, 'páginas/s',
+                                  layout=layout, pages=pages))
+
+            # A primeira chamada cria o pool de processos; ela não entra na medição
+            list(iter_pdf_pages_parallel(path))
+            elapsed, _ = best_time(lambda: list(iter_pdf_pages_parallel(path)), repeat)
+            results.append(result(f"extraction.parallel.{layout}.{pages}", pages / elapsed, 'páginas/s',
+                                  layout=layout, pages=pages))
+
+    pages = sizes['extraction_pages'][-1]
+    path = os.path.join(pdf_dir, f"prosa_{pages}.pdf")
+    elapsed, _ = best_time(lambda: extract_text_from_pdf(path), repeat)
+    results.append(result(f"extraction.extract_text_from_pdf.{pages}", pages / elapsed, 'páginas/s', pages=pages))
+    return results
+
+
+def bench_synthesis(sizes, repeat):
+    """Caracteres por segundo na orquestração da síntese (segmentação, pool, cache e gravação)"""
+    from benchmarks.stub_tts import install_stub_backend
+    from app.utils.tts_service import stream_to_speech
+    from app.utils.text_cleanup import clean_pages
+
+    backend = install_stub_backend()
+    out_dir = os.path.join(WORK_DIR, 'synthesis')
+    os.makedirs(out_dir, exist_ok=True)
+    pages = synthetic_pages(sizes['synthesis_pages'])
+    chars = sum(len(page) for page in pages)
+    results = []
+
+    elapsed, _ = best_time(lambda: sum(1 for _ in clean_pages(pages)), repeat)
+    results.append(result('synthesis.text_cleanup', chars / elapsed, 'caracteres/s', chars=chars))
+
+    run = [0]
+
+    def synthesize(texts):
+        filename, _ = stream_to_speech(texts, out_dir)
+        os.remove(os.path.join(out_dir, filename))
+
+    def fresh_pages():
+        # Um prefixo diferente a cada execução evita acertos no cache de segmentos
+        run[0] += 1
+        return [f"Execucao {run[0]}. {page}" for page in pages]
+
+    for latency in sizes['synthesis_latencies']:
+        backend.configure(latency=latency)
+        elapsed, _ = best_time(lambda: synthesize(fresh_pages()), repeat)
+        results.append(result(f"synthesis.stream.latency_{int(latency * 1000)}ms", chars / elapsed, 'caracteres/s',
+                              latency=latency, chars=chars))
+
+    # Mesmo texto de novo: todos os segmentos vêm do cache em disco
+    backend.configure(latency=sizes['synthesis_latencies'][-1])
+    cached = fresh_pages()
+    synthesize(cached)
+    elapsed, _ = best_time(lambda: synthesize(cached), repeat)
+    results.append(result('synthesis.stream.cached', chars / elapsed, 'caracteres/s', chars=chars))
+    return results
+
+
+def _bench_app():
+    """A aplicação com as pastas de arquivos dentro da pasta temporária e sem CSRF nos formulários"""
+    from app import app
+
+    if not app.config.get('BENCHMARK'):
+        for key in ('UPLOAD_FOLDER', 'AUDIO_FOLDER', 'TEXT_FOLDER', 'SEGMENT_FOLDER', 'UPLOAD_TEMP_FOLDER'):
+            app.config[key] = os.path.join(WORK_DIR, key.lower())
+            os.makedirs(app.config[key], exist_ok=True)
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['BENCHMARK'] = True
+    return app
+
+
+def _client_for(app, email):
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': 'benchmark'})
+    return client
+
+
+def _create_user(email):
+    from datetime import timedelta
+    from app.models.db import db
+    from app.models.user import User
+
+    user = User(email=email, name='Benchmark', subscription_status='active',
+                subscription_end_date=datetime.utcnow() + timedelta(days=30))
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def bench_dashboard(sizes, repeat):
+    """Tempo de resposta do dashboard (primeira página e uma página intermediária) por tamanho da biblioteca"""
+    from app.models.db import db
+    from app.models.pdf import PDF, AudioFile
+
+    app = _bench_app()
+    results = []
+    samples = max(20, repeat * 10)
+    for count in sizes['dashboard_pdfs']:
+        email = f"dashboard-{count}@benchmark.aireader.com"
+        with app.app_context():
+            user_id = _create_user(email).id
+            pdfs = [
+                PDF(title=f"Livro {index}", filename=f"livro{index}.pdf", file_path=f"blobs/{index}.pdf",
+                    file_size=1024 * 1024, page_count=200, user_id=user_id, is_processing=index % 50 == 0)
+                for index in range(count)
+            ]
+            db.session.add_all(pdfs)
+            db.session.flush()
+            # Metade da biblioteca convertida
+            db.session.add_all(
+                AudioFile(filename=f"{pdf.id}.mp3", file_path=f"{pdf.id}.mp3", duration=3600.0, pdf_id=pdf.id)
+                for pdf in pdfs[::2]
+            )
+            db.session.commit()
+
+        client = _client_for(app, email)
+        client.get('/dashboard')
+        times = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            response = client.get('/dashboard')
+            times.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        results.append(result(f"dashboard.render.{count}", statistics.median(times) * 1000, 'ms',
+                              higher_is_better=False, pdfs=count))
+
+        times = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            response = client.get('/api/status')
+            times.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        results.append(result(f"dashboard.api_status.{count}", statistics.median(times) * 1000, 'ms',
+                              higher_is_better=False, pdfs=count))
+    return results
+
+
+def _read_body(response):
+    # Lê a resposta em blocos, como um cliente faria, sem montar o corpo inteiro na memória
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+def bench_download(sizes, repeat):
+    """MB/s no download de um áudio, de um livro em capítulos e em requisições Range"""
+    from app.models.db import db
+    from app.models.pdf import PDF, AudioFile
+
+    app = _bench_app()
+    email = 'download@benchmark.aireader.com'
+    audio_folder = app.config['AUDIO_FOLDER']
+    results = []
+
+    with app.app_context():
+        user_id = _create_user(email).id
+    client = _client_for(app, email)
+
+    for megabytes in sizes['download_mb']:
+        size = megabytes * 1024 * 1024
+        with app.app_context():
+            pdf = PDF(title=f"Download {megabytes}", filename='d.pdf', file_path='d.pdf', file_size=1,
+                      page_count=1, user_id=user_id, chapter_count=1)
+            db.session.add(pdf)
+            db.session.flush()
+            filename = f"single_{megabytes}.mp3"
+            with open(os.path.join(audio_folder, filename), 'wb') as f:
+                f.write(os.urandom(size))
+            db.session.add(AudioFile(filename=filename, file_path=filename, duration=1.0, pdf_id=pdf.id))
+
+            # O mesmo volume dividido em 4 capítulos (download concatenado)
+            book = PDF(title=f"Capitulos {megabytes}", filename='c.pdf', file_path='c.pdf', file_size=1,
+                       page_count=4, user_id=user_id, chapter_count=4)
+            db.session.add(book)
+            db.session.flush()
+            for chapter in range(4):
+                chapter_file = f"chapter_{megabytes}_{chapter}.mp3"
+                with open(os.path.join(audio_folder, chapter_file), 'wb') as f:
+                    f.write(os.urandom(size // 4))
+                db.session.add(AudioFile(filename=chapter_file, file_path=chapter_file, duration=1.0,
+                                         chapter_index=chapter, pdf_id=book.id))
+            db.session.commit()
+            pdf_id, book_id = pdf.id, book.id
+
+        for name, url in (('single', f"/download/{pdf_id}"), ('chapters', f"/download/{book_id}")):
+            def download():
+                response = client.get(url, buffered=False)
+                assert response.status_code == 200, response.status_code
+                return _read_body(response)
+            elapsed, received = best_time(download, repeat)
+            assert received == size, (received, size)
+            results.append(result(f"download.{name}.{megabytes}mb", megabytes / elapsed, 'MB/s', megabytes=megabytes))
+
+        # Busca: 64 requisições Range de 256 KB espalhadas pelo arquivo
+        def ranges():
+            for index in range(64):
+                start = (size // 64) * index
+                response = client.get(f"/download/{pdf_id}", headers={'Range': f"bytes={start}-{start + 256 * 1024 - 1}"},
+                                      buffered=False)
+                assert response.status_code == 206, response.status_code
+                _read_body(response)
+        elapsed, _ = best_time(ranges, repeat)
+        results.append(result(f"download.range.{megabytes}mb", 64 / elapsed, 'requisições/s', megabytes=megabytes))
+    return results
+
+
+BENCHMARKS = {
+    'extraction': bench_extraction,
+    'synthesis': bench_synthesis,
+    'dashboard': bench_dashboard,
+    'download': bench_download
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Compara com o baseline; retorna as linhas do relatório e as métricas que pioraram"""
+    previous = {entry['name']: entry for entry in baseline.get('results', [])}
+    rows = []
+    regressions = []
+    for entry in results:
+        before = previous.get(entry['name'])
+        if not before or not before['value']:
+            rows.append((entry['name'], entry['value'], None, None, 'novo'))
+            continue
+        change = (entry['value'] - before['value']) / before['value']
+        # Uma variação positiva sempre significa melhora
+        if not entry['higher_is_better']:
+            change = -change
+        if change < -tolerance:
+            status = 'REGRESSÃO'
+            regressions.append(entry['name'])
+        elif change > tolerance:
+            status = 'melhora'
+        else:
+            status = 'ok'
+        rows.append((entry['name'], entry['value'], before['value'], change, status))
+    return rows, regressions
+
+
+def print_results(results, rows=None):
+    units = {entry['name']: entry['unit'] for entry in results}
+    if rows is None:
+        for entry in results:
+            print(f"{entry['name']:<48} {entry['value']:>12.2f} {entry['unit']}")
+        return
+    for name, value, before, change, status in rows:
+        if before is None:
+            print(f"{name:<48} {value:>12.2f} {units[name]:<14} {'':>12} {'':>8} {status}")
+        else:
+            print(f"{name:<48} {value:>12.2f} {units[name]:<14} {before:>12.2f} {change:>+8.1%} {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do AI Reader")
+    parser.add_argument('--quick', action='store_true', help="tamanhos menores, para uma verificação rápida")
+    parser.add_argument('--only', choices=GROUPS, action='append', help="roda apenas o grupo informado (pode repetir)")
+    parser.add_argument('--repeat', type=int, help="execuções de cada medição (vale a melhor)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="arquivo JSON com os resultados")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="resultados de referência para comparação")
+    parser.add_argument('--save-baseline', action='store_true', help="grava os resultados como o novo baseline")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="piora tolerada antes de acusar regressão (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    mode = 'quick' if args.quick else 'full'
+    sizes = SIZES[mode]
+    repeat = args.repeat or sizes['repeat']
+
+    results = []
+    try:
+        for group in args.only or GROUPS:
+            print(f"[Benchmark] {group}...", file=sys.stderr)
+            results.extend(BENCHMARKS[group](sizes, repeat))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'commit': _git_commit(),
+            'mode': mode,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[Benchmark] Resultados gravados em {args.output}", file=sys.stderr)
+
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"[Benchmark] Baseline atualizado: {args.baseline}", file=sys.stderr)
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print(f"{'métrica':<48} {'atual':>12} {'unidade':<14} {'baseline':>12} {'variação':>8}")
+        print_results(results, rows)
+        if regressions:
+            print(f"[Benchmark] {len(regressions)} métrica(s) pioraram mais que {args.tolerance:.0%}: "
+                  f"{', '.join(regressions)}", file=sys.stderr)
+            return 1
+        return 0
+
+    print_results(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Provedor de TTS simulado, com latência configurável, para medir a orquestração da síntese"""
+import time
+from app.utils.tts_backends import TTSBackend, register_backend
+
+# Frame MPEG-2 camada III, 32 kbps, 24 kHz, mono: 96 bytes e 24 ms de áudio
+MP3_FRAME = b'\xff\xf3\x44\xc4' + b'\x00' * 92
+
+# Frames por caractere (cerca de 15 caracteres falados por segundo)
+FRAMES_PER_CHAR = 2.8
+
+
+class StubBackend(TTSBackend):
+    """
+    Devolve MP3 válido (frames de silêncio) depois de esperar
+    latency + latency_per_char * len(texto) segundos
+    """
+
+    name = 'stub'
+    max_chars = 4096
+    voices = ('stub',)
+    max_concurrency = 64
+    requires_network = False
+
+    def __init__(self, latency=0.0, latency_per_char=0.0):
+        super().__init__()
+        self.latency = latency
+        self.latency_per_char = latency_per_char
+        self.calls = 0
+
+    def configure(self, latency=0.0, latency_per_char=0.0):
+        self.latency = latency
+        self.latency_per_char = latency_per_char
+
+    def _synthesize(self, text):
+        self.calls += 1
+        delay = self.latency + self.latency_per_char * len(text)
+        if delay:
+            time.sleep(delay)
+        return MP3_FRAME * max(2, int(len(text) * FRAMES_PER_CHAR))
+
+
+def install_stub_backend(latency=0.0, latency_per_char=0.0):
+    """Registra o provedor simulado (use TTS_PROVIDERS=stub para que ele seja o único)"""
+    return register_backend(StubBackend(latency, latency_per_char))
@@ -0,0 +1,29 @@
+"""
+Tarefa executada nos processos do pool de extração de páginas (app/utils/pdf_processor.py)
+
+Fica fora do pacote app de propósito: os processos do pool são iniciados com 'spawn'
+e importam o módulo da tarefa; importar qualquer módulo de app executaria a
+inicialização completa da aplicação (banco, migrações, fila de conversão) em cada
+processo, só para usar o pdfplumber.
+"""
+import time
+import pdfplumber
+
+
+def extract_page_range(pdf_path, start, end):
+    """
+    Extrai o texto das páginas [start, end)
+
+    Retorna os textos e o tempo de extração de cada página, registrado nas
+    métricas pelo processo que fez o pedido (as do pool não são publicadas).
+    """
+    # O pdfplumber numera as páginas a partir de 1
+    with pdfplumber.open(pdf_path, pages=range(start + 1, end + 1)) as pdf:
+        texts = []
+        durations = []
+        for page in pdf.pages:
+            page_start = time.perf_counter()
+            texts.append(page.extract_text() or "")
+            page.flush_cache()
+            durations.append(time.perf_counter() - page_start)
+        return texts, durations
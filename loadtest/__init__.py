@@ -0,0 +1 @@
+# Este arquivo permite que o diretório 'loadtest' seja importado como um pacote Python 
\ No newline at end of file
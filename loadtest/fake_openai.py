@@ -0,0 +1,133 @@
+"""
+Servidor local no lugar da API de voz da OpenAI (POST /v1/audio/speech)
+
+Responde com MP3 válido (frames de silêncio, com duração proporcional ao texto)
+depois de uma latência configurável e pode devolver erros 5xx e 429 em uma
+fração das chamadas, para exercitar as novas tentativas e o limitador de taxa.
+A aplicação usa este servidor com OPENAI_BASE_URL=http://host:porta/v1.
+"""
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Frame MPEG-2 camada III, 32 kbps, 24 kHz, mono: 96 bytes e 24 ms de áudio
+MP3_FRAME = b'\xff\xf3\x44\xc4' + b'\x00' * 92
+
+# Frames por caractere (cerca de 15 caracteres falados por segundo)
+FRAMES_PER_CHAR = 2.8
+
+# Perfis de comportamento: latência fixa, latência por caractere, fração de erros 500 e de 429
+PROFILES = {
+    'rapido': {'latency': 0.05, 'latency_per_char': 0.0, 'error_rate': 0.0, 'rate_limit_rate': 0.0},
+    'normal': {'latency': 0.4, 'latency_per_char': 0.0003, 'error_rate': 0.0, 'rate_limit_rate': 0.0},
+    'instavel': {'latency': 0.4, 'latency_per_char': 0.0003, 'error_rate': 0.05, 'rate_limit_rate': 0.0},
+    'limitado': {'latency': 0.4, 'latency_per_char': 0.0003, 'error_rate': 0.0, 'rate_limit_rate': 0.2}
+}
+
+# Espera sugerida no cabeçalho Retry-After das respostas 429
+RETRY_AFTER_MS = 500
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, profile='normal', seed=None):
+        super().__init__(address, _SpeechHandler)
+        self.profile = dict(PROFILES[profile]) if isinstance(profile, str) else dict(profile)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'chars': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0, 'bad_requests': 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def outcome(self):
+        """Sorteia o resultado da chamada: 'ok', 'error' ou 'rate_limited'"""
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.profile['rate_limit_rate']:
+            return 'rate_limited'
+        if roll < self.profile['rate_limit_rate'] + self.profile['error_rate']:
+            return 'error'
+        return 'ok'
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+class _SpeechHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, kind, headers=None):
+        self._json(status, {'error': {'message': message, 'type': kind, 'param': None, 'code': None}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/_stats':
+            return self._json(200, self.server.snapshot())
+        self._error(404, 'Not found', 'invalid_request_error')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if self.path.rstrip('/') != '/v1/audio/speech':
+            return self._error(404, 'Not found', 'invalid_request_error')
+
+        server = self.server
+        server.count('requests')
+        try:
+            text = json.loads(body)['input']
+        except (ValueError, KeyError, TypeError):
+            server.count('bad_requests')
+            return self._error(400, "'input' is required", 'invalid_request_error')
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            server.count('bad_requests')
+            return self._error(401, 'Missing API key', 'invalid_request_error')
+
+        server.count('chars', len(text))
+        outcome = server.outcome()
+        if outcome == 'rate_limited':
+            server.count('rate_limited')
+            return self._error(429, 'Rate limit reached for requests', 'requests',
+                               {'retry-after-ms': str(RETRY_AFTER_MS)})
+
+        time.sleep(server.profile['latency'] + server.profile['latency_per_char'] * len(text))
+        if outcome == 'error':
+            server.count('errors')
+            return self._error(500, 'The server had an error while processing your request', 'server_error')
+
+        audio = MP3_FRAME * max(2, int(len(text) * FRAMES_PER_CHAR))
+        server.count('ok')
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(audio)))
+        self.end_headers()
+        self.wfile.write(audio)
+
+
+def start_fake_openai(host='127.0.0.1', port=0, profile='normal', seed=None):
+    """Inicia o servidor em uma thread e o retorna (base_url tem o endereço para OPENAI_BASE_URL)"""
+    server = FakeOpenAIServer((host, port), profile, seed)
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    return server
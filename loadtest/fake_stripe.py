@@ -0,0 +1,211 @@
+"""
+Servidor local no lugar da API do Stripe
+
+Atende o que a aplicação usa: criação de clientes, sessões de checkout e
+consulta/cancelamento de assinaturas. Ao criar uma sessão de checkout, a
+assinatura é considerada paga e o evento customer.subscription.created é
+enviado ao webhook da aplicação, assinado com o segredo configurado, como o
+Stripe faria. A aplicação usa este servidor com STRIPE_API_BASE=http://host:porta.
+"""
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import threading
+import urllib.request
+from urllib.parse import parse_qs, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Cabeçalho Stripe-Signature de um payload (HMAC-SHA256 de 'timestamp.payload')"""
+    timestamp = int(timestamp or time.time())
+    signed = f"{timestamp}.".encode('utf-8') + payload
+    signature = hmac.new(secret.encode('utf-8'), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def _new_id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, webhook_url=None, webhook_secret=None, latency=0.05):
+        super().__init__(address, _StripeHandler)
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.customers = {}
+        self.subscriptions = {}
+        self.stats = {'requests': 0, 'customers': 0, 'checkout_sessions': 0, 'webhooks_sent': 0,
+                      'webhooks_failed': 0}
+        self.webhook_latencies = []
+        # Os webhooks são enviados fora da requisição, como no Stripe real
+        self._senders = ThreadPoolExecutor(max_workers=4, thread_name_prefix='fake-stripe-webhook')
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['webhook_latencies'] = list(self.webhook_latencies)
+        return stats
+
+    def subscribe(self, customer_id, price_id):
+        now = int(time.time())
+        subscription = {
+            'id': _new_id('sub'),
+            'object': 'subscription',
+            'customer': customer_id,
+            'status': 'active',
+            'current_period_start': now,
+            'current_period_end': now + 30 * 24 * 3600,
+            'cancel_at_period_end': False,
+            'items': {'object': 'list', 'data': [{'price': {'id': price_id}}]}
+        }
+        with self.lock:
+            self.subscriptions[subscription['id']] = subscription
+        self.send_event('customer.subscription.created', subscription)
+        return subscription
+
+    def send_event(self, event_type, data_object):
+        if not self.webhook_url or not self.webhook_secret:
+            return None
+        event = {
+            'id': _new_id('evt'),
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'livemode': False,
+            'data': {'object': data_object}
+        }
+        return self._senders.submit(self._deliver, event)
+
+    def _deliver(self, event):
+        payload = json.dumps(event).encode('utf-8')
+        request = urllib.request.Request(self.webhook_url, data=payload, method='POST', headers={
+            'Content-Type': 'application/json',
+            'Stripe-Signature': sign_payload(payload, self.webhook_secret)
+        })
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+            self.count('webhooks_sent')
+            with self.lock:
+                self.webhook_latencies.append(time.perf_counter() - start)
+            return True
+        except OSError:
+            self.count('webhooks_failed')
+            return False
+
+    def shutdown(self):
+        self._senders.shutdown(wait=True)
+        super().shutdown()
+
+
+class _StripeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Request-Id', _new_id('req'))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self, resource='resource'):
+        self._json(404, {'error': {'type': 'invalid_request_error', 'code': 'resource_missing',
+                                   'message': f"No such {resource}"}})
+
+    def _params(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        return {key: values[-1] for key, values in parse_qs(body).items()}
+
+    def _begin(self):
+        self.server.count('requests')
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        return urlsplit(self.path).path.rstrip('/').split('/')[1:]
+
+    def do_POST(self):
+        parts = self._begin()
+        params = self._params()
+        server = self.server
+
+        if parts == ['v1', 'customers']:
+            customer = {'id': _new_id('cus'), 'object': 'customer', 'email': params.get('email'),
+                        'name': params.get('name'), 'description': params.get('description'),
+                        'created': int(time.time())}
+            with server.lock:
+                server.customers[customer['id']] = customer
+            server.count('customers')
+            return self._json(200, customer)
+
+        if parts == ['v1', 'checkout', 'sessions']:
+            customer_id = params.get('customer')
+            with server.lock:
+                known = customer_id in server.customers
+            if not known:
+                return self._not_found('customer')
+            server.count('checkout_sessions')
+            # O pagamento é aprovado na hora; o checkout leva direto à página de sucesso
+            subscription = server.subscribe(customer_id, params.get('line_items[0][price]'))
+            return self._json(200, {'id': _new_id('cs'), 'object': 'checkout.session', 'mode': 'subscription',
+                                    'customer': customer_id, 'subscription': subscription['id'],
+                                    'url': params.get('success_url'), 'status': 'complete'})
+
+        self._not_found()
+
+    def do_GET(self):
+        parts = self._begin()
+        if parts == ['_stats']:
+            return self._json(200, self.server.snapshot())
+        if len(parts) == 3 and parts[:2] == ['v1', 'subscriptions']:
+            with self.server.lock:
+                subscription = self.server.subscriptions.get(parts[2])
+            return self._json(200, subscription) if subscription else self._not_found('subscription')
+        if len(parts) == 3 and parts[:2] == ['v1', 'customers']:
+            with self.server.lock:
+                customer = self.server.customers.get(parts[2])
+            return self._json(200, customer) if customer else self._not_found('customer')
+        self._not_found()
+
+    def do_DELETE(self):
+        parts = self._begin()
+        if len(parts) == 3 and parts[:2] == ['v1', 'subscriptions']:
+            with self.server.lock:
+                subscription = self.server.subscriptions.get(parts[2])
+                if subscription:
+                    subscription['status'] = 'canceled'
+                    subscription = dict(subscription)
+            if not subscription:
+                return self._not_found('subscription')
+            self.server.send_event('customer.subscription.deleted', subscription)
+            return self._json(200, subscription)
+        self._not_found()
+
+
+def start_fake_stripe(host='127.0.0.1', port=0, webhook_url=None, webhook_secret=None, latency=0.05):
+    """Inicia o servidor em uma thread e o retorna (base_url tem o endereço para STRIPE_API_BASE)"""
+    server = FakeStripeServer((host, port), webhook_url, webhook_secret, latency)
+    threading.Thread(target=server.serve_forever, name='fake-stripe', daemon=True).start()
+    return server
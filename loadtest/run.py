@@ -0,0 +1,441 @@
+"""
+Teste de carga de ponta a ponta: a aplicação no gunicorn, com OpenAI e Stripe simulados
+
+Sobe um servidor local no lugar da API de voz da OpenAI (loadtest/fake_openai.py) e
+outro no lugar do Stripe (loadtest/fake_stripe.py), inicia o gunicorn com a aplicação
+apontando para eles e simula usuários concorrentes fazendo o caminho completo:
+cadastro, assinatura (checkout e webhook assinado), upload do PDF, conversão em
+segundo plano, acompanhamento em /api/status e download do MP3.
+
+Uso (na raiz do projeto):
+    python -m loadtest.run --users 8 --books 2 --pages 20
+    python -m loadtest.run --users 20 --tts-profile limitado --workers 4 --output resultado.json
+
+Ao final, mostra conversões por hora, latências p50/p95/p99 e taxa de erros de cada
+etapa. Variáveis de ambiente da aplicação (ex.: OPENAI_TTS_RPM, TTS_MAX_WORKERS) são
+repassadas ao gunicorn, então o teste mede a configuração que será usada em produção.
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import requests
+
+from benchmarks.pdfs import make_pdf
+from loadtest.fake_openai import start_fake_openai, PROFILES
+from loadtest.fake_stripe import start_fake_stripe
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+# Etapas na ordem em que aparecem no relatório
+STEPS = ('register', 'login', 'checkout', 'subscription_success', 'dashboard', 'upload', 'convert',
+         'status', 'download')
+
+
+def percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo (values já ordenados)"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Recorder:
+    """Latências e erros de cada etapa, e o resultado de cada conversão"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = defaultdict(list)
+        self.conversions = []
+        self.downloaded_bytes = 0
+
+    def request(self, step, latency, ok, detail=None):
+        with self._lock:
+            self.latencies[step].append(latency)
+            if not ok:
+                self.errors[step] += 1
+                if detail and len(self.error_samples[step]) < 5:
+                    self.error_samples[step].append(detail)
+
+    def conversion(self, ok, seconds, pages, reason=None):
+        with self._lock:
+            self.conversions.append({'ok': ok, 'seconds': seconds, 'pages': pages, 'reason': reason})
+
+    def downloaded(self, size):
+        with self._lock:
+            self.downloaded_bytes += size
+
+
+class FlowError(Exception):
+    """Uma etapa do fluxo falhou e o usuário simulado não pode continuar"""
+
+
+class SimulatedUser:
+    """Um usuário fazendo o caminho completo em uma sessão HTTP própria (cookies e CSRF)"""
+
+    def __init__(self, base_url, index, recorder, args):
+        self.base_url = base_url
+        self.index = index
+        self.recorder = recorder
+        self.args = args
+        self.session = requests.Session()
+        self.email = f"usuario{index}-{uuid.uuid4().hex[:8]}@loadtest.aireader.com"
+        self.password = 'senha-do-teste'
+        self.csrf_token = None
+
+    def request(self, step, method, path, expect=(200,), **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        kwargs.setdefault('timeout', self.args.request_timeout)
+        url = path if path.startswith('http') else self.base_url + path
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+            if not kwargs.get('stream'):
+                response.content
+        except requests.RequestException as e:
+            self.recorder.request(step, time.perf_counter() - start, False, f"{type(e).__name__}: {e}")
+            raise FlowError(f"{step}: {e}")
+        latency = time.perf_counter() - start
+        ok = response.status_code in expect
+        self.recorder.request(step, latency, ok, None if ok else f"HTTP {response.status_code} em {path}")
+        if not ok:
+            raise FlowError(f"{step}: HTTP {response.status_code}")
+        return response
+
+    def _read_csrf(self, response):
+        match = _CSRF_RE.search(response.text)
+        if match:
+            self.csrf_token = match.group(1)
+
+    def _redirects_to(self, response, fragment):
+        return fragment in response.headers.get('Location', '')
+
+    def signup(self):
+        self._read_csrf(self.request('register', 'GET', '/register'))
+        response = self.request('register', 'POST', '/register', expect=(302,), data={
+            'csrf_token': self.csrf_token, 'name': f"Usuario {self.index}", 'email': self.email,
+            'password': self.password, 'confirm_password': self.password
+        })
+        if not self._redirects_to(response, '/login'):
+            raise FlowError('register: cadastro recusado')
+
+        self._read_csrf(self.request('login', 'GET', '/login'))
+        self.request('login', 'POST', '/login', expect=(302,), data={
+            'csrf_token': self.csrf_token, 'email': self.email, 'password': self.password
+        })
+
+        # Checkout no Stripe simulado: a sessão já volta aprovada e o webhook é enviado
+        self._read_csrf(self.request('checkout', 'GET', '/subscription'))
+        response = self.request('checkout', 'POST', '/create-checkout-session', expect=(302, 303),
+                                data={'csrf_token': self.csrf_token})
+        if not self._redirects_to(response, '/subscription-success'):
+            raise FlowError(f"checkout: redirecionado para {response.headers.get('Location')}")
+        self.request('subscription_success', 'GET', response.headers['Location'], expect=(302,))
+
+    def status(self):
+        response = self.request('status', 'GET', '/api/status')
+        return {entry['id']: entry for entry in response.json()['pdfs']}
+
+    def convert_book(self, pdf_path, pages, number):
+        self._read_csrf(self.request('dashboard', 'GET', '/dashboard'))
+        before = set(self.status())
+
+        with open(pdf_path, 'rb') as f:
+            self.request('upload', 'POST', '/upload', expect=(302,),
+                         data={'csrf_token': self.csrf_token, 'title': f"Livro {self.index}-{number}"},
+                         files={'pdf_file': (os.path.basename(pdf_path), f, 'application/pdf')})
+        created = [pdf_id for pdf_id in self.status() if pdf_id not in before]
+        if not created:
+            raise FlowError('upload: o PDF não apareceu na biblioteca')
+        pdf_id = created[0]
+
+        started = time.monotonic()
+        self.request('convert', 'POST', f"/convert/{pdf_id}", expect=(302,), data={'csrf_token': self.csrf_token})
+
+        # Acompanha a conversão como o dashboard faz
+        seen_active = False
+        deadline = started + self.args.conversion_timeout
+        while True:
+            entry = self.status().get(pdf_id)
+            if entry and entry['status'] == 'Convertido':
+                break
+            if entry and entry['job_state']:
+                seen_active = True
+            elif seen_active:
+                # O job saiu da fila sem que o PDF fosse convertido: a conversão falhou
+                self.recorder.conversion(False, time.monotonic() - started, pages, 'falha na conversão')
+                return
+            if time.monotonic() > deadline:
+                self.recorder.conversion(False, time.monotonic() - started, pages, 'tempo esgotado')
+                return
+            time.sleep(self.args.poll_interval)
+        self.recorder.conversion(True, time.monotonic() - started, pages)
+
+        response = self.request('download', 'GET', f"/download/{pdf_id}", stream=True)
+        size = 0
+        start = time.perf_counter()
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+        response.close()
+        # A latência registrada cobre só o início da resposta; o corpo conta na vazão
+        self.recorder.downloaded(size)
+        if response.headers.get('Content-Type') != 'audio/mpeg' or size == 0:
+            self.recorder.request('download', time.perf_counter() - start, False, 'áudio vazio ou inválido')
+
+    def run(self, pdf_paths, pages):
+        try:
+            self.signup()
+            for number, pdf_path in enumerate(pdf_paths):
+                self.convert_book(pdf_path, pages, number)
+        except FlowError as e:
+            print(f"[LoadTest] Usuário {self.index} interrompido: {e}", file=sys.stderr)
+        finally:
+            self.session.close()
+
+
+def wait_until_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(base_url + '/login', timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.3)
+    return False
+
+
+def build_report(recorder, args, elapsed, openai_stats, stripe_stats):
+    steps = {}
+    for step in STEPS + tuple(step for step in recorder.latencies if step not in STEPS):
+        latencies = sorted(recorder.latencies.get(step, []))
+        if not latencies:
+            continue
+        errors = recorder.errors.get(step, 0)
+        steps[step] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': errors / len(latencies),
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+            'error_samples': recorder.error_samples.get(step, [])
+        }
+
+    finished = [entry for entry in recorder.conversions if entry['ok']]
+    durations = sorted(entry['seconds'] for entry in finished)
+    failures = defaultdict(int)
+    for entry in recorder.conversions:
+        if not entry['ok']:
+            failures[entry['reason']] += 1
+    total_requests = sum(step['requests'] for step in steps.values())
+    total_errors = sum(step['errors'] for step in steps.values())
+    webhook_latencies = sorted(stripe_stats.pop('webhook_latencies', []))
+
+    return {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'users': args.users,
+            'books_per_user': args.books,
+            'pages': args.pages,
+            'gunicorn_workers': args.workers,
+            'gunicorn_threads': args.threads,
+            'conversion_workers': args.conversion_workers,
+            'tts_profile': args.tts_profile
+        },
+        'elapsed_seconds': elapsed,
+        'conversions': {
+            'started': len(recorder.conversions),
+            'completed': len(finished),
+            'failed': dict(failures),
+            'per_hour': len(finished) / elapsed * 3600 if elapsed else 0.0,
+            'pages_per_hour': sum(entry['pages'] for entry in finished) / elapsed * 3600 if elapsed else 0.0,
+            'p50_seconds': percentile(durations, 0.50),
+            'p95_seconds': percentile(durations, 0.95)
+        },
+        'requests': {
+            'total': total_requests,
+            'errors': total_errors,
+            'error_rate': total_errors / total_requests if total_requests else 0.0,
+            'downloaded_mb': recorder.downloaded_bytes / (1024 * 1024)
+        },
+        'steps': steps,
+        'openai': openai_stats,
+        'stripe': dict(stripe_stats, webhook_p95_ms=(percentile(webhook_latencies, 0.95) or 0) * 1000)
+    }
+
+
+def print_report(report):
+    conversions = report['conversions']
+    requests_summary = report['requests']
+    print(f"\nDuração: {report['elapsed_seconds']:.1f}s")
+    print(f"Conversões: {conversions['completed']}/{conversions['started']} concluídas"
+          + (f", falhas: {conversions['failed']}" if conversions['failed'] else ''))
+    print(f"Conversões por hora: {conversions['per_hour']:.1f} ({conversions['pages_per_hour']:.0f} páginas/hora)")
+    if conversions['p50_seconds'] is not None:
+        print(f"Tempo de conversão: p50 {conversions['p50_seconds']:.1f}s, p95 {conversions['p95_seconds']:.1f}s")
+    print(f"Requisições: {requests_summary['total']}, erros: {requests_summary['errors']} "
+          f"({requests_summary['error_rate']:.2%}), download: {requests_summary['downloaded_mb']:.1f} MB\n")
+
+    print(f"{'etapa':<22} {'req':>6} {'erros':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for step, stats in report['steps'].items():
+        print(f"{step:<22} {stats['requests']:>6} {stats['errors']:>6} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+        for sample in stats['error_samples']:
+            print(f"    {sample}")
+
+    openai_stats = report['openai']
+    stripe_stats = report['stripe']
+    print(f"\nOpenAI simulada: {openai_stats['requests']} chamadas, {openai_stats['chars']} caracteres, "
+          f"{openai_stats['rate_limited']} respostas 429, {openai_stats['errors']} erros 500")
+    print(f"Stripe simulado: {stripe_stats['customers']} clientes, {stripe_stats['checkout_sessions']} checkouts, "
+          f"{stripe_stats['webhooks_sent']} webhooks entregues ({stripe_stats['webhooks_failed']} falharam), "
+          f"p95 do webhook {stripe_stats['webhook_p95_ms']:.0f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do AI Reader com OpenAI e Stripe simulados")
+    parser.add_argument('--users', type=int, default=8, help="usuários simulados ao mesmo tempo")
+    parser.add_argument('--books', type=int, default=1, help="livros convertidos por usuário")
+    parser.add_argument('--pages', type=int, default=20, help="páginas de cada livro")
+    parser.add_argument('--ramp', type=float, default=5.0, help="segundos até todos os usuários começarem")
+    parser.add_argument('--tts-profile', choices=sorted(PROFILES), default='normal',
+                        help="comportamento da OpenAI simulada (latência, erros 500, respostas 429)")
+    parser.add_argument('--workers', type=int, default=2, help="processos do gunicorn")
+    parser.add_argument('--threads', type=int, default=4, help="threads por processo do gunicorn")
+    parser.add_argument('--conversion-workers', type=int, default=2, help="CONVERSION_WORKERS de cada processo")
+    parser.add_argument('--poll-interval', type=float, default=2.0, help="intervalo entre consultas a /api/status")
+    parser.add_argument('--conversion-timeout', type=float, default=900, help="tempo máximo de uma conversão")
+    parser.add_argument('--request-timeout', type=float, default=60, help="tempo máximo de uma requisição")
+    parser.add_argument('--output', help="grava o relatório em JSON neste arquivo")
+    parser.add_argument('--keep', action='store_true', help="mantém a pasta do teste (banco, arquivos, log do gunicorn e métricas)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='aireader-loadtest-')
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    webhook_secret = 'whsec_loadtest'
+
+    openai_server = start_fake_openai(profile=args.tts_profile)
+    stripe_server = start_fake_stripe(webhook_url=f"{base_url}/webhook", webhook_secret=webhook_secret)
+
+    env = dict(os.environ)
+    env.update({
+        'LOADTEST_DIR': work_dir,
+        # Também para o upgrade-db, que importa a aplicação fora de loadtest/wsgi.py
+        'DATA_DIR': work_dir,
+        'DATABASE_URL': env.get('LOADTEST_DATABASE_URL') or 'sqlite:///' + os.path.join(work_dir, 'loadtest.db'),
+        'OPENAI_API_KEY': 'sk-loadtest',
+        'OPENAI_BASE_URL': openai_server.base_url,
+        'TTS_PROVIDERS': 'openai',
+        'TTS_CACHE_DIR': os.path.join(work_dir, 'tts_cache'),
+        'STRIPE_SECRET_KEY': 'sk_test_loadtest',
+        'STRIPE_API_BASE': stripe_server.base_url,
+        'STRIPE_WEBHOOK_SECRET': webhook_secret,
+        'STRIPE_PRICE_ID': 'price_loadtest',
+        'CONVERSION_WORKERS': str(args.conversion_workers),
+        'PYTHONPATH': PROJECT_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    })
+
+    print(f"[LoadTest] Gerando {args.users * args.books} PDFs de {args.pages} páginas em {work_dir}", file=sys.stderr)
+    pdf_dir = os.path.join(work_dir, 'pdfs')
+    os.makedirs(pdf_dir)
+    # Cada livro tem conteúdo próprio, para que nenhuma conversão reaproveite o áudio de outra
+    books = [
+        [make_pdf(os.path.join(pdf_dir, f"livro_{user}_{book}.pdf"), args.pages, 'livro', seed=f"{user}-{book}")
+         for book in range(args.books)]
+        for user in range(args.users)
+    ]
+
+    log_path = os.path.join(work_dir, 'gunicorn.log')
+    log = open(log_path, 'w')
+
+    # As migrações são aplicadas uma vez, antes de os processos do gunicorn subirem
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'upgrade-db'], cwd=PROJECT_ROOT,
+                   env=dict(env, CONVERSION_WORKERS='0'), check=True, stdout=log, stderr=subprocess.STDOUT)
+    gunicorn = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{port}", '--workers', str(args.workers),
+         '--threads', str(args.threads), '--timeout', '120', 'loadtest.wsgi:app'],
+        cwd=PROJECT_ROOT, env=dict(env, DB_AUTO_MIGRATE='0'), stdout=log, stderr=subprocess.STDOUT
+    )
+
+    recorder = Recorder()
+    exit_code = 0
+    try:
+        if not wait_until_ready(base_url, gunicorn):
+            print(f"[LoadTest] O gunicorn não respondeu; veja {log_path}", file=sys.stderr)
+            args.keep = True
+            return 1
+
+        print(f"[LoadTest] {args.users} usuários contra {base_url} (OpenAI simulada: perfil {args.tts_profile})",
+              file=sys.stderr)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.users) as executor:
+            for index in range(args.users):
+                user = SimulatedUser(base_url, index, recorder, args)
+                executor.submit(user.run, books[index], args.pages)
+                if args.users > 1:
+                    time.sleep(args.ramp / (args.users - 1))
+        elapsed = time.monotonic() - start
+
+        report = build_report(recorder, args, elapsed, openai_server.snapshot(), stripe_server.snapshot())
+
+        # Métricas de um dos processos do gunicorn ao final do teste, para análise com --keep
+        try:
+            with open(os.path.join(work_dir, 'metrics.prom'), 'w', encoding='utf-8') as f:
+                f.write(requests.get(base_url + '/metrics', timeout=10).text)
+        except requests.RequestException:
+            pass
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"[LoadTest] Relatório gravado em {args.output}", file=sys.stderr)
+        if report['requests']['errors'] or report['conversions']['failed']:
+            exit_code = 1
+    finally:
+        gunicorn.terminate()
+        try:
+            gunicorn.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            gunicorn.kill()
+        log.close()
+        openai_server.shutdown()
+        stripe_server.shutdown()
+        if args.keep:
+            print(f"[LoadTest] Arquivos do teste mantidos em {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""
+Aplicação servida pelo gunicorn no teste de carga
+
+Igual a app:app, mas com o banco, PDFs, áudios e demais arquivos em LOADTEST_DIR, para
+que o teste não misture seus arquivos com os da instalação local. A pasta é definida
+antes de importar a aplicação, que já cria as pastas e move os uploads antigos ao ser
+importada.
+"""
+import os
+
+os.environ['DATA_DIR'] = os.environ['LOADTEST_DIR']
+
+from app import app
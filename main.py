@@ -1,9 +1,13 @@
-from app import app
 import os
 
+# A aplicação só é importada ao executar este arquivo: os processos do pool de extração
+# (iniciados com 'spawn') reimportam o módulo principal e não devem inicializá-la
 if __name__ == '__main__':
+    # Um único processo: as migrações podem ser aplicadas na inicialização
+    os.environ.setdefault('DB_AUTO_MIGRATE', '1')
+    from app import app
+    
     # Cria diretórios necessários, caso não existam
-    os.makedirs(os.path.join(app.static_folder, 'uploads'), exist_ok=True)
     os.makedirs(os.path.join(app.static_folder, 'audios'), exist_ok=True)
     
     # Obtém a porta do ambiente ou usa 8000 como padrão